@@ -0,0 +1,58 @@
+import argparse
+import logging
+import sys
+
+from utils.benchmark import DEFAULT_PROJECT_CONFIG, DEFAULT_THRESHOLD, BenchmarkRunner
+
+def parse_args() -> argparse.Namespace:
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="PyEzPacker基准测试：在合成项目上测量扫描、解析、图标转换和打包的耗时")
+    parser.add_argument('--files', type=int, default=DEFAULT_PROJECT_CONFIG['files'], help="合成项目的模块数")
+    parser.add_argument('--depth', type=int, default=DEFAULT_PROJECT_CONFIG['depth'], help="包的嵌套深度")
+    parser.add_argument('--fanout', type=int, default=DEFAULT_PROJECT_CONFIG['fanout'], help="每个模块导入的模块数")
+    parser.add_argument('--data-files', type=int, default=DEFAULT_PROJECT_CONFIG['data_files'], help="数据文件数")
+    parser.add_argument('--data-size-kb', type=int, default=DEFAULT_PROJECT_CONFIG['data_size_kb'], help="每个数据文件的大小(KB)")
+    parser.add_argument('--repeat', type=int, default=5, help="每个基准的重复次数")
+    parser.add_argument('--build', action='store_true', help="包含完整打包基准（仅Linux/Mac）")
+    parser.add_argument('--only', nargs='*', help="只运行指定名称的基准")
+    parser.add_argument('--baseline', help="基线文件路径，默认为用户缓存目录下的benchmarks/baseline.json")
+    parser.add_argument('--update-baseline', action='store_true', help="将本次结果保存为新的基线")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="回归阈值，0.2表示比基线慢20%%以上")
+    return parser.parse_args()
+
+def main() -> int:
+    """
+    程序入口点，存在性能回归时返回1
+    """
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    
+    runner = BenchmarkRunner(
+        project_config={
+            'files': args.files,
+            'depth': args.depth,
+            'fanout': args.fanout,
+            'data_files': args.data_files,
+            'data_size_kb': args.data_size_kb
+        },
+        repeat=args.repeat
+    )
+    result = runner.run(include_build=args.build, names=args.only)
+    
+    baseline = runner.load_baseline(args.baseline)
+    comparison = runner.compare(result, baseline, args.threshold) if baseline else None
+    print(runner.format_results(result, comparison))
+    
+    if args.update_baseline or baseline is None:
+        runner.save_baseline(result, args.baseline)
+        
+    regressions = [item['name'] for item in comparison or [] if item['regression']]
+    if regressions:
+        print(f"性能回归: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
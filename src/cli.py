@@ -0,0 +1,470 @@
+import argparse
+import logging
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+# 命令行模式不应导入的重量级模块：图形界面和图像处理只在需要时才加载
+HEAVY_MODULES = ('tkinter', 'PIL')
+
+# 默认的导入耗时预算（毫秒），即导入本模块的累计耗时，不含解释器自身启动
+DEFAULT_IMPORT_BUDGET_MS = 75
+
+logger = logging.getLogger('pyezpacker.cli')
+
+def setup_logging(verbose: int) -> None:
+    """
+    配置命令行模式的日志：输出到标准错误，-v显示调试信息，默认只显示INFO及以上
+    """
+    level = logging.DEBUG if verbose else logging.INFO
+    logging.basicConfig(level=level, format='%(levelname)s: %(message)s', stream=sys.stderr)
+
+def print_json(data: Any) -> None:
+    """以JSON格式输出结果"""
+    import json
+    print(json.dumps(data, ensure_ascii=False, indent=2, default=str))
+
+def cmd_scan(args: argparse.Namespace) -> int:
+    """扫描项目目录，识别虚拟环境、版本信息文件、图标和数据文件"""
+    from utils.project_scanner import ProjectScanner
+    result = ProjectScanner(logger, use_index=args.index).scan_project(args.script, recursive=args.recursive)
+    result = {key: sorted(value) if isinstance(value, set) else value for key, value in result.items()}
+    if args.json:
+        print_json(result)
+    else:
+        for key, value in result.items():
+            if isinstance(value, list):
+                print(f"{key}: {len(value)} 个")
+                for item in value:
+                    print(f"  {item}")
+            else:
+                print(f"{key}: {value or '-'}")
+    return 0
+
+def cmd_version_show(args: argparse.Namespace) -> int:
+    """显示版本信息文件的内容"""
+    from utils.version_parser import VersionParser
+    info = VersionParser(logger).parse_version_file(args.file)
+    if args.json:
+        print_json(info)
+    else:
+        for key, value in info.items():
+            print(f"{key}: {value}")
+    return 0
+
+def cmd_version_set(args: argparse.Namespace) -> int:
+    """修改版本信息文件中的字段，未列出的内容保持不变；文件不存在时新建"""
+    from utils.version_parser import VersionParser
+    updates = {}
+    if not os.path.exists(args.file):
+        # 新建文件时与图形界面一致，未指定的字段留空，版本号默认为1.0.0.0
+        updates = {key: '' for key in ('CompanyName', 'FileDescription', 'LegalCopyright', 'ProductName')}
+        updates.update(FileVersion='1.0.0.0', ProductVersion='1.0.0.0')
+    for item in args.fields:
+        key, sep, value = item.partition('=')
+        if not sep:
+            logger.error(f"字段格式应为 名称=值: {item}")
+            return 2
+        updates[key] = value
+    VersionParser(logger).save_version_file(args.file, updates)
+    return 0
+
+def cmd_version_stamp(args: argparse.Namespace) -> int:
+    """为多个版本信息文件设置新版本号"""
+    from utils.version_parser import VersionParser
+    result = VersionParser(logger).stamp_versions(args.files, args.version, max_workers=args.jobs)
+    for path, error in result['failed'].items():
+        logger.error(f"{path}: {error}")
+    return 1 if result['failed'] else 0
+
+def cmd_icon(args: argparse.Namespace) -> int:
+    """将图像转换为ICO图标"""
+    from utils.icon_converter import IconConverter
+    converter = IconConverter(logger, use_cache=not args.no_cache)
+    if len(args.images) == 1 and not args.output_dir:
+        print(converter.convert_to_ico(args.images[0]))
+    else:
+        for ico_path in converter.convert_batch(args.images, args.output_dir, max_workers=args.jobs).values():
+            print(ico_path)
+    return 0
+
+def _fill_from_scan(args: argparse.Namespace) -> None:
+    """用项目扫描结果补全未在命令行中指定的打包参数"""
+    from utils.project_scanner import ProjectScanner
+    result = ProjectScanner(logger, use_index=True).scan_project(args.script)
+    if not args.venv and result['venv_dir']:
+        args.venv = [result['venv_dir']]
+    if not args.requirements and not args.venv and result['requirements']:
+        args.requirements = result['requirements']
+    args.version_file = args.version_file or result['version_file']
+    args.icon = args.icon or result['icon_file']
+    extra_files = list(args.add_data or [])
+    args.add_data = extra_files + [f for f in sorted(result['data_files']) if f not in extra_files]
+
+def cmd_build(args: argparse.Namespace) -> int:
+    """打包Python脚本，指定多个虚拟环境时并发进行矩阵打包，--watch时持续监视并自动重新打包"""
+    from utils.packager import PyInstaller
+    from utils.workpath import WorkpathManager
+    
+    if args.scan:
+        _fill_from_scan(args)
+        
+    output_dir = args.output or os.path.join(os.path.dirname(os.path.abspath(args.script)), 'dist')
+    venvs: List[Optional[str]] = list(args.venv or [])
+    if args.requirements and not venvs:
+        from utils.venv_provisioner import VenvProvisioner
+        target_dir = os.path.join(os.path.dirname(os.path.abspath(args.script)), 'venv')
+        provisioned = VenvProvisioner(logger=logger).provision(
+            args.requirements, target_dir, extra_requirements=['pyinstaller'], offline=args.offline
+        )
+        venvs = [provisioned['venv_path']]
+        
+    build_cache = None
+    if args.cache:
+        from utils.build_cache import BuildCache
+        build_cache = BuildCache(logger=logger)
+    packager = PyInstaller(logger, build_cache=build_cache, workpath_manager=WorkpathManager(logger=logger))
+    
+    if not args.watch:
+        return _run_build(args, packager, venvs, output_dir)
+        
+    from utils.watcher import BuildWatcher
+    watcher = BuildWatcher(
+        {
+            'script_path': args.script,
+            'output_dir': output_dir,
+            'venv_path': venvs[0] if venvs else None,
+            'icon_path': args.icon,
+            'extra_files': args.add_data or [],
+            'packed_files': args.pack_data or [],
+            'version_file': args.version_file
+        },
+        lambda changed: _run_build(args, packager, venvs, output_dir),
+        use_polling=args.poll,
+        logger=logger
+    )
+    try:
+        watcher.run(build_on_start=True)
+    except KeyboardInterrupt:
+        watcher.stop()
+    return 0
+
+def _run_build(args: argparse.Namespace, packager, venvs: List[Optional[str]], output_dir: str) -> int:
+    """
+    执行一次打包（监视模式下每次文件变化都会调用），图标转换和导入分析在每次打包时重新进行
+    """
+    icon_path = args.icon
+    if icon_path and not icon_path.endswith('.ico'):
+        from utils.icon_converter import IconConverter
+        icon_path = IconConverter(logger).convert_to_ico(icon_path)
+        
+    params: Dict[str, Any] = {
+        'script_path': args.script,
+        'output_dir': output_dir,
+        'onefile': not args.onedir,
+        'icon_path': icon_path,
+        'extra_files': args.add_data or [],
+        'version_file': args.version_file,
+        'hidden_imports': list(args.hidden_import or []),
+        'exclude_modules': list(args.exclude_module or []),
+        'upx': not args.noupx,
+        'strip': args.strip,
+        'optimize': args.optimize,
+        'packed_files': args.pack_data or None,
+        'stage_data': args.stage_data
+    }
+    if args.profile:
+        # 使用tune命令保存的打包配置，覆盖命令行中的对应选项
+        from utils.profile_tuner import load_profile
+        params.update(load_profile(args.profile))
+        
+    analysis = None
+    if args.analyze_imports:
+        from utils.import_analyzer import ImportAnalyzer
+        analysis = ImportAnalyzer(logger).analyze(args.script, venvs[0] if venvs else None)
+        params['hidden_imports'] += analysis['hidden_imports']
+        params['exclude_modules'] += analysis['exclude_modules']
+        
+    profiler = None
+    if args.profile_startup:
+        from utils.startup_profiler import StartupProfiler
+        profiler = StartupProfiler(logger)
+        params['runtime_hooks'] = [profiler.get_hook_path()]
+        
+    if args.server:
+        if len(venvs) > 1:
+            logger.error("提交到打包服务时只能指定一个虚拟环境")
+            return 2
+        from utils.build_server import BuildClient
+        params['venv_path'] = venvs[0] if venvs else None
+        response = BuildClient(args.server, logger=logger).submit(params, priority=args.priority)
+        if response['merged']:
+            logger.info(f"与正在进行的相同打包合并: {response['id']}")
+        result = response['result']
+    elif len(venvs) > 1:
+        matrix = packager.build_matrix(params, venvs, max_workers=args.jobs)
+        if args.dedup:
+            _dedupe_outputs(args, [r['artifact'] for r in matrix['results'] if r.get('success') and r.get('artifact')])
+        print(matrix['table'])
+        return 0 if matrix['success'] else 1
+    else:
+        result = packager.build(venv_path=venvs[0] if venvs else None, **params)
+        
+    if not result.get('success'):
+        if result.get('output'):
+            sys.stderr.write(result['output'][-4000:])
+        return 1
+        
+    if args.dedup and result.get('artifact'):
+        _dedupe_outputs(args, [result['artifact']])
+    if args.size_report and result.get('toc_dir') and not result.get('cached'):
+        from utils.size_report import SizeReporter
+        reporter = SizeReporter(logger)
+        print(reporter.format_report(reporter.report_for_build(result, venvs[0] if venvs else None, analysis)))
+    if profiler and result.get('artifact'):
+        print(profiler.format_report(profiler.profile_build(result)))
+    if result.get('artifact'):
+        print(result['artifact'])
+    return 0
+
+def _dedupe_outputs(args: argparse.Namespace, paths: List[str]) -> Dict[str, Any]:
+    """对打包产物去重，与共享存储中已有的相同文件建立链接"""
+    from utils.output_dedup import OutputDeduplicator
+    return OutputDeduplicator(store_dir=args.dedup_store, logger=logger).dedupe(paths)
+
+def cmd_dedup(args: argparse.Namespace) -> int:
+    """对已有的打包产物去重，或清理不再被引用的存储对象"""
+    from utils.output_dedup import OutputDeduplicator
+    deduplicator = OutputDeduplicator(store_dir=args.store, mode=args.mode, max_workers=args.jobs, logger=logger)
+    if args.paths:
+        result = deduplicator.dedupe(args.paths)
+        if args.json:
+            print_json(result)
+    if args.purge:
+        deduplicator.purge()
+    return 0
+
+def cmd_tune(args: argparse.Namespace) -> int:
+    """试验多种打包选项组合，按优化目标选出最佳配置"""
+    from utils.profile_tuner import ProfileTuner, save_profile
+    params = {
+        'script_path': args.script,
+        'venv_path': args.venv,
+        'extra_files': args.add_data or [],
+        'hidden_imports': args.hidden_import or []
+    }
+    result = ProfileTuner(runs=args.runs, logger=logger).tune(
+        params, objective=args.objective, run_args=args.run_arg, work_dir=args.work_dir
+    )
+    print(result['table'])
+    if args.save:
+        save_profile(result['profile'], args.save)
+        logger.info(f"打包配置已保存到: {args.save}，使用 build --profile {args.save} 打包")
+    return 0
+
+def cmd_serve(args: argparse.Namespace) -> int:
+    """启动本机打包服务，直到按下Ctrl+C或收到SIGTERM"""
+    from utils.build_server import BuildServer
+    from utils.packager import PyInstaller
+    from utils.workpath import WorkpathManager
+    build_cache = None
+    if args.cache:
+        from utils.build_cache import BuildCache
+        build_cache = BuildCache(logger=logger)
+    packager = PyInstaller(logger, build_cache=build_cache, workpath_manager=WorkpathManager(logger=logger))
+    server = BuildServer(packager, host=args.host, port=args.port, max_workers=args.jobs, logger=logger)
+    
+    # 收到SIGTERM时与Ctrl+C一样停止服务，终止正在运行的打包进程
+    import signal
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, terminate)
+    server.serve_forever()
+    return 0
+
+def check_import_budget(budget_ms: float = DEFAULT_IMPORT_BUDGET_MS) -> Dict[str, Any]:
+    """
+    在新的解释器中以-X importtime导入本模块，检查导入耗时是否超出预算以及是否导入了重量级模块。
+
+    Args:
+        budget_ms: 导入耗时预算（毫秒）
+
+    Returns:
+        Dict[str, Any]: 包含total_ms、budget_ms、heavy_modules、slowest和ok字段
+    """
+    import subprocess
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import cli'],
+        cwd=src_dir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    
+    # 每行格式为 "import time: 自身耗时 | 累计耗时 | 模块名"，单位为微秒，模块名的缩进表示嵌套层级。
+    # 子模块先于导入它的模块输出，cli之前最后一个顶层模块之后的各行即cli导入的模块
+    modules = []
+    total_us = None
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.strip() == 'cli':
+            total_us = int(cumulative_us)
+            break
+        if name.startswith('  '):
+            modules.append((name.strip(), int(self_us)))
+        else:
+            # 解释器启动时导入的顶层模块，不计入
+            modules = []
+    if total_us is None:
+        raise RuntimeError(f"未能导入cli模块: {completed.stderr.strip()[-500:]}")
+        
+    total_ms = total_us / 1000
+    heavy = sorted({name for name, _ in modules if name.split('.')[0] in HEAVY_MODULES})
+    slowest = sorted(modules, key=lambda item: item[1], reverse=True)[:10]
+    return {
+        'total_ms': total_ms,
+        'budget_ms': budget_ms,
+        'heavy_modules': heavy,
+        'slowest': [{'module': name, 'self_ms': self_us / 1000} for name, self_us in slowest],
+        'ok': total_ms <= budget_ms and not heavy
+    }
+
+def cmd_check_startup(args: argparse.Namespace) -> int:
+    """检查命令行入口的导入耗时预算"""
+    result = check_import_budget(args.budget_ms)
+    if args.json:
+        print_json(result)
+    else:
+        print(f"导入耗时: {result['total_ms']:.1f} ms（预算 {result['budget_ms']:.0f} ms）")
+        for item in result['slowest']:
+            print(f"  {item['module']:<40}{item['self_ms']:>8.2f} ms")
+        if result['heavy_modules']:
+            print(f"导入了不应加载的模块: {', '.join(result['heavy_modules'])}")
+    return 0 if result['ok'] else 1
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    构建命令行参数解析器
+    """
+    parser = argparse.ArgumentParser(prog='pyezpacker', description="Python项目打包工具（命令行模式）")
+    parser.add_argument('-v', '--verbose', action='count', default=0, help="显示调试信息")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    scan = subparsers.add_parser('scan', help="扫描项目文件")
+    scan.add_argument('script', help="主脚本路径")
+    scan.add_argument('-r', '--recursive', action='store_true', help="递归扫描子目录")
+    scan.add_argument('--index', action='store_true', help="使用扫描索引加速重复扫描")
+    scan.add_argument('--json', action='store_true', help="以JSON格式输出")
+    scan.set_defaults(func=cmd_scan)
+    
+    version = subparsers.add_parser('version', help="查看或修改版本信息文件")
+    version_commands = version.add_subparsers(dest='version_command', required=True)
+    show = version_commands.add_parser('show', help="显示版本信息")
+    show.add_argument('file', help="版本信息文件路径")
+    show.add_argument('--json', action='store_true', help="以JSON格式输出")
+    show.set_defaults(func=cmd_version_show)
+    set_fields = version_commands.add_parser('set', help="修改或新建，如 ProductName=Demo FileVersion=1.2.0.0")
+    set_fields.add_argument('file', help="版本信息文件路径")
+    set_fields.add_argument('fields', nargs='+', help="名称=值")
+    set_fields.set_defaults(func=cmd_version_set)
+    stamp = version_commands.add_parser('stamp', help="为多个版本信息文件设置新版本号")
+    stamp.add_argument('version', help="新版本号，如1.2.3.4")
+    stamp.add_argument('files', nargs='+', help="版本信息文件路径")
+    stamp.add_argument('-j', '--jobs', type=int, help="并发数")
+    stamp.set_defaults(func=cmd_version_stamp)
+    
+    icon = subparsers.add_parser('icon', help="将图像转换为ICO图标")
+    icon.add_argument('images', nargs='+', help="图像文件路径")
+    icon.add_argument('-o', '--output-dir', help="输出目录，默认生成在源文件旁边")
+    icon.add_argument('-j', '--jobs', type=int, help="批量转换的进程数")
+    icon.add_argument('--no-cache', action='store_true', help="不使用图标缓存")
+    icon.set_defaults(func=cmd_icon)
+    
+    build = subparsers.add_parser('build', help="打包Python脚本")
+    build.add_argument('script', help="主脚本路径")
+    build.add_argument('-o', '--output', help="输出目录，默认为脚本目录下的dist")
+    build.add_argument('--onedir', action='store_true', help="打包为目录而不是单个文件")
+    build.add_argument('--venv', action='append', help="虚拟环境路径，可指定多次进行矩阵打包")
+    build.add_argument('--requirements', help="根据requirements.txt自动创建虚拟环境")
+    build.add_argument('--offline', action='store_true', help="创建虚拟环境时只使用本地wheelhouse")
+    build.add_argument('--icon', help="图标文件，非ICO格式会自动转换")
+    build.add_argument('--version-file', help="版本信息文件")
+    build.add_argument('--add-data', action='append', help="额外打包的文件，可指定多次")
+    build.add_argument('--pack-data', action='append',
+                       help="合并为数据归档打包的文件或目录，程序通过pyezpacker_data模块读取，可指定多次")
+    build.add_argument('--stage-data', action='store_true',
+                       help="把额外文件预置到一个目录，只复制变化的文件，PyInstaller只添加该目录")
+    build.add_argument('--hidden-import', action='append', help="隐藏导入的模块，可指定多次")
+    build.add_argument('--exclude-module', action='append', help="排除的模块，可指定多次")
+    build.add_argument('--noupx', action='store_true', help="不使用UPX压缩")
+    build.add_argument('--strip', action='store_true', help="去除可执行文件和动态库的符号表")
+    build.add_argument('--optimize', type=int, choices=(0, 1, 2), help="字节码优化级别")
+    build.add_argument('--profile', help="使用tune命令保存的打包配置")
+    build.add_argument('--scan', action='store_true', help="根据项目扫描结果补全未指定的参数")
+    build.add_argument('--analyze-imports', action='store_true', help="分析导入关系，自动生成隐藏导入和排除模块")
+    build.add_argument('--cache', action='store_true', help="使用打包缓存，输入未变化时直接还原产物")
+    build.add_argument('--size-report', action='store_true', help="输出产物体积报告")
+    build.add_argument('--profile-startup', action='store_true', help="打包后测量产物的启动耗时")
+    build.add_argument('-j', '--jobs', type=int, help="矩阵打包的并发数")
+    build.add_argument('--watch', action='store_true', help="打包后监视项目文件，参与打包的文件变化时自动重新打包")
+    build.add_argument('--poll', action='store_true', help="监视模式下使用轮询而不是inotify")
+    build.add_argument('--dedup', action='store_true', help="打包后将产物中的重复文件替换为共享存储的链接")
+    build.add_argument('--dedup-store', help="去重使用的共享存储目录，需与产物在同一文件系统")
+    build.add_argument('--server', help="提交到打包服务执行，如http://127.0.0.1:8421")
+    build.add_argument('--priority', type=int, default=0, help="提交到打包服务时的优先级，数值越大越先执行")
+    build.set_defaults(func=cmd_build)
+    
+    dedup = subparsers.add_parser('dedup', help="对onedir产物去重，相同的文件替换为共享存储的硬链接或reflink")
+    dedup.add_argument('paths', nargs='*', help="产物目录")
+    dedup.add_argument('--store', help="共享存储目录，需与产物在同一文件系统，默认在用户缓存目录下")
+    dedup.add_argument('--mode', choices=('auto', 'hardlink', 'reflink'), default='auto', help="链接方式")
+    dedup.add_argument('--purge', action='store_true', help="清理不再被任何产物引用的存储对象")
+    dedup.add_argument('-j', '--jobs', type=int, help="计算哈希的线程数")
+    dedup.add_argument('--json', action='store_true', help="以JSON格式输出")
+    dedup.set_defaults(func=cmd_dedup)
+    
+    tune = subparsers.add_parser('tune', help="试验打包选项组合（单文件/目录、UPX、strip、字节码优化），选出最佳配置")
+    tune.add_argument('script', help="主脚本路径")
+    tune.add_argument('--objective', choices=('balanced', 'size', 'startup', 'cold-startup', 'build-time'),
+                      default='balanced', help="优化目标")
+    tune.add_argument('--runs', type=int, default=5, help="每个组合的启动次数")
+    tune.add_argument('--run-arg', action='append', help="测量启动耗时时传给程序的参数，程序需能自行退出")
+    tune.add_argument('--venv', help="虚拟环境路径")
+    tune.add_argument('--add-data', action='append', help="额外打包的文件，可指定多次")
+    tune.add_argument('--hidden-import', action='append', help="隐藏导入的模块，可指定多次")
+    tune.add_argument('--work-dir', help="保留试验产物的目录，默认使用临时目录")
+    tune.add_argument('--save', help="保存最佳配置的文件路径")
+    tune.set_defaults(func=cmd_tune)
+    
+    serve = subparsers.add_parser('serve', help="启动本机打包服务，按优先级排队并合并相同的打包请求")
+    serve.add_argument('--host', default='127.0.0.1', help="监听地址")
+    serve.add_argument('--port', type=int, default=8421, help="监听端口")
+    serve.add_argument('-j', '--jobs', type=int, help="同时运行的打包数，默认为CPU核心数")
+    serve.add_argument('--cache', action='store_true', help="使用打包缓存")
+    serve.set_defaults(func=cmd_serve)
+    
+    check = subparsers.add_parser('check-startup', help="检查命令行入口的导入耗时是否超出预算")
+    check.add_argument('--budget-ms', type=float, default=DEFAULT_IMPORT_BUDGET_MS, help="导入耗时预算（毫秒）")
+    check.add_argument('--json', action='store_true', help="以JSON格式输出")
+    check.set_defaults(func=cmd_check_startup)
+    
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口点，返回进程退出码
+    """
+    args = build_parser().parse_args(argv)
+    setup_logging(args.verbose)
+    try:
+        return args.func(args)
+    except Exception as e:
+        logger.error(str(e))
+        logger.debug("详细错误信息", exc_info=True)
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,10 +3,13 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import logging
 import os
+import queue
+import threading
 from pathlib import Path
-from PIL import Image
 import json
 
+from gui.log_handler import TextWidgetHandler
+
 class PackagerApp:
     """
     Python项目打包工具的主GUI应用程序。
@@ -34,6 +37,11 @@ class PackagerApp:
         # 初始化logger
         self.logger = logging.getLogger(__name__)
         
+        # 将日志输出到界面的日志区域
+        self.log_handler = TextWidgetHandler(self.log_text, level=logging.INFO)
+        logging.getLogger().addHandler(self.log_handler)
+        self.log_handler.start()
+        
     def setup_styles(self) -> None:
         """设置自定义样式"""
         self.style = ttk.Style()
@@ -128,11 +136,28 @@ class PackagerApp:
         self.script_path = tk.StringVar()
         self.output_dir = tk.StringVar()
         self.onefile = tk.BooleanVar(value=True)
+        self.analyze_imports = tk.BooleanVar(value=False)
+        self.profile_startup = tk.BooleanVar(value=False)
+        self.watch_mode = tk.BooleanVar(value=False)
+        self.pack_extra_files = tk.BooleanVar(value=False)
+        self.stage_extra_files = tk.BooleanVar(value=False)
         self.use_venv = tk.BooleanVar(value=False)
         self.venv_path = tk.StringVar()
+        self.provision_venv = tk.BooleanVar(value=False)
+        self.requirements_path = tk.StringVar()
         self.icon_path = tk.StringVar()
         self.version_file_path = tk.StringVar()
         self.extra_files = []
+        self.log_level = tk.StringVar(value='INFO')
+        
+        # 后台打包线程与界面线程之间的消息队列
+        self.packaging_queue = queue.Queue()
+        self.packaging_thread = None
+        self.packager = None
+        self.watcher = None
+        # 取消请求与后台线程创建监视器之间需要互斥，避免取消落在两者之间被遗漏
+        self._cancel_lock = threading.Lock()
+        self._cancel_requested = False
         
     def create_widgets(self) -> None:
         """创建所有GUI组件"""
@@ -140,10 +165,16 @@ class PackagerApp:
         self.pack_button = ttk.Button(
             self.root,
             text="开始打包",
-            command=self.start_packaging,
+            command=self.toggle_packaging,
             style="Primary.TButton"
         )
         
+        # 打包进度条（打包期间以不确定模式滚动）
+        self.progress_bar = ttk.Progressbar(
+            self.root,
+            mode='indeterminate'
+        )
+        
     def create_script_frame(self, parent: ttk.Frame) -> None:
         """
         创建主脚本选择框架
@@ -181,6 +212,21 @@ class PackagerApp:
             text="生成单文件",
             variable=self.onefile
         ).pack(anchor=tk.W)
+        ttk.Checkbutton(
+            frame,
+            text="分析导入（自动生成隐藏导入和排除模块）",
+            variable=self.analyze_imports
+        ).pack(anchor=tk.W)
+        ttk.Checkbutton(
+            frame,
+            text="打包后测量启动耗时（程序需能自行退出）",
+            variable=self.profile_startup
+        ).pack(anchor=tk.W)
+        ttk.Checkbutton(
+            frame,
+            text="打包后监视项目文件，变化时自动重新打包",
+            variable=self.watch_mode
+        ).pack(anchor=tk.W)
         frame.pack(fill=tk.X, padx=5, pady=5)
 
     def create_venv_frame(self, parent: ttk.Frame) -> None:
@@ -213,6 +259,12 @@ class PackagerApp:
         ).pack(side=tk.LEFT)
         self.venv_frame.pack(fill=tk.X, expand=True)
         
+        ttk.Checkbutton(
+            frame,
+            text="根据requirements.txt自动创建虚拟环境",
+            variable=self.provision_venv
+        ).pack(anchor=tk.W)
+        
         frame.pack(fill=tk.X, padx=5, pady=5)
 
     def create_extra_files_frame(self, parent: ttk.Frame) -> None:
@@ -245,6 +297,17 @@ class PackagerApp:
         ).pack(side=tk.LEFT, padx=2)
         btn_frame.pack(fill=tk.X)
         
+        ttk.Checkbutton(
+            frame,
+            text="合并为数据归档（程序通过pyezpacker_data模块读取）",
+            variable=self.pack_extra_files
+        ).pack(anchor=tk.W)
+        ttk.Checkbutton(
+            frame,
+            text="预置到缓存目录（只复制变化的文件）",
+            variable=self.stage_extra_files
+        ).pack(anchor=tk.W)
+        
         frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
     def create_icon_frame(self, parent: ttk.Frame) -> None:
@@ -324,6 +387,20 @@ class PackagerApp:
         """创建日志显示区域"""
         frame = ttk.LabelFrame(parent, text="日志输出", padding=5)
         
+        # 日志级别过滤
+        toolbar = ttk.Frame(frame)
+        ttk.Label(toolbar, text="日志级别").pack(side=tk.LEFT)
+        level_box = ttk.Combobox(
+            toolbar,
+            textvariable=self.log_level,
+            values=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+            state='readonly',
+            width=10
+        )
+        level_box.bind('<<ComboboxSelected>>', self.change_log_level)
+        level_box.pack(side=tk.LEFT, padx=5)
+        toolbar.pack(side=tk.TOP, fill=tk.X, pady=(0, 2))
+        
         # 自定义日志文本框样式
         self.log_text = tk.Text(
             frame,
@@ -375,9 +452,15 @@ class PackagerApp:
         
         # 日志显示区域
         self.create_log_frame(bottom_frame)
+        # 打包进度
+        self.progress_bar.pack(fill=tk.X, padx=10)
         # 打包按钮
         self.pack_button.pack(pady=5)
 
+    def change_log_level(self, event=None) -> None:
+        """切换日志区域显示的最低日志级别"""
+        self.log_handler.setLevel(getattr(logging, self.log_level.get()))
+
     def toggle_venv(self) -> None:
         """切换虚拟环境选项的状态"""
         state = 'normal' if self.use_venv.get() else 'disabled'
@@ -493,7 +576,7 @@ class PackagerApp:
         """
         try:
             from utils.project_scanner import ProjectScanner
-            scanner = ProjectScanner(self.logger)
+            scanner = ProjectScanner(self.logger, use_index=True)
             result = scanner.scan_project(script_path)
             
             # 设置默认输出目录
@@ -506,6 +589,11 @@ class PackagerApp:
                 self.venv_path.set(result['venv_dir'])
                 self.toggle_venv()
                 
+            # 记录依赖文件，没有现成的虚拟环境时默认根据它自动创建
+            self.requirements_path.set(result['requirements'] or '')
+            if result['requirements'] and not result['venv_dir']:
+                self.provision_venv.set(True)
+                
             # 设置版本信息文件
             if result['version_file']:
                 self.version_file_path.set(result['version_file'])
@@ -534,47 +622,223 @@ class PackagerApp:
         if directory:
             self.output_dir.set(directory)
             
+    def toggle_packaging(self) -> None:
+        """打包按钮的响应：空闲时开始打包，打包中则取消"""
+        if self.packaging_thread and self.packaging_thread.is_alive():
+            self.cancel_packaging()
+        else:
+            self.start_packaging()
+            
     def start_packaging(self) -> None:
-        """开始打包流程"""
+        """开始打包流程，整个打包过程在后台线程中执行，界面保持响应"""
         if not self.validate_inputs():
             return
         
+        from utils.packager import PyInstaller
+        from utils.workpath import WorkpathManager
+        
+        # tkinter变量只能在主线程中读取，先收集好打包参数
+        params = {
+            'script_path': self.script_path.get(),
+            'output_dir': self.output_dir.get(),
+            'onefile': self.onefile.get(),
+            'venv_path': self.venv_path.get() if self.use_venv.get() else None,
+            'icon_path': self.icon_path.get(),
+            'extra_files': [] if self.pack_extra_files.get() else list(self.extra_files),
+            'packed_files': list(self.extra_files) if self.pack_extra_files.get() else None,
+            'version_file': self.version_file_path.get() or None
+        }
+        analyze_imports = self.analyze_imports.get()
+        stage_data = self.stage_extra_files.get()
+        requirements = self.requirements_path.get() if self.provision_venv.get() else None
+        profile_startup = self.profile_startup.get() and os.name != 'nt'
+        watch = self.watch_mode.get()
+        
+        self.logger.info("开始打包过程...")
+        self.log_handler.clear()
+        self.pack_button.configure(text="取消打包")
+        self.progress_bar.start(15)
+        
+        self.packager = PyInstaller(self.logger, workpath_manager=WorkpathManager(logger=self.logger))
+        self._cancel_requested = False
+        self.packaging_thread = threading.Thread(
+            target=self._packaging_worker,
+            args=(self.packager, params, analyze_imports, requirements, profile_startup, watch, stage_data),
+            daemon=True
+        )
+        self.packaging_thread.start()
+        self.root.after(100, self._poll_packaging_queue)
+        
+    def cancel_packaging(self) -> None:
+        """取消正在进行的打包"""
+        with self._cancel_lock:
+            self._cancel_requested = True
+            watcher = self.watcher
+        if watcher:
+            watcher.stop()
+        if self.packager:
+            self.logger.info("正在取消打包...")
+            self.pack_button.configure(state='disabled', text="正在取消...")
+            self.packager.cancel()
+            
+    def _packaging_worker(self,
+                          packager,
+                          params: dict,
+                          analyze_imports: bool = False,
+                          requirements: Optional[str] = None,
+                          profile_startup: bool = False,
+                          watch: bool = False,
+                          stage_data: bool = False) -> None:
+        """
+        后台线程中执行的打包流程：准备虚拟环境后运行打包流水线，监视模式下持续重新打包。
+        不直接操作界面，所有输出和结果都通过队列交回主线程。
+
+        Args:
+            packager: PyInstaller封装对象
+            params: 打包参数
+            analyze_imports: 是否先分析导入关系，生成隐藏导入和排除模块
+            requirements: 未指定虚拟环境时，根据该依赖文件在项目的venv目录下创建虚拟环境
+            profile_startup: 是否加入启动耗时分析钩子，并在打包后测量产物的启动耗时
+            watch: 打包后是否监视项目文件，参与打包的文件变化时自动重新打包，直到取消
+            stage_data: 是否把额外文件预置到缓存目录，只复制变化的文件
+        """
         try:
-            from utils.packager import PyInstaller
-            from utils.icon_converter import IconConverter
+            # 根据requirements.txt准备虚拟环境（复用缓存的模板环境）
+            if requirements and not params['venv_path']:
+                from utils.venv_provisioner import VenvProvisioner
+                target_dir = os.path.join(os.path.dirname(os.path.abspath(params['script_path'])), 'venv')
+                # 打包时使用虚拟环境中的PyInstaller，需一并安装
+                provisioned = VenvProvisioner(logger=self.logger).provision(
+                    requirements, target_dir, extra_requirements=['pyinstaller']
+                )
+                params['venv_path'] = provisioned['venv_path']
             
-            self.logger.info("开始打包过程...")
-            self.pack_button.configure(state='disabled')
-            self.pack_button.configure(text="打包中...")
-            self.root.update()
+            result = self._build_once(packager, params, analyze_imports, profile_startup, stage_data)
             
-            # 转换图标（如果需要）
-            icon_path = self.icon_path.get()
-            if icon_path and not icon_path.endswith('.ico'):
-                converter = IconConverter(self.logger)
-                icon_path = converter.convert_to_ico(icon_path)
+            if watch and not result.get('cancelled'):
+                from utils.watcher import BuildWatcher
+                results = [result]
+                watcher = BuildWatcher(
+                    params,
+                    lambda changed: results.append(
+                        self._build_once(packager, params, analyze_imports, profile_startup, stage_data)
+                    ),
+                    logger=self.logger
+                )
+                # 首次打包结束到监视器创建之间收到的取消请求同样生效
+                with self._cancel_lock:
+                    if not self._cancel_requested:
+                        self.watcher = watcher
+                if self.watcher is not watcher:
+                    self.packaging_queue.put(('stopped', result))
+                    return
+                self.packaging_queue.put(('watching', None))
+                watcher.run()
+                self.packaging_queue.put(('stopped', results[-1]))
+                return
                 
-            # 准备打包参数
-            packager = PyInstaller(self.logger)
-            packager.build(
-                script_path=self.script_path.get(),
-                output_dir=self.output_dir.get(),
-                onefile=self.onefile.get(),
-                venv_path=self.venv_path.get() if self.use_venv.get() else None,
-                icon_path=icon_path,
-                extra_files=self.extra_files,
-                version_file=self.version_file_path.get() or None
-            )
-            
-            self.logger.info("打包命令已启动，请在新窗口中查看进度")
-            messagebox.showinfo("提示", "打包命令已启动，请在新窗口中查看进度")
+            self.packaging_queue.put(('done', result))
             
         except Exception as e:
             self.logger.error(f"打包过程中出现错误: {str(e)}")
-            messagebox.showerror("错误", f"打包失败: {str(e)}")
-        finally:
-            self.pack_button.configure(state='normal')
-            self.pack_button.configure(text="开始打包")
+            self.packaging_queue.put(('error', str(e)))
+            
+    def _build_once(self, packager, params: dict, analyze_imports: bool, profile_startup: bool,
+                    stage_data: bool = False) -> dict:
+        """
+        执行一次打包流水线：图标转换、版本信息、导入分析和数据预置并发进行，然后调用PyInstaller、
+        检查产物并输出报告。监视模式下每次重新打包都会调用，params中的图标保持为原始文件。
+
+        Returns:
+            dict: PyInstaller.build()的结果
+        """
+        from utils.pipeline import PackagingPipeline
+        
+        build_params = dict(params)
+        profiler = None
+        if profile_startup:
+            from utils.startup_profiler import StartupProfiler
+            profiler = StartupProfiler(self.logger)
+            build_params['runtime_hooks'] = [profiler.get_hook_path()]
+            
+        pipeline_result = PackagingPipeline(packager, logger=self.logger).run(
+            build_params,
+            analyze_imports=analyze_imports,
+            stage_data=stage_data,
+            output_callback=self.log_handler.write_line
+        )
+        result = pipeline_result.results['build'].result
+        verify = pipeline_result.results['verify']
+        if result.get('success'):
+            (self.logger.info if verify.ok else self.logger.warning)(verify.message)
+        
+        # 输出产物体积报告
+        analysis = pipeline_result.results['analyze'].report
+        if result.get('success') and result.get('toc_dir') and not result.get('cached'):
+            self._log_size_report(result, params['venv_path'], analysis)
+        if profiler and result.get('success') and result.get('artifact'):
+            self._log_startup_report(profiler, result)
+        return result
+        
+    def _log_size_report(self, result: dict, venv_path: Optional[str], analysis: Optional[dict]) -> None:
+        """生成打包产物的体积报告并输出到日志"""
+        try:
+            from utils.size_report import SizeReporter
+            reporter = SizeReporter(self.logger)
+            report = reporter.report_for_build(result, venv_path, analysis)
+            self.logger.info("产物体积报告:\n" + reporter.format_report(report))
+        except Exception as e:
+            self.logger.warning(f"生成体积报告失败: {str(e)}")
+            
+    def _log_startup_report(self, profiler, result: dict) -> None:
+        """测量打包产物的启动耗时并输出到日志"""
+        try:
+            report = profiler.profile_build(result)
+            self.logger.info(profiler.format_report(report))
+        except Exception as e:
+            self.logger.warning(f"测量启动耗时失败: {str(e)}")
+            
+    def _poll_packaging_queue(self) -> None:
+        """在主线程中定时检查打包线程是否结束（打包输出由日志处理器负责刷新）"""
+        try:
+            kind, payload = self.packaging_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self._poll_packaging_queue)
+        else:
+            if kind == 'watching':
+                # 首次打包完成，进入监视模式，打包线程继续运行直到取消
+                self.pack_button.configure(text="停止监视")
+                self.root.after(100, self._poll_packaging_queue)
+            else:
+                self._finish_packaging(kind, payload)
+            
+    def _finish_packaging(self, kind: str, payload) -> None:
+        """
+        打包结束后恢复界面状态并提示结果
+
+        Args:
+            kind: 结束类型，'done'、'stopped'（监视模式结束）或'error'
+            payload: 打包结果字典或错误信息
+        """
+        self.progress_bar.stop()
+        self.pack_button.configure(state='normal', text="开始打包")
+        self.packaging_thread = None
+        self.packager = None
+        self.watcher = None
+        
+        if kind == 'error':
+            messagebox.showerror("错误", f"打包失败: {payload}")
+        elif kind == 'stopped':
+            self.logger.info("监视模式已结束")
+        elif payload.get('returncode') is None and payload.get('success'):
+            self.logger.info("打包命令已启动，请在新窗口中查看进度")
+            messagebox.showinfo("提示", "打包命令已启动，请在新窗口中查看进度")
+        elif payload.get('cancelled'):
+            messagebox.showinfo("提示", "打包已取消")
+        elif payload.get('success'):
+            messagebox.showinfo("成功", f"打包完成，耗时 {payload['duration']:.1f} 秒\n输出目录: {payload['output_dir']}")
+        else:
+            messagebox.showerror("错误", f"打包失败，返回码 {payload['returncode']}，详情请查看日志输出")
             
     def validate_inputs(self) -> bool:
         """
@@ -0,0 +1,108 @@
+from typing import Optional
+from collections import deque
+import logging
+import tkinter as tk
+
+
+class TextWidgetHandler(logging.Handler):
+    """
+    将日志写入tkinter文本框的日志处理器。
+    日志先进入固定容量的环形缓冲区，再由界面线程按固定帧率合并写入文本框，
+    文本框超过行数上限时批量删除最旧的行，长时间打包时界面和内存占用都保持平稳。
+    """
+
+    def __init__(self,
+                 text_widget: tk.Text,
+                 max_lines: int = 5000,
+                 fps: int = 10,
+                 level: int = logging.NOTSET):
+        """
+        初始化日志处理器。
+
+        Args:
+            text_widget: 显示日志的文本框
+            max_lines: 文本框中保留的最大行数，同时也是缓冲区容量
+            fps: 每秒刷新文本框的次数
+            level: 日志级别过滤，低于该级别的记录不显示
+        """
+        super().__init__(level)
+        self.text_widget = text_widget
+        self.max_lines = max_lines
+        self.interval = max(1, 1000 // fps)
+        self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', '%H:%M:%S'))
+
+        # deque的append/popleft是线程安全的，后台线程可以直接写入；
+        # 超出容量时自动丢弃最旧的行，反正它们在刷新后也会被裁剪掉
+        self._buffer = deque(maxlen=max_lines)
+        self._after_id: Optional[str] = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """格式化日志记录并放入缓冲区（可在任意线程调用）"""
+        try:
+            self._buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+    def write_line(self, line: str) -> None:
+        """
+        直接写入一行原始文本（如PyInstaller的输出），不经过日志级别过滤。
+        可在任意线程调用。
+
+        Args:
+            line: 文本内容
+        """
+        self._buffer.append(line)
+
+    def start(self) -> None:
+        """开始定时刷新文本框"""
+        if self._after_id is None:
+            self._after_id = self.text_widget.after(self.interval, self._flush)
+
+    def clear(self) -> None:
+        """清空缓冲区和文本框"""
+        self._buffer.clear()
+        self.text_widget.delete('1.0', tk.END)
+
+    def close(self) -> None:
+        """停止刷新并关闭处理器"""
+        if self._after_id is not None:
+            try:
+                self.text_widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        super().close()
+
+    def _flush(self) -> None:
+        """把缓冲区中的所有行合并为一次插入，并按需裁剪旧行"""
+        self._after_id = None
+        lines = []
+        try:
+            while True:
+                lines.append(self._buffer.popleft())
+        except IndexError:
+            pass
+
+        if lines:
+            try:
+                # 只有视图原本停在底部时才自动滚动，方便用户翻看历史日志
+                at_bottom = self.text_widget.yview()[1] >= 1.0
+                self.text_widget.insert(tk.END, '\n'.join(lines) + '\n')
+                self._trim()
+                if at_bottom:
+                    self.text_widget.see(tk.END)
+            except tk.TclError:
+                # 窗口已销毁
+                return
+
+        self.start()
+
+    def _trim(self) -> None:
+        """
+        超出行数上限时一次性删除最旧的行。
+        允许超出上限的10%后再裁剪，避免每次刷新都删除少量行。
+        """
+        line_count = int(self.text_widget.index('end-1c').split('.')[0])
+        if line_count > self.max_lines * 1.1:
+            excess = line_count - self.max_lines
+            self.text_widget.delete('1.0', f'{excess + 1}.0')
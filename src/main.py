@@ -1,7 +1,6 @@
-import tkinter as tk
 import logging
+import sys
 from pathlib import Path
-from gui.app import PackagerApp
 
 def setup_logging() -> None:
     """
@@ -23,8 +22,16 @@ def setup_logging() -> None:
 
 def main() -> None:
     """
-    程序入口点
+    程序入口点，带命令行参数时进入命令行模式，否则启动图形界面
     """
+    if len(sys.argv) > 1:
+        # 命令行模式不加载tkinter和图形界面
+        from cli import main as cli_main
+        sys.exit(cli_main())
+        
+    import tkinter as tk
+    from gui.app import PackagerApp
+    
     # 设置日志
     setup_logging()
     
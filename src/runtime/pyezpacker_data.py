@@ -0,0 +1,138 @@
+"""
+PyEzPacker数据归档的运行时读取模块，随程序一起打包。
+
+打包时指定packed_files的文件会被合并为一个带索引的归档文件，运行时通过mmap直接访问，
+不需要解压到文件系统，读取条目也不会复制数据：
+
+    import pyezpacker_data
+    view = pyezpacker_data.get('models/weights.bin')   # memoryview，零拷贝
+    config = pyezpacker_data.read_text('config.json')
+
+目录模式（onedir）下归档就在程序目录中，直接被mmap。单文件模式（onefile）下启动器仍会先把
+归档连同其他文件一起解压到临时目录（sys._MEIPASS），再从那里mmap：读取条目仍不复制数据，
+但每次启动都有一次解压的开销，对启动耗时敏感的大量数据建议使用目录模式。
+
+未打包运行（开发时）找不到归档文件，会退回从主脚本所在目录读取同名文件。
+本模块只依赖标准库，不能导入PyEzPacker的其他模块。
+"""
+from typing import Dict, List, Optional, Tuple
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+
+# 归档格式，需与utils.data_archive保持一致：
+# 文件头为魔数、索引偏移和索引长度，之后是按8字节对齐的各条目数据，最后是JSON索引
+ARCHIVE_NAME = 'pyezpacker_data.pak'
+MAGIC = b'PYEZPAK1'
+HEADER = struct.Struct('<8sQQ')
+
+class DataArchive:
+    """通过mmap只读访问数据归档"""
+    
+    def __init__(self, archive_path: str):
+        """
+        打开归档文件。
+
+        Args:
+            archive_path: 归档文件路径
+
+        Raises:
+            ValueError: 文件不是有效的数据归档
+        """
+        self.path = archive_path
+        with open(archive_path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, index_offset, index_size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"不是有效的数据归档: {archive_path}")
+        self._view = memoryview(self._mmap)
+        index = json.loads(bytes(self._view[index_offset:index_offset + index_size]).decode('utf-8'))
+        self._index: Dict[str, Tuple[int, int]] = {name: tuple(entry) for name, entry in index.items()}
+        
+    def get(self, name: str) -> memoryview:
+        """
+        获取条目内容的只读视图，不复制数据。
+
+        Args:
+            name: 条目名称，使用/分隔目录
+
+        Returns:
+            memoryview: 条目内容
+
+        Raises:
+            KeyError: 条目不存在
+        """
+        offset, size = self._index[name]
+        return self._view[offset:offset + size]
+        
+    def names(self) -> List[str]:
+        """获取所有条目名称"""
+        return sorted(self._index)
+        
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+        
+    def close(self) -> None:
+        """关闭归档，之前返回的视图释放后才能关闭"""
+        self._view.release()
+        self._mmap.close()
+
+_archive: Optional[DataArchive] = None
+_archive_loaded = False
+_lock = threading.Lock()
+
+def _base_dir() -> str:
+    """程序的资源目录：打包后为PyInstaller的解包目录，开发时为主脚本所在目录"""
+    return getattr(sys, '_MEIPASS', None) or os.path.dirname(os.path.abspath(sys.argv[0] or '.'))
+
+def get_archive() -> Optional[DataArchive]:
+    """获取程序的数据归档，首次调用时打开，未打包运行时返回None"""
+    global _archive, _archive_loaded
+    if not _archive_loaded:
+        with _lock:
+            if not _archive_loaded:
+                archive_path = os.path.join(_base_dir(), ARCHIVE_NAME)
+                if os.path.exists(archive_path):
+                    _archive = DataArchive(archive_path)
+                _archive_loaded = True
+    return _archive
+
+def get(name: str) -> memoryview:
+    """
+    获取条目内容的只读视图。打包后不复制数据；开发时从主脚本所在目录读取同名文件。
+
+    Args:
+        name: 条目名称，使用/分隔目录
+
+    Returns:
+        memoryview: 条目内容
+    """
+    archive = get_archive()
+    if archive is not None:
+        return archive.get(name)
+    with open(os.path.join(_base_dir(), *name.split('/')), 'rb') as f:
+        return memoryview(f.read())
+
+def read_bytes(name: str) -> bytes:
+    """读取条目内容（会复制一份数据）"""
+    return bytes(get(name))
+
+def read_text(name: str, encoding: str = 'utf-8') -> str:
+    """以文本形式读取条目内容"""
+    return str(get(name), encoding)
+
+def exists(name: str) -> bool:
+    """判断条目是否存在"""
+    archive = get_archive()
+    if archive is not None:
+        return name in archive
+    return os.path.isfile(os.path.join(_base_dir(), *name.split('/')))
+
+def names() -> List[str]:
+    """获取归档中的所有条目名称，未打包运行时返回空列表"""
+    archive = get_archive()
+    return archive.names() if archive is not None else []
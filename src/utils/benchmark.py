@@ -0,0 +1,364 @@
+from typing import Any, Callable, Dict, List, Optional
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from utils.cache_utils import CACHE_DIR_ENV, get_cache_dir
+
+# 默认的合成项目规模
+DEFAULT_PROJECT_CONFIG = {
+    'files': 200,
+    'depth': 3,
+    'fanout': 5,
+    'data_files': 20,
+    'data_size_kb': 64,
+    'seed': 0
+}
+
+# 默认的回归阈值：比基线慢20%以上视为回归
+DEFAULT_THRESHOLD = 0.2
+
+# 耗时差值小于该值（秒）时不判定为回归，避免极短的基准受计时抖动影响
+_MIN_REGRESSION_DELTA = 0.005
+
+# 版本解析等很快的操作在一次测量中重复执行的次数
+_FAST_LOOP = 200
+
+def generate_project(root: str, config: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    生成用于基准测试的合成项目。
+
+    项目包含按层级分布在多个包中的Python模块，每个模块导入若干个编号更小的模块，
+    以及data目录下的数据文件、版本信息文件、图标和requirements.txt。
+
+    Args:
+        root: 项目目录，已存在时会被清空
+        config: 项目规模，可包含files（模块数）、depth（包的嵌套深度）、fanout（每个模块的导入数）、
+            data_files（数据文件数）、data_size_kb（每个数据文件的大小）、seed（随机种子）
+
+    Returns:
+        Dict[str, str]: 包含project_dir、main_script、version_file、icon_file、requirements的路径字典
+    """
+    config = dict(DEFAULT_PROJECT_CONFIG, **(config or {}))
+    rng = random.Random(config['seed'])
+    root_path = Path(root)
+    shutil.rmtree(root_path, ignore_errors=True)
+    root_path.mkdir(parents=True)
+    
+    # 模块i位于pkg<i % 宽度>/sub0/sub1/...中，嵌套层数为i % depth
+    width = max(1, config['files'] // (config['depth'] * 10))
+    modules = []
+    for i in range(config['files']):
+        parts = [f'pkg{i % width}'] + [f'sub{level}' for level in range(i % max(1, config['depth']))]
+        package_dir = root_path.joinpath(*parts)
+        if not package_dir.exists():
+            package_dir.mkdir(parents=True)
+            for level in range(1, len(parts) + 1):
+                root_path.joinpath(*parts[:level], '__init__.py').touch()
+        module = '.'.join(parts + [f'mod{i}'])
+        imports = rng.sample(modules, min(config['fanout'], len(modules)))
+        lines = [f'import {name}' for name in imports]
+        lines += [
+            '',
+            f'def func{i}(value):',
+            f'    """合成模块{i}"""',
+            f'    return value + {i}',
+            ''
+        ]
+        (package_dir / f'mod{i}.py').write_text('\n'.join(lines), encoding='utf-8')
+        modules.append(module)
+        
+    # 主脚本导入编号最大的几个模块，通过它们间接覆盖大部分模块
+    entry_modules = modules[-max(1, config['fanout']):]
+    main_lines = [f'import {name}' for name in entry_modules]
+    main_lines += ['', "if __name__ == '__main__':", "    print('ok')", '']
+    main_script = root_path / 'main.py'
+    main_script.write_text('\n'.join(main_lines), encoding='utf-8')
+    
+    data_dir = root_path / 'data'
+    for i in range(config['data_files']):
+        sub_dir = data_dir / f'set{i % 4}'
+        sub_dir.mkdir(parents=True, exist_ok=True)
+        (sub_dir / f'data{i}.json').write_bytes(rng.randbytes(config['data_size_kb'] * 1024))
+        
+    from utils.version_parser import VersionParser
+    version_file = root_path / 'versionmark.txt'
+    VersionParser().save_version_file(str(version_file), {
+        'CompanyName': 'Benchmark',
+        'FileDescription': 'Synthetic project',
+        'FileVersion': '1.0.0.0',
+        'LegalCopyright': 'Benchmark',
+        'ProductName': 'Synthetic',
+        'ProductVersion': '1.0.0.0'
+    })
+    
+    from PIL import Image
+    icon_file = root_path / 'icon.png'
+    Image.new('RGBA', (1024, 1024), (30, 120, 200, 255)).save(icon_file)
+    
+    requirements = root_path / 'requirements.txt'
+    requirements.write_text('', encoding='utf-8')
+    (root_path / '.gitignore').write_text('build/\ndist/\n', encoding='utf-8')
+    
+    return {
+        'project_dir': str(root_path),
+        'main_script': str(main_script),
+        'version_file': str(version_file),
+        'icon_file': str(icon_file),
+        'requirements': str(requirements)
+    }
+
+class BenchmarkRunner:
+    """
+    基准测试运行器。
+    在合成项目上测量项目扫描、版本信息解析与保存、图标转换、导入分析以及（Linux下）
+    完整打包的耗时，结果可保存为基线，并与基线比较找出性能回归。
+    运行期间缓存目录指向临时目录，不影响用户的正式缓存。
+    """
+    
+    def __init__(self,
+                 project_config: Optional[Dict[str, Any]] = None,
+                 repeat: int = 5,
+                 work_dir: Optional[str] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化基准测试运行器。
+
+        Args:
+            project_config: 合成项目规模，见generate_project
+            repeat: 每个基准的重复次数
+            work_dir: 生成项目和临时缓存的目录，默认为临时目录
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.project_config = dict(DEFAULT_PROJECT_CONFIG, **(project_config or {}))
+        self.repeat = repeat
+        self.work_dir = work_dir
+        
+    def run(self, include_build: bool = False, names: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        运行基准测试。
+
+        Args:
+            include_build: 是否包含完整打包（仅Linux/Mac，耗时较长）
+            names: 只运行指定名称的基准，默认运行全部
+
+        Returns:
+            Dict[str, Any]: 包含config（项目规模）、python、results（基准名称到统计结果的映射）的字典，
+            统计结果包含median、min、max和runs（每次耗时）
+        """
+        work_dir = Path(self.work_dir or tempfile.mkdtemp(prefix='pyezpacker-bench-'))
+        old_cache_dir = os.environ.get(CACHE_DIR_ENV)
+        os.environ[CACHE_DIR_ENV] = str(work_dir / 'cache')
+        try:
+            self.logger.info(f"生成合成项目: {self.project_config}")
+            project = generate_project(str(work_dir / 'project'), self.project_config)
+            benchmarks = self._get_benchmarks(project, work_dir, include_build)
+            
+            results = {}
+            for name, (setup, func) in benchmarks.items():
+                if names and name not in names:
+                    continue
+                results[name] = self._measure(name, setup, func)
+        finally:
+            if old_cache_dir is None:
+                os.environ.pop(CACHE_DIR_ENV, None)
+            else:
+                os.environ[CACHE_DIR_ENV] = old_cache_dir
+            if not self.work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                
+        return {
+            'config': self.project_config,
+            'python': sys.version.split()[0],
+            'results': results
+        }
+        
+    def save_baseline(self, run_result: Dict[str, Any], baseline_path: Optional[str] = None) -> str:
+        """
+        保存基准测试结果作为基线。
+
+        Args:
+            run_result: run()的返回值
+            baseline_path: 基线文件路径，默认为用户缓存目录下的benchmarks/baseline.json
+
+        Returns:
+            str: 基线文件路径
+        """
+        path = Path(baseline_path) if baseline_path else get_cache_dir('benchmarks') / 'baseline.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(run_result, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.logger.info(f"基线已保存: {path}")
+        return str(path)
+        
+    def load_baseline(self, baseline_path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取基线，不存在时返回None。
+
+        Args:
+            baseline_path: 基线文件路径，默认为用户缓存目录下的benchmarks/baseline.json
+        """
+        path = Path(baseline_path) if baseline_path else get_cache_dir('benchmarks') / 'baseline.json'
+        try:
+            return json.loads(path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            return None
+            
+    def compare(self,
+                run_result: Dict[str, Any],
+                baseline: Dict[str, Any],
+                threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+        """
+        与基线比较，找出变慢超过阈值的基准。
+
+        Args:
+            run_result: run()的返回值
+            baseline: 基线结果
+            threshold: 回归阈值，0.2表示中位数比基线慢20%以上
+
+        Returns:
+            List[Dict[str, Any]]: 每个共同基准的比较结果，包含name、baseline、current、ratio和regression
+        """
+        if baseline.get('config') != run_result['config']:
+            self.logger.warning("基线的项目规模与本次不同，比较结果仅供参考")
+            
+        comparison = []
+        for name, current in run_result['results'].items():
+            base = baseline.get('results', {}).get(name)
+            if not base:
+                continue
+            ratio = current['median'] / base['median'] if base['median'] else float('inf')
+            regression = (ratio > 1 + threshold
+                          and current['median'] - base['median'] > _MIN_REGRESSION_DELTA)
+            comparison.append({
+                'name': name,
+                'baseline': base['median'],
+                'current': current['median'],
+                'ratio': ratio,
+                'regression': regression
+            })
+        return comparison
+        
+    def format_results(self,
+                       run_result: Dict[str, Any],
+                       comparison: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        生成可读的基准测试结果文本。
+
+        Args:
+            run_result: run()的返回值
+            comparison: compare()的返回值，提供时附带与基线的对比
+
+        Returns:
+            str: 结果文本
+        """
+        compared = {item['name']: item for item in comparison or []}
+        lines = [f"{'基准':<24}{'中位数(ms)':>12}{'最小(ms)':>12}{'基线(ms)':>12}{'变化':>10}"]
+        for name, result in run_result['results'].items():
+            line = f"{name:<24}{result['median'] * 1000:>12.2f}{result['min'] * 1000:>12.2f}"
+            item = compared.get(name)
+            if item:
+                line += f"{item['baseline'] * 1000:>12.2f}{item['ratio'] - 1:>+10.1%}"
+                if item['regression']:
+                    line += '  回归'
+            lines.append(line)
+        return '\n'.join(lines)
+        
+    def _measure(self, name: str, setup: Optional[Callable[[], None]], func: Callable[[], Any]) -> Dict[str, Any]:
+        """重复执行基准并统计耗时，setup在每次计时前执行且不计入耗时"""
+        runs = []
+        for _ in range(self.repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            runs.append(time.perf_counter() - start)
+        self.logger.info(f"基准 {name}: 中位数 {statistics.median(runs) * 1000:.2f} ms")
+        return {
+            'median': statistics.median(runs),
+            'min': min(runs),
+            'max': max(runs),
+            'runs': runs
+        }
+        
+    def _get_benchmarks(self,
+                        project: Dict[str, str],
+                        work_dir: Path,
+                        include_build: bool) -> Dict[str, Any]:
+        """构造基准列表：名称到(setup, func)的映射"""
+        from utils.icon_converter import IconConverter
+        from utils.import_analyzer import ImportAnalyzer
+        from utils.project_scanner import ProjectScanner
+        from utils.version_parser import VersionParser
+        
+        quiet = logging.getLogger('pyezpacker.benchmark.quiet')
+        quiet.setLevel(logging.CRITICAL)
+        quiet.propagate = False
+        main_script = project['main_script']
+        version_file = project['version_file']
+        parser = VersionParser(quiet)
+        version_info = parser.parse_version_file(version_file)
+        icon_cache = work_dir / 'cache' / 'icons'
+        index_dir = work_dir / 'cache' / 'scan-index'
+        
+        def parse_versions() -> None:
+            for _ in range(_FAST_LOOP):
+                parser.parse_version_file(version_file)
+                
+        def save_versions() -> None:
+            for i in range(_FAST_LOOP):
+                version_info['FileVersion'] = f'1.0.0.{i}'
+                parser.save_version_file(version_file, version_info)
+                
+        benchmarks = {
+            'scan_flat': (None, lambda: ProjectScanner(quiet).scan_project(main_script)),
+            'scan_recursive': (None, lambda: ProjectScanner(quiet).scan_project(main_script, recursive=True)),
+            'scan_recursive_cold_index': (
+                lambda: shutil.rmtree(index_dir, ignore_errors=True),
+                lambda: ProjectScanner(quiet, use_index=True).scan_project(main_script, recursive=True)
+            ),
+            'scan_recursive_warm_index': (
+                None,
+                lambda: ProjectScanner(quiet, use_index=True).scan_project(main_script, recursive=True)
+            ),
+            'version_parse_x200': (None, parse_versions),
+            'version_save_x200': (None, save_versions),
+            'icon_convert': (
+                lambda: shutil.rmtree(icon_cache, ignore_errors=True),
+                lambda: IconConverter(quiet).convert_to_ico(project['icon_file'])
+            ),
+            'icon_convert_cached': (None, lambda: IconConverter(quiet).convert_to_ico(project['icon_file'])),
+            'import_analysis': (None, lambda: ImportAnalyzer(quiet).analyze(main_script, follow_third_party=False))
+        }
+        
+        if include_build and os.name != 'nt':
+            from utils.packager import PyInstaller
+            from utils.workpath import WorkpathManager
+            workpaths = work_dir / 'workpaths'
+            output_dir = str(work_dir / 'dist')
+            
+            def clean_build() -> None:
+                shutil.rmtree(workpaths, ignore_errors=True)
+                shutil.rmtree(output_dir, ignore_errors=True)
+                
+            def build() -> None:
+                packager = PyInstaller(
+                    quiet,
+                    workpath_manager=WorkpathManager(str(workpaths), logger=quiet),
+                    metrics_path=str(work_dir / 'build_metrics.jsonl')
+                )
+                result = packager.build(main_script, output_dir, version_file=version_file)
+                if not result['success']:
+                    raise RuntimeError(f"基准打包失败:\n{result['output'][-2000:]}")
+                    
+            benchmarks['build_cold'] = (clean_build, build)
+            benchmarks['build_warm'] = (None, build)
+            
+        return benchmarks
@@ -0,0 +1,432 @@
+from typing import Any, Dict, Iterator, List, Optional, Set
+from contextlib import contextmanager
+import ast
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+import tempfile
+import time
+from pathlib import Path
+
+from utils.cache_utils import file_lock, get_cache_dir, hash_file
+from utils.data_archive import iter_data_entries
+
+# 这些参数只影响输出/中间文件的位置，不影响产物内容，计算缓存键时忽略
+_LOCATION_OPTIONS = {'--distpath', '--workpath', '--specpath'}
+
+# 参数值是文件路径的选项，文件内容单独参与哈希，这里只保留文件名
+_PATH_OPTIONS = {'--icon', '--version-file', '--runtime-hook', '--paths'}
+
+
+def normalize_options(options: List[str], script_path: str) -> List[str]:
+    """
+    去掉PyInstaller参数中与产物内容无关的路径信息，使同一输入在不同目录下得到相同的结果。
+
+    Args:
+        options: PyInstaller命令参数（不含解释器路径）
+        script_path: 主脚本路径
+
+    Returns:
+        List[str]: 规范化后的参数列表
+    """
+    normalized = []
+    skip_next = False
+    for i, option in enumerate(options):
+        if skip_next:
+            skip_next = False
+            continue
+        if option in _LOCATION_OPTIONS:
+            skip_next = True
+            continue
+        previous = options[i - 1] if i else ''
+        if previous in _PATH_OPTIONS:
+            option = os.path.basename(option)
+        elif previous == '--add-data':
+            source, _, dest = option.rpartition(os.pathsep)
+            option = f'{os.path.basename(source)}{os.pathsep}{dest}'
+        elif option in (script_path, os.path.abspath(script_path)):
+            option = os.path.basename(option)
+        normalized.append(option)
+    return normalized
+
+
+class BuildCache:
+    """
+    基于内容寻址的打包产物缓存。
+    以影响打包结果的全部输入计算缓存键，键命中时直接还原已缓存的产物，跳过PyInstaller。
+    缓存总大小受限，超出时按最近最少使用（LRU）顺序淘汰。
+    多个进程可以共用同一缓存目录：修改索引前在文件锁内重新读取磁盘上的索引，再合并写回。
+    """
+
+    def __init__(self,
+                 cache_dir: Optional[str] = None,
+                 max_size: int = 5 * 1024 ** 3,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化打包缓存。
+
+        Args:
+            cache_dir: 缓存目录，默认为用户缓存目录下的build-cache
+            max_size: 缓存总大小上限（字节）
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.cache_dir = Path(cache_dir) if cache_dir else get_cache_dir('build-cache')
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+
+        self._lock = threading.Lock()
+        self._index_path = self.cache_dir / 'index.json'
+        self._index_lock_path = self.cache_dir / 'index.lock'
+        self._index = self._load_index()
+        self._interpreters: Dict[str, Dict[str, Any]] = {}
+
+    def compute_key(self,
+                    argv: List[str],
+                    script_path: str,
+                    extra_files: Optional[List[str]] = None,
+                    icon_path: Optional[str] = None,
+                    version_file: Optional[str] = None,
+                    runtime_hooks: Optional[List[str]] = None,
+                    data_digest: Optional[str] = None) -> str:
+        """
+        计算打包输入的缓存键。
+
+        缓存键覆盖：主脚本及其导入的项目内Python文件、额外文件、图标、版本信息文件、
+        运行时钩子、规范化后的命令行参数、解释器和PyInstaller的版本，以及依赖环境中已安装的包及其版本。
+
+        Args:
+            argv: PyInstaller命令参数列表，argv[0]为使用的Python解释器
+            script_path: 主脚本路径
+            extra_files: 额外打包的文件
+            icon_path: 图标文件路径
+            version_file: 版本信息文件路径
+            runtime_hooks: 运行时钩子脚本路径
+            data_digest: 已预置的数据文件的内容摘要（DataStager.stage()的digest），
+                指定时不再读取预置目录中的文件
+
+        Returns:
+            str: 十六进制缓存键
+        """
+        hasher = hashlib.sha256()
+        interpreter = self._get_interpreter_info(argv[0])
+        hasher.update(interpreter['version'].encode('utf-8'))
+        # 依赖环境中安装的包及版本，升级或安装包后不会命中旧产物
+        for distribution in self._list_distributions(interpreter['site_dirs']):
+            hasher.update(f'dist\0{distribution}\n'.encode('utf-8'))
+        hasher.update(json.dumps(normalize_options(argv[1:], script_path)).encode('utf-8'))
+
+        project_dir = os.path.dirname(os.path.abspath(script_path))
+        for source in sorted(self._collect_local_imports(script_path)):
+            self._hash_input(hasher, 'source', os.path.relpath(source, project_dir), source)
+        for file in extra_files or []:
+            self._hash_input(hasher, 'data', os.path.basename(file), file)
+        if icon_path:
+            self._hash_input(hasher, 'icon', '', icon_path)
+        if version_file:
+            self._hash_input(hasher, 'version', '', version_file)
+        for hook in runtime_hooks or []:
+            self._hash_input(hasher, 'hook', os.path.basename(hook), hook)
+        if data_digest:
+            hasher.update(f'staged\0\0{data_digest}\n'.encode('utf-8'))
+
+        return hasher.hexdigest()
+
+    def restore(self, key: str, output_dir: str) -> Optional[List[str]]:
+        """
+        将缓存的产物还原到输出目录。
+
+        Args:
+            key: 缓存键
+            output_dir: 输出目录
+
+        Returns:
+            Optional[List[str]]: 还原出的产物路径；未命中时返回None
+        """
+        with self._locked_index():
+            entry = self._index.get(key)
+            entry_dir = self.cache_dir / 'objects' / key
+            if not entry or not entry_dir.exists():
+                self.stats['misses'] += 1
+                self._index.pop(key, None)
+                self.logger.info(f"打包缓存未命中: {key[:12]}")
+                return None
+
+            # 复制期间持有锁，避免条目被本进程或其他进程的store()淘汰；
+            # 先复制到输出目录中的临时路径，完成后再替换，输出目录中不会出现不完整的产物
+            os.makedirs(output_dir, exist_ok=True)
+            restored = []
+            for name in entry['artifacts']:
+                source = entry_dir / name
+                target = os.path.join(output_dir, name)
+                temp_target = os.path.join(output_dir, f'.{name}.restore-{os.getpid()}-{threading.get_ident()}')
+                try:
+                    if source.is_dir():
+                        shutil.copytree(source, temp_target, symlinks=True)
+                    else:
+                        shutil.copy2(source, temp_target)
+                    self._remove_path(target)
+                    os.replace(temp_target, target)
+                except OSError as e:
+                    self._remove_path(temp_target)
+                    self.stats['misses'] += 1
+                    self.logger.warning(f"还原打包缓存失败，重新打包: {key[:12]} ({str(e)})")
+                    return None
+                restored.append(target)
+
+            entry['last_used'] = time.time()
+            self.stats['hits'] += 1
+
+        self.logger.info(f"打包缓存命中: {key[:12]}，已还原 {len(restored)} 个产物到 {output_dir}")
+        return restored
+
+    def store(self, key: str, artifact_paths: List[str]) -> None:
+        """
+        将打包产物存入缓存，并在超出大小上限时淘汰旧条目。
+
+        Args:
+            key: 缓存键
+            artifact_paths: 产物路径（单文件或目录）
+        """
+        objects_dir = self.cache_dir / 'objects'
+        objects_dir.mkdir(exist_ok=True)
+        entry_dir = objects_dir / key
+        # 先写入临时目录，完成后再重命名，避免并发打包读到不完整的条目
+        staging_dir = Path(tempfile.mkdtemp(prefix=f'.{key[:12]}-', dir=objects_dir))
+
+        try:
+            for path in artifact_paths:
+                target = staging_dir / os.path.basename(path)
+                if os.path.isdir(path):
+                    shutil.copytree(path, target, symlinks=True)
+                else:
+                    shutil.copy2(path, target)
+        except Exception:
+            self._remove_path(str(staging_dir))
+            raise
+
+        size = self._get_size(staging_dir)
+        if size > self.max_size:
+            self._remove_path(str(staging_dir))
+            self.logger.warning(f"产物大小超过缓存上限，不缓存: {key[:12]}")
+            return
+
+        with self._locked_index():
+            self._remove_path(str(entry_dir))
+            staging_dir.rename(entry_dir)
+            self._index[key] = {
+                'artifacts': [os.path.basename(path) for path in artifact_paths],
+                'size': size,
+                'created': time.time(),
+                'last_used': time.time()
+            }
+            self.stats['stores'] += 1
+            self._evict()
+
+        self.logger.info(f"打包产物已缓存: {key[:12]} ({size / 1024 / 1024:.1f} MB)")
+
+    def report(self) -> Dict[str, Any]:
+        """
+        获取缓存命中统计。
+
+        Returns:
+            Dict[str, Any]: 命中、未命中、写入、淘汰次数，以及条目数和占用大小
+        """
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+                'entries': len(self._index),
+                'size': sum(entry['size'] for entry in self._index.values()),
+                'max_size': self.max_size
+            }
+
+    def format_report(self) -> str:
+        """生成可读的缓存命中报告"""
+        report = self.report()
+        return (
+            f"打包缓存: 命中 {report['hits']} 次，未命中 {report['misses']} 次"
+            f"（命中率 {report['hit_rate']:.0%}），"
+            f"条目 {report['entries']} 个，"
+            f"占用 {report['size'] / 1024 / 1024:.1f}/{report['max_size'] / 1024 / 1024:.0f} MB，"
+            f"淘汰 {report['evictions']} 次"
+        )
+
+    @contextmanager
+    def _locked_index(self) -> Iterator[None]:
+        """
+        在线程锁和文件锁内读取磁盘上的最新索引，退出时写回。
+        其他进程写入的条目不会被本进程内存中的旧索引覆盖。
+        """
+        with self._lock, file_lock(str(self._index_lock_path)):
+            self._index = self._load_index()
+            try:
+                yield
+            finally:
+                self._save_index()
+
+    def _evict(self) -> None:
+        """
+        按最近使用时间淘汰条目，直到总大小不超过上限；同时删除没有索引条目的对象目录
+        （调用方需通过_locked_index()持有锁）
+        """
+        objects_dir = self.cache_dir / 'objects'
+        for entry_dir in objects_dir.iterdir():
+            # 以.开头的是store()正在写入的临时目录
+            if not entry_dir.name.startswith('.') and entry_dir.name not in self._index:
+                self._remove_path(str(entry_dir))
+                self.logger.info(f"删除没有索引的打包缓存对象: {entry_dir.name[:12]}")
+
+        total = sum(entry['size'] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]['last_used']):
+            if total <= self.max_size:
+                break
+            total -= self._index.pop(key)['size']
+            self._remove_path(str(self.cache_dir / 'objects' / key))
+            self.stats['evictions'] += 1
+            self.logger.info(f"淘汰打包缓存条目: {key[:12]}")
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """读取缓存索引，索引损坏时视为空缓存"""
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (ValueError, OSError) as e:
+            self.logger.warning(f"打包缓存索引无法读取，将重新建立: {str(e)}")
+            return {}
+
+    def _save_index(self) -> None:
+        """原子地写入缓存索引（调用方需持有锁）"""
+        fd, tmp_path = tempfile.mkstemp(prefix='index-', suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self._index_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _get_interpreter_info(self, python: str) -> Dict[str, Any]:
+        """
+        获取解释器和PyInstaller的版本信息，以及解释器的模块搜索目录，同一解释器只查询一次。
+        已安装的包在每次计算缓存键时重新列出，见_list_distributions。
+        """
+        if python not in self._interpreters:
+            completed = subprocess.run(
+                [python, '-c', (
+                    'import json, os, sys, PyInstaller; print(json.dumps({'
+                    '"version": sys.version + "\\n" + PyInstaller.__version__, '
+                    '"site_dirs": [p for p in sys.path if p and os.path.isdir(p)]}))'
+                )],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                encoding='utf-8'
+            )
+            try:
+                self._interpreters[python] = json.loads(completed.stdout)
+            except ValueError:
+                self._interpreters[python] = {'version': '', 'site_dirs': []}
+        return self._interpreters[python]
+
+    def _list_distributions(self, site_dirs: List[str]) -> List[str]:
+        """列出模块搜索目录中已安装的包（*.dist-info和*.egg-info的目录名包含包名和版本）"""
+        distributions = set()
+        for site_dir in site_dirs:
+            try:
+                entries = os.listdir(site_dir)
+            except OSError:
+                continue
+            distributions.update(
+                entry.lower() for entry in entries if entry.endswith(('.dist-info', '.egg-info'))
+            )
+        return sorted(distributions)
+
+    def _collect_local_imports(self, script_path: str) -> Set[str]:
+        """
+        从主脚本出发收集其直接或间接导入的项目内Python文件。
+        只解析主脚本所在目录下能找到的模块，第三方包由解释器版本和依赖环境决定。
+        """
+        project_dir = os.path.dirname(os.path.abspath(script_path))
+        pending = [os.path.abspath(script_path)]
+        visited: Set[str] = set()
+
+        while pending:
+            file_path = pending.pop()
+            if file_path in visited:
+                continue
+            visited.add(file_path)
+
+            try:
+                with open(file_path, 'rb') as f:
+                    tree = ast.parse(f.read(), filename=file_path)
+            except (OSError, SyntaxError, ValueError):
+                continue
+
+            for module in self._iter_imported_modules(tree, file_path, project_dir):
+                parts = module.split('.')
+                for depth in range(1, len(parts) + 1):
+                    base = os.path.join(project_dir, *parts[:depth])
+                    for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+                        if os.path.isfile(candidate) and candidate not in visited:
+                            pending.append(candidate)
+
+        return visited
+
+    def _iter_imported_modules(self, tree: ast.AST, file_path: str, project_dir: str):
+        """遍历语法树中的导入语句，生成相对于项目目录的模块名"""
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    yield alias.name
+            elif isinstance(node, ast.ImportFrom):
+                if node.level:
+                    # 相对导入：先换算出当前包相对于项目目录的路径
+                    package_dir = os.path.dirname(file_path)
+                    for _ in range(node.level - 1):
+                        package_dir = os.path.dirname(package_dir)
+                    package = os.path.relpath(package_dir, project_dir)
+                    prefix = '' if package == os.curdir else package.replace(os.sep, '.') + '.'
+                else:
+                    prefix = ''
+                module = prefix + (node.module or '')
+                if module:
+                    yield module
+                for alias in node.names:
+                    yield f'{module}.{alias.name}' if module else prefix + alias.name
+
+    def _hash_input(self, hasher: 'hashlib._Hash', kind: str, name: str, file_path: str) -> None:
+        """
+        把一个输入文件的类型、名称和内容摘要追加到缓存键中。
+        输入是目录时（如--add-data的目录）逐个追加其中文件的相对路径和内容摘要。
+        """
+        if os.path.isdir(file_path):
+            for entry_name, entry_path in sorted(iter_data_entries([file_path])):
+                hasher.update(f'{kind}\0{name}/{entry_name}\0{hash_file(entry_path)}\n'.encode('utf-8'))
+            return
+        digest = hash_file(file_path) if os.path.exists(file_path) else 'missing'
+        hasher.update(f'{kind}\0{name}\0{digest}\n'.encode('utf-8'))
+
+    def _get_size(self, path: Path) -> int:
+        """计算目录下所有文件的总大小"""
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                file_path = os.path.join(root, name)
+                if not os.path.islink(file_path):
+                    total += os.path.getsize(file_path)
+        return total
+
+    def _remove_path(self, path: str) -> None:
+        """删除文件或目录（不存在时忽略）"""
+        if os.path.islink(path) or os.path.isfile(path):
+            os.remove(path)
+        elif os.path.isdir(path):
+            shutil.rmtree(path)
@@ -0,0 +1,274 @@
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+# 默认的指标记录文件名，与packager.log位于同一logs目录，每次打包追加一行JSON
+DEFAULT_METRICS_FILE = 'build_metrics.jsonl'
+
+# PyInstaller日志行开头是自启动以来的毫秒数，如"8224 INFO: checking PYZ"
+_LOG_LINE_PATTERN = re.compile(r'^(\d+) (?:DEBUG|INFO|WARNING|ERROR|CRITICAL): (.*)$')
+
+# 每个打包阶段以"checking <阶段>"开始
+_PHASE_PATTERN = re.compile(r'^checking (\w+)$')
+
+# UPX压缩单个文件时输出的命令行
+_UPX_PATTERN = re.compile(r'^Executing: \S*upx(?:\.exe)?\s')
+
+# 采样进程树的时间间隔（秒）
+DEFAULT_SAMPLE_INTERVAL = 0.2
+
+# /proc中CPU时间以时钟周期为单位，内存以页为单位
+_CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+_write_lock = threading.Lock()
+
+class BuildMonitor:
+    """
+    单次PyInstaller运行的监控器。
+    解析PyInstaller的输出得到各阶段（Analysis、PYZ、PKG、EXE/COLLECT及UPX压缩）的耗时，
+    并在打包期间定期从/proc采样整个进程树的CPU时间、内存和读写量。
+    没有/proc的平台（Windows、macOS）只统计阶段耗时。
+    """
+    
+    def __init__(self,
+                 pid: int,
+                 interval: float = DEFAULT_SAMPLE_INTERVAL,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化监控器。
+
+        Args:
+            pid: PyInstaller进程的PID
+            interval: 采样间隔（秒）
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.pid = pid
+        self.interval = interval
+        self.sampling = os.path.isdir(f'/proc/{pid}')
+        
+        self._start = time.perf_counter()
+        self._phases: Dict[str, float] = {}
+        self._current_phase = 'Startup'
+        self._phase_start = 0.0
+        self._resume_phase: Optional[str] = None
+        self._last_time = 0.0
+        
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._samples = 0
+        self._peak_rss = 0
+        self._cpu_ticks = 0
+        # 按PID记录各进程最后一次采样的读写量，进程退出后仍计入总量
+        self._io: Dict[int, Dict[str, int]] = {}
+        
+    def start(self) -> None:
+        """开始后台采样"""
+        if self.sampling:
+            self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+            self._thread.start()
+            
+    def feed_line(self, line: str) -> None:
+        """
+        处理PyInstaller的一行输出，识别阶段切换。
+
+        Args:
+            line: 输出行
+        """
+        match = _LOG_LINE_PATTERN.match(line.strip())
+        if not match:
+            return
+        # 优先使用PyInstaller自身的时间戳，不受管道缓冲影响
+        timestamp = int(match.group(1)) / 1000
+        message = match.group(2)
+        self._last_time = timestamp
+        
+        phase = _PHASE_PATTERN.match(message)
+        if phase:
+            self._resume_phase = None
+            self._switch_phase(phase.group(1), timestamp)
+        elif _UPX_PATTERN.match(message):
+            # UPX压缩穿插在PKG、EXE、COLLECT阶段中，单独计时并从所属阶段中扣除
+            if self._current_phase != 'UPX':
+                self._resume_phase = self._current_phase
+                self._switch_phase('UPX', timestamp)
+        elif self._current_phase == 'UPX' and self._resume_phase:
+            self._switch_phase(self._resume_phase, timestamp)
+            self._resume_phase = None
+            
+    def stop(self, returncode: Optional[int]) -> Dict[str, Any]:
+        """
+        停止采样并汇总指标。
+
+        Args:
+            returncode: PyInstaller进程的返回码
+
+        Returns:
+            Dict[str, Any]: 包含phases（各阶段耗时）、duration、cpu_seconds、
+            cpu_percent、peak_rss_bytes、io等字段的指标字典
+        """
+        duration = time.perf_counter() - self._start
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+        # 最后一行输出之后到进程退出的时间计入最后一个阶段
+        self._switch_phase(None, max(self._last_time, duration))
+        
+        cpu_seconds = self._cpu_ticks / _CLOCK_TICKS
+        metrics = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'returncode': returncode,
+            'duration': round(duration, 3),
+            'phases': {name: round(seconds, 3) for name, seconds in self._phases.items()},
+            'sampled': self.sampling,
+            'samples': self._samples
+        }
+        if self.sampling:
+            metrics.update({
+                'cpu_seconds': round(cpu_seconds, 2),
+                'cpu_percent': round(cpu_seconds / duration * 100, 1) if duration else 0.0,
+                'peak_rss_bytes': self._peak_rss,
+                'io': {
+                    key: sum(counters.get(key, 0) for counters in self._io.values())
+                    for key in ('read_bytes', 'write_bytes', 'rchar', 'wchar')
+                }
+            })
+        return metrics
+        
+    def format_summary(self, metrics: Dict[str, Any]) -> str:
+        """
+        生成一行可读的指标摘要。
+
+        Args:
+            metrics: stop()的返回值
+
+        Returns:
+            str: 摘要文本
+        """
+        phases = '，'.join(f"{name} {seconds:.1f}s" for name, seconds in metrics['phases'].items())
+        summary = f"阶段耗时: {phases}"
+        if metrics['sampled']:
+            mb = 1024 * 1024
+            summary += (
+                f"；CPU {metrics['cpu_seconds']:.1f}s（{metrics['cpu_percent']:.0f}%），"
+                f"峰值内存 {metrics['peak_rss_bytes'] / mb:.0f}MB，"
+                f"磁盘读 {metrics['io']['read_bytes'] / mb:.1f}MB，写 {metrics['io']['write_bytes'] / mb:.1f}MB"
+            )
+        return summary
+        
+    def _switch_phase(self, phase: Optional[str], timestamp: float) -> None:
+        """结束当前阶段的计时并开始新的阶段"""
+        elapsed = max(0.0, timestamp - self._phase_start)
+        self._phases[self._current_phase] = self._phases.get(self._current_phase, 0.0) + elapsed
+        self._current_phase = phase
+        self._phase_start = timestamp
+        
+    def _sample_loop(self) -> None:
+        """定期采样进程树，直到停止或主进程退出"""
+        while not self._stop_event.is_set():
+            if not self._sample():
+                break
+            self._stop_event.wait(self.interval)
+            
+    def _sample(self) -> bool:
+        """采样一次进程树，主进程已退出时返回False"""
+        pids = self._get_process_tree()
+        if not pids:
+            return False
+            
+        rss = 0
+        cpu_ticks = 0
+        for pid in pids:
+            stat = self._read_stat(pid)
+            if stat is None:
+                continue
+            # utime+stime为自身CPU时间，cutime+cstime为已退出子进程的CPU时间，
+            # 子进程在退出前单独计入，退出后计入父进程，同一时刻不会重复
+            cpu_ticks += sum(stat[:4])
+            rss += stat[4]
+            io = self._read_io(pid)
+            if io:
+                self._io[pid] = io
+                
+        self._samples += 1
+        self._peak_rss = max(self._peak_rss, rss)
+        self._cpu_ticks = max(self._cpu_ticks, cpu_ticks)
+        return True
+        
+    def _get_process_tree(self) -> List[int]:
+        """获取主进程及其所有后代进程的PID"""
+        if not os.path.isdir(f'/proc/{self.pid}'):
+            return []
+        pids = [self.pid]
+        index = 0
+        while index < len(pids):
+            pids.extend(self._get_children(pids[index]))
+            index += 1
+        return pids
+        
+    def _get_children(self, pid: int) -> List[int]:
+        """读取进程的直接子进程"""
+        children = []
+        try:
+            for tid in os.listdir(f'/proc/{pid}/task'):
+                with open(f'/proc/{pid}/task/{tid}/children', 'r') as f:
+                    children.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+        return children
+        
+    def _read_stat(self, pid: int) -> Optional[Tuple[int, int, int, int, int]]:
+        """读取进程的CPU时间（时钟周期）和常驻内存（字节）"""
+        try:
+            with open(f'/proc/{pid}/stat', 'r') as f:
+                # 进程名可能包含空格，从最后一个右括号之后开始解析
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            return None
+        # 字段编号见proc(5)：14-17为utime/stime/cutime/cstime，24为rss（页数）
+        utime, stime, cutime, cstime = (int(value) for value in fields[11:15])
+        rss = int(fields[21]) * _PAGE_SIZE
+        return utime, stime, cutime, cstime, rss
+        
+    def _read_io(self, pid: int) -> Optional[Dict[str, int]]:
+        """读取进程的读写量"""
+        try:
+            with open(f'/proc/{pid}/io', 'r') as f:
+                return {
+                    key: int(value)
+                    for key, value in (line.split(':') for line in f if ':' in line)
+                }
+        except (OSError, ValueError):
+            return None
+
+def get_log_dir() -> Path:
+    """
+    获取日志目录：已配置写入文件的日志（图形界面的logs/packager.log）时为该文件所在目录，
+    否则（命令行模式只输出到标准错误）为用户缓存目录下的logs。
+    """
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.FileHandler):
+            return Path(handler.baseFilename).parent
+    from utils.cache_utils import get_cache_dir
+    return get_cache_dir('logs')
+
+def write_metrics(metrics: Dict[str, Any], metrics_path: Optional[str] = None) -> None:
+    """
+    将一次打包的指标以JSON行的形式追加到记录文件。
+
+    Args:
+        metrics: 指标字典
+        metrics_path: 记录文件路径，默认为get_log_dir()下的build_metrics.jsonl
+    """
+    path = Path(metrics_path) if metrics_path else get_log_dir() / DEFAULT_METRICS_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    line = json.dumps(metrics, ensure_ascii=False) + '\n'
+    with _write_lock:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
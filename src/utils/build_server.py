@@ -0,0 +1,474 @@
+from typing import Any, Dict, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from utils.cache_utils import get_cache_dir
+
+# 打包服务默认监听的地址和端口，只接受本机连接
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8421
+
+# 保留最近完成的任务数量，供客户端查询结果
+DEFAULT_HISTORY = 200
+
+# PyInstaller.build()接受的参数，其中的路径参数会被转换为绝对路径
+BUILD_PARAMS = (
+    'script_path', 'output_dir', 'onefile', 'venv_path', 'icon_path', 'extra_files',
+    'version_file', 'hidden_imports', 'exclude_modules', 'runtime_hooks', 'upx', 'strip', 'optimize',
+    'packed_files', 'stage_data'
+)
+_PATH_PARAMS = ('script_path', 'output_dir', 'venv_path', 'icon_path', 'version_file')
+_PATH_LIST_PARAMS = ('extra_files', 'runtime_hooks', 'packed_files')
+
+def get_token_path(port: int) -> Path:
+    """
+    打包服务访问令牌的文件路径，每个端口一个。
+    令牌文件只有当前用户可读，同一用户的客户端读取该文件完成认证。
+    """
+    token_dir = get_cache_dir('build-server')
+    if os.name != 'nt':
+        os.chmod(token_dir, 0o700)
+    return token_dir / f'token-{port}'
+
+def _write_token(token_path: Path, token: str) -> None:
+    """以0600权限原子地写入令牌文件"""
+    temp_path = token_path.with_name(f'.{token_path.name}.{os.getpid()}')
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(token)
+    os.replace(temp_path, token_path)
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    检查并规范化打包参数：路径转换为绝对路径，去掉为空的可选参数，
+    使相同的打包请求得到相同的参数。
+
+    Args:
+        params: 传给PyInstaller.build()的参数
+
+    Returns:
+        Dict[str, Any]: 规范化后的参数
+
+    Raises:
+        ValueError: 参数不受支持或缺少必需参数
+    """
+    unknown = set(params) - set(BUILD_PARAMS)
+    if unknown:
+        raise ValueError(f"不支持的打包参数: {', '.join(sorted(unknown))}")
+    for key in ('script_path', 'output_dir'):
+        if not params.get(key):
+            raise ValueError(f"缺少打包参数: {key}")
+            
+    normalized = {}
+    for key in BUILD_PARAMS:
+        value = params.get(key)
+        if key in ('onefile', 'upx'):
+            normalized[key] = True if value is None else bool(value)
+        elif key == 'optimize':
+            if value is not None:
+                normalized[key] = int(value)
+        elif not value:
+            continue
+        elif key == 'strip':
+            normalized[key] = True
+        elif key in _PATH_PARAMS:
+            normalized[key] = os.path.abspath(value)
+        elif key in _PATH_LIST_PARAMS:
+            normalized[key] = [os.path.abspath(item) for item in value]
+        else:
+            normalized[key] = list(value)
+    return normalized
+
+class _BuildJob:
+    """打包任务，相同参数的并发请求共享同一个任务"""
+    
+    def __init__(self, job_id: str, key: str, params: Dict[str, Any], priority: int):
+        self.id = job_id
+        self.key = key
+        self.params = params
+        self.priority = priority
+        self.state = 'queued'
+        self.requests = 1
+        self.result: Optional[Dict[str, Any]] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+        
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        """转换为返回给客户端的字典"""
+        data = {
+            'id': self.id,
+            'state': self.state,
+            'priority': self.priority,
+            'requests': self.requests,
+            'script_path': self.params['script_path'],
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished
+        }
+        if include_result and self.result is not None:
+            data['result'] = self.result
+        return data
+
+class BuildServer:
+    """
+    本机打包服务。
+    通过HTTP接收与PyInstaller.build()参数相同的打包请求，按优先级排队，由固定数量的
+    工作线程执行（每个工作线程同时只运行一个PyInstaller进程）。参数相同的请求在排队或
+    运行期间会被合并，只打包一次，所有请求方都得到同一个结果。
+
+    接口：
+        POST /builds              提交打包请求，请求体为{"params": {...}, "priority": 0, "wait": false}
+        GET  /builds/<id>         查询任务，?wait=1时等待任务完成
+        GET  /status              查询队列状态
+
+    打包请求可以指定虚拟环境、运行时钩子和输出目录，相当于以服务所属用户的身份执行代码，
+    因此所有请求都必须带上访问令牌（Authorization: Bearer <令牌>），POST请求体必须是
+    application/json（浏览器中的网页无法跨站伪造这样的请求）。令牌在启动时随机生成，
+    写入只有当前用户可读的令牌文件（见get_token_path）。
+    """
+    
+    def __init__(self,
+                 packager=None,
+                 host: str = DEFAULT_HOST,
+                 port: int = DEFAULT_PORT,
+                 max_workers: Optional[int] = None,
+                 history: int = DEFAULT_HISTORY,
+                 token: Optional[str] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化打包服务。
+
+        Args:
+            packager: 执行打包的PyInstaller对象，默认创建一个使用WorkpathManager的实例
+            host: 监听地址
+            port: 监听端口，0表示随机端口
+            max_workers: 同时运行的打包数，默认为CPU核心数
+            history: 保留的已完成任务数量
+            token: 访问令牌，默认随机生成
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        if packager is None:
+            from utils.packager import PyInstaller
+            from utils.workpath import WorkpathManager
+            packager = PyInstaller(self.logger, workpath_manager=WorkpathManager(logger=self.logger))
+        self.packager = packager
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.history = history
+        self.stats = {'submitted': 0, 'merged': 0, 'completed': 0, 'failed': 0}
+        
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        # 堆中的元素为(-优先级, 序号, 任务)；提升优先级时重新入堆，旧元素出堆时丢弃
+        self._queue: List[Tuple[int, int, _BuildJob]] = []
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, _BuildJob] = {}
+        self._inflight: Dict[str, _BuildJob] = {}
+        self._finished: List[str] = []
+        self._stopping = False
+        self._workers: List[threading.Thread] = []
+        
+        self.httpd = ThreadingHTTPServer((host, port), _BuildRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.build_server = self
+        self.address = self.httpd.server_address
+        
+        self.token = token or secrets.token_urlsafe(32)
+        self.token_path = get_token_path(self.address[1])
+        _write_token(self.token_path, self.token)
+        
+    def submit(self, params: Dict[str, Any], priority: int = 0) -> Tuple[_BuildJob, bool]:
+        """
+        提交打包请求。
+
+        Args:
+            params: 传给PyInstaller.build()的参数
+            priority: 优先级，数值越大越先执行
+
+        Returns:
+            Tuple[_BuildJob, bool]: (任务, 是否与正在排队或运行的相同请求合并)
+        """
+        params = normalize_params(params)
+        key = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+        with self._condition:
+            self.stats['submitted'] += 1
+            job = self._inflight.get(key)
+            if job:
+                self.stats['merged'] += 1
+                job.requests += 1
+                if job.state == 'queued' and priority > job.priority:
+                    job.priority = priority
+                    heapq.heappush(self._queue, (-priority, next(self._sequence), job))
+                self.logger.info(f"合并相同的打包请求: {job.id}（共 {job.requests} 个请求）")
+                return job, True
+                
+            job = _BuildJob(f'{next(self._sequence)}-{key[:12]}', key, params, priority)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            heapq.heappush(self._queue, (-priority, next(self._sequence), job))
+            self._condition.notify()
+        self.logger.info(f"收到打包请求: {job.id} {params['script_path']}（优先级 {priority}）")
+        return job, False
+        
+    def get_job(self, job_id: str) -> Optional[_BuildJob]:
+        """按ID查找任务"""
+        with self._lock:
+            return self._jobs.get(job_id)
+            
+    def status(self) -> Dict[str, Any]:
+        """获取队列状态"""
+        with self._lock:
+            queued = sorted(
+                (job for job in self._inflight.values() if job.state == 'queued'),
+                key=lambda job: (-job.priority, job.submitted)
+            )
+            return {
+                'workers': self.max_workers,
+                'running': [job.to_dict(False) for job in self._inflight.values() if job.state == 'running'],
+                'queued': [job.to_dict(False) for job in queued],
+                'stats': dict(self.stats)
+            }
+            
+    def start(self) -> None:
+        """启动工作线程和HTTP服务（在后台线程中运行）"""
+        self._start_workers()
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.logger.info(f"打包服务已启动: http://{self.address[0]}:{self.address[1]}，并发数 {self.max_workers}，访问令牌文件 {self.token_path}")
+        
+    def serve_forever(self) -> None:
+        """启动工作线程并在当前线程中运行HTTP服务，直到shutdown()或Ctrl+C"""
+        self._start_workers()
+        self.logger.info(f"打包服务已启动: http://{self.address[0]}:{self.address[1]}，并发数 {self.max_workers}，访问令牌文件 {self.token_path}")
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+            
+    def shutdown(self) -> None:
+        """停止接收请求，取消正在运行的打包并等待工作线程退出"""
+        with self._condition:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._condition.notify_all()
+        threading.Thread(target=self.httpd.shutdown, daemon=True).start()
+        self.packager.cancel()
+        for worker in self._workers:
+            worker.join()
+        self.httpd.server_close()
+        # 令牌文件仍是本服务写入的才删除
+        try:
+            if self.token_path.read_text(encoding='utf-8') == self.token:
+                self.token_path.unlink()
+        except OSError:
+            pass
+        # 未开始的任务以取消结束，避免等待中的请求方一直阻塞
+        with self._lock:
+            for job in list(self._inflight.values()):
+                self._finish_job(job, {'success': False, 'cancelled': True, 'error': "打包服务已停止"})
+        self.logger.info("打包服务已停止")
+        
+    def _start_workers(self) -> None:
+        """启动工作线程"""
+        for index in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f'build-worker-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+            
+    def _worker_loop(self) -> None:
+        """工作线程：按优先级取出任务并执行，直到服务停止"""
+        while True:
+            with self._condition:
+                job = None
+                while not self._stopping:
+                    while self._queue:
+                        priority, _, candidate = heapq.heappop(self._queue)
+                        # 跳过提升优先级后遗留的旧元素
+                        if candidate.state == 'queued' and -priority == candidate.priority:
+                            job = candidate
+                            break
+                    if job:
+                        break
+                    self._condition.wait()
+                if job is None:
+                    return
+                job.state = 'running'
+                job.started = time.time()
+                
+            self.logger.info(f"开始打包: {job.id} {job.params['script_path']}")
+            try:
+                result = self.packager.build(**job.params)
+            except Exception as e:
+                self.logger.error(f"打包任务出错: {job.id} {str(e)}")
+                result = {'success': False, 'error': str(e)}
+                
+            with self._condition:
+                self._finish_job(job, result)
+    
+    def _finish_job(self, job: _BuildJob, result: Dict[str, Any]) -> None:
+        """记录任务结果并唤醒等待者，调用时需持有锁"""
+        job.result = result
+        job.state = 'done'
+        job.finished = time.time()
+        self.stats['completed' if result.get('success') else 'failed'] += 1
+        self._inflight.pop(job.key, None)
+        self._finished.append(job.id)
+        # 只保留最近完成的任务
+        while len(self._finished) > self.history:
+            self._jobs.pop(self._finished.pop(0), None)
+        job.done.set()
+
+class _BuildRequestHandler(BaseHTTPRequestHandler):
+    """打包服务的HTTP请求处理"""
+    
+    def do_GET(self) -> None:
+        server: BuildServer = self.server.build_server
+        if not self._authorize(server):
+            return
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/status':
+            self._send(200, server.status())
+            return
+        if url.path.startswith('/builds/'):
+            job = server.get_job(url.path[len('/builds/'):])
+            if job is None:
+                self._send(404, {'error': "任务不存在"})
+                return
+            if query.get('wait', ['0'])[0] not in ('0', ''):
+                timeout = None
+                if 'timeout' in query:
+                    try:
+                        timeout = float(query['timeout'][0])
+                    except ValueError:
+                        timeout = -1.0
+                    if not 0 <= timeout < float('inf'):
+                        self._send(400, {'error': f"timeout必须是非负数: {query['timeout'][0]}"})
+                        return
+                job.done.wait(timeout)
+            self._send(200, job.to_dict())
+            return
+        self._send(404, {'error': "接口不存在"})
+        
+    def do_POST(self) -> None:
+        server: BuildServer = self.server.build_server
+        if not self._authorize(server):
+            return
+        if urlparse(self.path).path != '/builds':
+            self._send(404, {'error': "接口不存在"})
+            return
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._send(415, {'error': "请求体必须是application/json"})
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            job, merged = server.submit(body.get('params') or {}, int(body.get('priority') or 0))
+        except (ValueError, TypeError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        if body.get('wait'):
+            job.done.wait()
+        response = job.to_dict()
+        response['merged'] = merged
+        self._send(202 if job.state != 'done' else 200, response)
+        
+    def _authorize(self, server: BuildServer) -> bool:
+        """校验访问令牌，失败时返回401"""
+        expected = f'Bearer {server.token}'.encode('utf-8')
+        if hmac.compare_digest(self.headers.get('Authorization', '').encode('utf-8'), expected):
+            return True
+        self._send(401, {'error': "缺少或错误的访问令牌"})
+        return False
+        
+    def log_message(self, format: str, *args) -> None:
+        self.server.build_server.logger.debug(f"{self.address_string()} {format % args}")
+        
+    def _send(self, status: int, data: Dict[str, Any]) -> None:
+        """以JSON格式返回响应"""
+        payload = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class BuildClient:
+    """打包服务的客户端"""
+    
+    def __init__(self,
+                 url: str = f'http://{DEFAULT_HOST}:{DEFAULT_PORT}',
+                 token: Optional[str] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化客户端。
+
+        Args:
+            url: 打包服务地址
+            token: 访问令牌，默认从当前用户的令牌文件中读取
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.url = url.rstrip('/')
+        self.token = token
+        if not self.token:
+            token_path = get_token_path(urlparse(self.url).port or DEFAULT_PORT)
+            try:
+                self.token = token_path.read_text(encoding='utf-8').strip()
+            except OSError:
+                raise RuntimeError(f"未找到打包服务的访问令牌: {token_path}，请确认服务由当前用户启动")
+        
+    def submit(self, params: Dict[str, Any], priority: int = 0, wait: bool = True) -> Dict[str, Any]:
+        """
+        提交打包请求。路径在本地转换为绝对路径后再发送。
+
+        Args:
+            params: 传给PyInstaller.build()的参数
+            priority: 优先级，数值越大越先执行
+            wait: 是否等待打包完成
+
+        Returns:
+            Dict[str, Any]: 任务信息，完成后包含result（PyInstaller.build()的结果），
+            merged表示是否与其他相同请求合并
+        """
+        body = {'params': normalize_params(params), 'priority': priority, 'wait': wait}
+        return self._request('POST', '/builds', body)
+        
+    def get(self, job_id: str, wait: bool = False) -> Dict[str, Any]:
+        """查询任务，wait为True时等待任务完成"""
+        return self._request('GET', f"/builds/{job_id}{'?wait=1' if wait else ''}")
+        
+    def status(self) -> Dict[str, Any]:
+        """查询队列状态"""
+        return self._request('GET', '/status')
+        
+    def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """发送请求并解析JSON响应，服务返回错误时抛出RuntimeError"""
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(
+            self.url + path, data=data, method=method,
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {self.token}'}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(json.loads(e.read()).get('error') or str(e))
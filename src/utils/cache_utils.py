@@ -0,0 +1,100 @@
+from typing import Iterator, Optional
+from contextlib import contextmanager
+import hashlib
+import os
+from pathlib import Path
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# 缓存根目录可通过环境变量覆盖，便于CI机器把缓存放到持久化磁盘上
+CACHE_DIR_ENV = 'PYEZPACKER_CACHE_DIR'
+
+# 分块读取文件时的块大小
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_cache_dir(*parts: str) -> Path:
+    """
+    获取缓存目录，不存在时自动创建。
+
+    Args:
+        parts: 缓存根目录下的子目录名
+
+    Returns:
+        Path: 缓存目录路径
+    """
+    root = os.environ.get(CACHE_DIR_ENV) or os.path.join(os.path.expanduser('~'), '.cache', 'pyezpacker')
+    path = Path(root, *parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def hash_file(file_path: str, hasher: Optional['hashlib._Hash'] = None) -> str:
+    """
+    分块读取文件并计算SHA-256摘要。
+
+    Args:
+        file_path: 文件路径
+        hasher: 可选的哈希对象，传入时文件内容会追加到该对象上
+
+    Returns:
+        str: 十六进制摘要
+    """
+    hasher = hasher or hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+@contextmanager
+def file_lock(lock_path: str) -> Iterator[None]:
+    """
+    以独占方式锁定文件，用于跨进程互斥访问缓存目录。
+
+    持有锁的一方可以删除锁文件（如清理缓存条目时）：等待同一把锁的进程加锁后发现
+    锁文件已被删除或替换，会重新打开新的锁文件再加锁，不会与后来者同时持有锁。
+
+    Args:
+        lock_path: 锁文件路径，不存在时自动创建
+    """
+    while True:
+        lock_file = open(lock_path, 'a+')
+        try:
+            if os.name == 'nt':
+                # msvcrt.locking锁定的是文件区域，统一锁定第一个字节；
+                # Windows下打开中的文件不能被删除，无需检查
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            if _is_current_file(lock_file, lock_path):
+                break
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        except BaseException:
+            lock_file.close()
+            raise
+        lock_file.close()
+
+    try:
+        yield
+    finally:
+        if os.name == 'nt':
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+        lock_file.close()
+
+
+def _is_current_file(lock_file, lock_path: str) -> bool:
+    """判断已打开的锁文件是否仍是路径当前指向的文件"""
+    try:
+        current = os.stat(lock_path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(lock_file.fileno())
+    return (opened.st_dev, opened.st_ino) == (current.st_dev, current.st_ino)
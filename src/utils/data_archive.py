@@ -0,0 +1,129 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import filecmp
+import json
+import logging
+import os
+import shutil
+import struct
+import tempfile
+from pathlib import Path
+
+from utils.cache_utils import HASH_CHUNK_SIZE
+
+# 归档格式，需与runtime/pyezpacker_data.py保持一致：
+# 文件头为魔数、索引偏移和索引长度，之后是按8字节对齐的各条目数据，最后是JSON索引
+ARCHIVE_NAME = 'pyezpacker_data.pak'
+MAGIC = b'PYEZPAK1'
+HEADER = struct.Struct('<8sQQ')
+
+# 条目数据的对齐字节数，便于运行时按数组类型直接解释mmap中的数据
+ALIGNMENT = 8
+
+# 随程序打包的运行时读取模块
+RUNTIME_MODULE = 'pyezpacker_data'
+RUNTIME_DIR = str(Path(__file__).resolve().parent.parent / 'runtime')
+
+def iter_data_entries(paths: List[str]) -> Iterator[Tuple[str, str]]:
+    """
+    遍历数据文件及其在程序中的名称。与--add-data path;.一致，文件以文件名为条目名，
+    目录中的文件以相对该目录的路径为条目名（使用/分隔目录）。
+
+    Args:
+        paths: 文件或目录路径
+
+    Yields:
+        Tuple[str, str]: (条目名, 文件绝对路径)
+    """
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in names:
+                    file_path = os.path.join(root, name)
+                    yield os.path.relpath(file_path, path).replace(os.sep, '/'), file_path
+        else:
+            yield os.path.basename(path), path
+
+def collect_data_entries(paths: List[str]) -> Dict[str, str]:
+    """
+    确定各数据文件的条目名。
+
+    Args:
+        paths: 文件或目录路径
+
+    Returns:
+        Dict[str, str]: 条目名到文件路径的映射
+
+    Raises:
+        ValueError: 不同文件得到相同的条目名
+    """
+    entries: Dict[str, str] = {}
+    for name, file_path in iter_data_entries(paths):
+        if name in entries and entries[name] != file_path:
+            raise ValueError(f"数据文件的条目重名: {name}（{entries[name]} 和 {file_path}）")
+        entries[name] = file_path
+    return entries
+
+class DataArchiveBuilder:
+    """
+    数据归档生成器。
+    将多个数据文件合并为一个带索引的归档，与程序一起打包后由运行时模块pyezpacker_data
+    通过mmap直接读取，避免大量小文件撑大TOC、拖慢onefile解压。
+    """
+    
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        """
+        初始化归档生成器。
+
+        Args:
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        
+    def build(self, paths: List[str], archive_path: str) -> Dict[str, Any]:
+        """
+        生成数据归档。内容与已有归档相同时保留原文件，不改变修改时间。
+
+        Args:
+            paths: 需要打包的文件或目录
+            archive_path: 归档文件路径，文件名应为ARCHIVE_NAME
+
+        Returns:
+            Dict[str, Any]: 包含archive_path、entries（条目数）、size和changed（归档是否被重写）字段
+        """
+        entries = sorted(collect_data_entries(paths).items())
+        os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+        # 同一进程中的并行打包可能同时生成同一个归档，临时文件名需唯一
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{ARCHIVE_NAME}.', dir=os.path.dirname(os.path.abspath(archive_path)))
+        
+        index = {}
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(b'\0' * HEADER.size)
+                for name, file_path in entries:
+                    padding = -out.tell() % ALIGNMENT
+                    out.write(b'\0' * padding)
+                    offset = out.tell()
+                    with open(file_path, 'rb') as f:
+                        shutil.copyfileobj(f, out, HASH_CHUNK_SIZE)
+                    index[name] = [offset, out.tell() - offset]
+                index_data = json.dumps(index, ensure_ascii=False, sort_keys=True).encode('utf-8')
+                index_offset = out.tell()
+                out.write(index_data)
+                out.seek(0)
+                out.write(HEADER.pack(MAGIC, index_offset, len(index_data)))
+                
+            changed = not (os.path.exists(archive_path) and filecmp.cmp(temp_path, archive_path, shallow=False))
+            if changed:
+                # mkstemp创建的文件只有所有者可读，onedir产物中的归档需要其他用户也能读取
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, archive_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+                
+        size = os.path.getsize(archive_path)
+        self.logger.info(
+            f"数据归档{'已生成' if changed else '未变化'}: {len(entries)} 个文件，{size / 1024 / 1024:.1f} MB"
+        )
+        return {'archive_path': archive_path, 'entries': len(entries), 'size': size, 'changed': changed}
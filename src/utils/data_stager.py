@@ -0,0 +1,236 @@
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from utils.cache_utils import file_lock, get_cache_dir, hash_file
+from utils.data_archive import iter_data_entries
+
+# 预置目录中的清单文件，记录每个条目的来源文件、大小、修改时间和内容摘要
+MANIFEST_NAME = 'manifest.json'
+
+class DataStager:
+    """
+    数据文件预置。
+    打包前把额外文件和项目扫描发现的数据文件整理到一个预置目录中，PyInstaller只需
+    --add-data该目录一次。清单记录上次预置时各来源文件的大小和修改时间，未变化的文件
+    不重新读取和复制；变化的文件在线程池中分块计算哈希，内容未变时同样不复制。
+    同名且内容相同的重复文件只保留一份，不同名但内容相同的文件以硬链接代替复制。
+    """
+    
+    def __init__(self,
+                 staging_root: Optional[str] = None,
+                 max_workers: Optional[int] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化预置器。
+
+        Args:
+            staging_root: 预置目录的根目录，默认为用户缓存目录下的staged-data
+            max_workers: 计算哈希和复制文件的线程数
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.staging_root = Path(staging_root) if staging_root else get_cache_dir('staged-data')
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        
+    def get_staging_dir(self, script_path: str, paths: List[str]) -> Path:
+        """
+        获取预置目录，由脚本和数据文件列表共同确定，多次打包之间复用。
+        数据文件列表不同的打包使用不同的目录，预置时不会改动其他打包正在读取的文件。
+        """
+        key_source = '\n'.join([os.path.abspath(script_path)] + sorted({os.path.abspath(path) for path in paths}))
+        key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:16]
+        return self.staging_root / key
+        
+    def stage(self, paths: List[str], staging_dir: str) -> Dict[str, Any]:
+        """
+        把数据文件预置到目录中。
+
+        Args:
+            paths: 数据文件或目录，按--add-data path;.的方式确定条目名
+            staging_dir: 预置目录，其中的files子目录用于打包，清单保存在该目录下
+
+        Returns:
+            Dict[str, Any]: 包含data_dir（传给--add-data的目录）、files（条目数）、copied、
+            unchanged、linked（以硬链接代替复制的文件数）、duplicates（去掉的重复文件数）、
+            removed（删除的过期文件数）、bytes_copied、digest（所有条目内容的摘要）和duration字段
+
+        Raises:
+            ValueError: 不同内容的文件得到相同的条目名
+        """
+        start_time = time.time()
+        staging_dir = Path(staging_dir)
+        data_dir = staging_dir / 'files'
+        data_dir.mkdir(parents=True, exist_ok=True)
+        result = {
+            'data_dir': str(data_dir),
+            'copied': 0,
+            'unchanged': 0,
+            'linked': 0,
+            'duplicates': 0,
+            'removed': 0,
+            'bytes_copied': 0
+        }
+        
+        # 数据文件列表相同的并行打包共用预置目录，整理过程需要互斥
+        with file_lock(str(staging_dir / '.lock')):
+            manifest = self._load_manifest(staging_dir)
+            entries, duplicates = self._resolve_entries(paths, manifest, data_dir)
+            result['duplicates'] = duplicates
+            
+            # 内容相同的条目只复制一次，其余条目链接到第一个条目
+            primaries: Dict[str, str] = {}
+            copies: List[Tuple[str, Dict[str, Any]]] = []
+            links: List[Tuple[str, str]] = []
+            for name, entry in sorted(entries.items()):
+                primary = primaries.setdefault(entry['digest'], name)
+                staged = data_dir / name
+                previous = manifest.get(name)
+                if previous and previous['digest'] == entry['digest'] and staged.exists():
+                    if primary != name:
+                        links.append((name, primary))
+                    else:
+                        result['unchanged'] += 1
+                elif primary != name:
+                    links.append((name, primary))
+                else:
+                    copies.append((name, entry))
+                    
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                list(executor.map(lambda item: self._copy(item[1]['source'], data_dir / item[0]), copies))
+            result['copied'] = len(copies)
+            result['bytes_copied'] = sum(entry['size'] for _, entry in copies)
+            
+            for name, primary in links:
+                if self._link(data_dir / primary, data_dir / name):
+                    result['linked'] += 1
+                else:
+                    result['unchanged'] += 1
+                    
+            result['removed'] = self._remove_stale(data_dir, entries)
+            self._save_manifest(staging_dir, entries)
+            
+        content = hashlib.sha256()
+        for name in sorted(entries):
+            content.update(f"{name}\0{entries[name]['digest']}\n".encode('utf-8'))
+        result.update(files=len(entries), digest=content.hexdigest(), duration=time.time() - start_time)
+        self.logger.info(
+            f"数据文件预置完成: {result['files']} 个文件，复制 {result['copied']} 个"
+            f"（{result['bytes_copied'] / 1024 / 1024:.1f} MB），未变化 {result['unchanged']} 个，"
+            f"链接 {result['linked']} 个，去掉重复 {result['duplicates']} 个，耗时 {result['duration']:.2f} 秒"
+        )
+        return result
+        
+    def _resolve_entries(self, paths: List[str], manifest: Dict[str, Dict[str, Any]],
+                         data_dir: Path) -> Tuple[Dict[str, Dict[str, Any]], int]:
+        """
+        确定各条目的来源文件和内容摘要，大小和修改时间与清单一致的文件沿用清单中的摘要。
+
+        Returns:
+            Tuple[Dict[str, Dict[str, Any]], int]: (条目名到条目信息的映射, 去掉的重复文件数)
+        """
+        candidates = []
+        seen = set()
+        for name, file_path in iter_data_entries(paths):
+            if (name, file_path) in seen:
+                continue
+            seen.add((name, file_path))
+            st = os.stat(file_path)
+            candidates.append((name, {'source': file_path, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}))
+            
+        def get_digest(item: Tuple[str, Dict[str, Any]]) -> str:
+            name, entry = item
+            previous = manifest.get(name)
+            if (previous and (data_dir / name).exists() and
+                    all(previous.get(key) == entry[key] for key in ('source', 'size', 'mtime_ns'))):
+                return previous['digest']
+            return hash_file(entry['source'])
+            
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            digests = list(executor.map(get_digest, candidates))
+            
+        entries: Dict[str, Dict[str, Any]] = {}
+        duplicates = 0
+        for (name, entry), digest in zip(candidates, digests):
+            entry['digest'] = digest
+            if name not in entries:
+                entries[name] = entry
+            elif entries[name]['digest'] == digest:
+                duplicates += 1
+            else:
+                raise ValueError(f"数据文件的条目重名且内容不同: {name}（{entries[name]['source']} 和 {entry['source']}）")
+        return entries, duplicates
+        
+    def _copy(self, source: str, target: Path) -> None:
+        """复制文件并保留修改时间，先写临时文件再原子替换"""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+        try:
+            shutil.copy2(source, temp_path)
+            os.replace(temp_path, target)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+    
+    def _link(self, primary: Path, target: Path) -> bool:
+        """
+        让条目与内容相同的另一条目共享数据，不支持硬链接时退回复制。
+
+        Returns:
+            bool: 是否重新建立了链接（已经是同一文件时返回False）
+        """
+        if target.exists() and os.path.samefile(primary, target):
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+        try:
+            try:
+                os.link(primary, temp_path)
+            except OSError:
+                shutil.copy2(primary, temp_path)
+            os.replace(temp_path, target)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        return True
+        
+    def _remove_stale(self, data_dir: Path, entries: Dict[str, Dict[str, Any]]) -> int:
+        """删除不再需要的预置文件和空目录"""
+        removed = 0
+        for root, dirs, names in os.walk(data_dir, topdown=False):
+            for name in names:
+                file_path = os.path.join(root, name)
+                if os.path.relpath(file_path, data_dir).replace(os.sep, '/') not in entries:
+                    os.remove(file_path)
+                    removed += 1
+            for name in dirs:
+                dir_path = os.path.join(root, name)
+                if not os.listdir(dir_path):
+                    os.rmdir(dir_path)
+        return removed
+        
+    def _load_manifest(self, staging_dir: Path) -> Dict[str, Dict[str, Any]]:
+        """读取上次预置的清单，不存在或损坏时返回空清单"""
+        try:
+            with open(staging_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+            
+    def _save_manifest(self, staging_dir: Path, entries: Dict[str, Dict[str, Any]]) -> None:
+        """保存清单，先写入唯一的临时文件再原子替换"""
+        fd, temp_path = tempfile.mkstemp(prefix=f'.{MANIFEST_NAME}.', suffix='.tmp', dir=staging_dir)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, staging_dir / MANIFEST_NAME)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -1,22 +1,75 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
+import hashlib
 import os
+import shutil
+import tempfile
 import logging
 
+from utils.cache_utils import get_cache_dir, hash_file
+
+# 标准图标尺寸
+ICON_SIZES = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128)]
+
+# 生成算法的版本号，算法变化时旧缓存自动失效
+_CACHE_VERSION = 3
+
+# 默认允许的源图像最大像素数（约一亿像素，可容纳10k×10k的图像）
+DEFAULT_MAX_PIXELS = 100_000_000
+
+# 默认单次转换允许的最大解码内存（MB）
+DEFAULT_MAX_MEMORY_MB = 512
+
+def _estimate_image_bytes(size: Tuple[int, int], mode: str) -> int:
+    """估算Pillow中指定尺寸和模式的图像所占内存（多通道图像按每像素4字节存储）"""
+    if Image.getmodebands(mode) > 1 or mode in ('I', 'F'):
+        bytes_per_pixel = 4
+    elif mode.startswith('I;16'):
+        bytes_per_pixel = 2
+    else:
+        bytes_per_pixel = 1
+    return size[0] * size[1] * bytes_per_pixel
+
+def _convert_worker(args: Tuple[str, Optional[str], Optional[str], int, int]) -> str:
+    """在工作进程中转换单个图像（进程池要求可序列化的模块级函数）"""
+    image_path, output_path, cache_dir, max_pixels, max_memory_mb = args
+    converter = IconConverter(cache_dir=cache_dir, max_pixels=max_pixels, max_memory_mb=max_memory_mb)
+    return converter.convert_to_ico(image_path, output_path)
+
 class IconConverter:
     """
     图像文件转换为ICO格式的工具类。
     支持将常见图像格式（如PNG、JPG等）转换为ICO文件。
+    生成的ICO按源图像内容哈希缓存，相同图像不会重复转换。
+    大尺寸源图像会先以降低的分辨率解码，再精确缩放，避免占用大量内存。
     """
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self,
+                 logger: Optional[logging.Logger] = None,
+                 cache_dir: Optional[str] = None,
+                 use_cache: bool = True,
+                 max_pixels: int = DEFAULT_MAX_PIXELS,
+                 max_memory_mb: int = DEFAULT_MAX_MEMORY_MB):
         """
         初始化图标转换器。
 
         Args:
             logger: 可选的logger对象，用于日志记录
+            cache_dir: ICO缓存目录，默认为用户缓存目录下的icons
+            use_cache: 是否使用ICO缓存
+            max_pixels: 允许的源图像最大像素数
+            max_memory_mb: 单次转换允许的最大解码内存（MB）
         """
         self.logger = logger or logging.getLogger(__name__)
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.max_pixels = max_pixels
+        self.max_memory_mb = max_memory_mb
+        # 最近一次转换的统计信息，包括解码尺寸和估算的峰值内存。
+        # Pillow的像素数据不经过Python的内存分配器，tracemalloc无法统计，进程峰值常驻内存
+        # 又只增不减，因此只报告按图像尺寸和模式估算的值
+        self.last_stats: Dict[str, Any] = {}
         
     def convert_to_ico(self, image_path: str, output_path: Optional[str] = None) -> str:
         """
@@ -30,37 +83,163 @@ class IconConverter:
             str: 生成的ICO文件路径
 
         Raises:
-            ValueError: 当输入文件格式不支持时抛出
+            ValueError: 当输入文件格式不支持或超出像素、内存上限时抛出
             IOError: 当文件操作失败时抛出
         """
+        self.last_stats = {'source': image_path, 'cached': False}
         try:
             # 如果未指定输出路径，则使用源文件名
             if not output_path:
                 output_path = os.path.splitext(image_path)[0] + '.ico'
                 
-            # 打开并转换图像
-            with Image.open(image_path) as img:
-                # 确保图像为RGBA模式
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                    
-                # 调整图像大小为标准图标尺寸
-                sizes = [(16,16), (32,32), (48,48), (64,64), (128,128)]
-                icons = []
-                for size in sizes:
-                    icon = img.resize(size, Image.Resampling.LANCZOS)
-                    icons.append(icon)
-                    
-                # 保存为ICO文件
-                icons[0].save(
-                    output_path,
-                    format='ICO',
-                    sizes=[(icon.width, icon.height) for icon in icons]
-                )
+            if not self.use_cache:
+                self._render_ico(image_path, output_path)
+                self.logger.info(f"成功将 {image_path} 转换为图标文件 {output_path}")
+                return output_path
+                
+            # 以源图像内容和目标尺寸作为缓存键
+            cached_path = self._get_cached_path(image_path)
+            if os.path.exists(cached_path):
+                self.last_stats['cached'] = True
+                self.logger.info(f"使用缓存的图标文件: {image_path}")
+            else:
+                # 先写入临时文件再重命名，并发转换同一图像时不会读到半成品
+                fd, tmp_path = tempfile.mkstemp(suffix='.ico', dir=os.path.dirname(cached_path))
+                os.close(fd)
+                try:
+                    self._render_ico(image_path, tmp_path)
+                    os.replace(tmp_path, cached_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            
+            # 输出文件内容未变化时不重复写入
+            if not self._same_content(cached_path, output_path):
+                shutil.copyfile(cached_path, output_path)
                 
             self.logger.info(f"成功将 {image_path} 转换为图标文件 {output_path}")
             return output_path
             
         except Exception as e:
             self.logger.error(f"转换图标时出错: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+            
+    def convert_batch(self,
+                      image_paths: List[str],
+                      output_dir: Optional[str] = None,
+                      max_workers: Optional[int] = None) -> Dict[str, str]:
+        """
+        使用进程池批量转换图像。
+
+        Args:
+            image_paths: 源图像文件路径列表
+            output_dir: 输出目录，未指定时ICO文件生成在各源文件旁边
+            max_workers: 最大进程数，默认为CPU核心数
+
+        Returns:
+            Dict[str, str]: 源图像路径到ICO文件路径的映射
+        """
+        tasks = []
+        for image_path in image_paths:
+            output_path = None
+            if output_dir:
+                name = os.path.splitext(os.path.basename(image_path))[0] + '.ico'
+                output_path = os.path.join(output_dir, name)
+            tasks.append((image_path, output_path, self.cache_dir, self.max_pixels, self.max_memory_mb))
+            
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            
+        self.logger.info(f"开始批量转换图标: {len(tasks)} 个文件")
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_convert_worker, tasks))
+        self.logger.info(f"批量转换完成: {len(results)} 个文件")
+        
+        return dict(zip(image_paths, results))
+        
+    def _render_ico(self, image_path: str, output_path: str) -> None:
+        """
+        生成ICO文件。
+        源图像先以降低的分辨率解码（JPEG草稿模式、reduce()）到接近最大图标尺寸，
+        再精确缩放到最大尺寸，其余尺寸依次由上一级尺寸缩小得到。
+        """
+        largest = max(ICON_SIZES)
+        
+        # 打开图像，此时只读取了文件头
+        with Image.open(image_path) as img:
+            source_size = img.size
+            if source_size[0] * source_size[1] > self.max_pixels:
+                raise ValueError(
+                    f"图像尺寸 {source_size[0]}x{source_size[1]} 超过像素上限 {self.max_pixels}"
+                )
+                
+            # JPEG等格式可直接以缩小的比例解码
+            img.draft('RGB', largest)
+            
+            # 解码前按解码尺寸估算内存，超出上限时拒绝转换
+            decoded_bytes = _estimate_image_bytes(img.size, img.mode)
+            if decoded_bytes > self.max_memory_mb * 1024 * 1024:
+                raise ValueError(
+                    f"解码 {image_path} 约需 {decoded_bytes / 1024 / 1024:.0f}MB 内存，"
+                    f"超过上限 {self.max_memory_mb}MB"
+                )
+            img.load()
+            decoded_size = img.size
+            peak_bytes = decoded_bytes
+            
+            # 调色板等模式不支持reduce()，先转换为RGBA
+            if img.mode not in ('L', 'LA', 'RGB', 'RGBA'):
+                img = img.convert('RGBA')
+                peak_bytes = max(peak_bytes, decoded_bytes + _estimate_image_bytes(img.size, img.mode))
+                
+            # 按整数倍快速缩小到不小于最大图标尺寸
+            factor = max(1, min(img.width // largest[0], img.height // largest[1]))
+            if factor > 1:
+                reduced = img.reduce(factor)
+                peak_bytes = max(peak_bytes, decoded_bytes + _estimate_image_bytes(reduced.size, reduced.mode))
+                img = reduced
+                
+            # 确保图像为RGBA模式
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+                
+            # 从大到小逐级缩放为标准图标尺寸
+            icons = []
+            current = img
+            for size in sorted(ICON_SIZES, reverse=True):
+                current = current.resize(size, Image.Resampling.LANCZOS)
+                icons.append(current)
+                
+            # 保存为ICO文件，各尺寸直接使用已缩放好的图像
+            icons[0].save(
+                output_path,
+                format='ICO',
+                sizes=[(icon.width, icon.height) for icon in icons],
+                append_images=icons[1:]
+            )
+            
+        self.last_stats.update({
+            'source_size': source_size,
+            'decoded_size': decoded_size,
+            'reduce_factor': factor,
+            'estimated_peak_bytes': peak_bytes
+        })
+        self.logger.info(
+            f"图标解码: 源图像 {source_size[0]}x{source_size[1]}，解码 {decoded_size[0]}x{decoded_size[1]}，"
+            f"缩小倍数 {factor}，估算峰值内存 {peak_bytes / 1024 / 1024:.1f}MB"
+        )
+        
+    def _get_cached_path(self, image_path: str) -> str:
+        """计算源图像对应的缓存文件路径"""
+        hasher = hashlib.sha256(f'{_CACHE_VERSION}:{ICON_SIZES}'.encode('utf-8'))
+        digest = hash_file(image_path, hasher)
+        cache_dir = self.cache_dir or str(get_cache_dir('icons'))
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, digest + '.ico')
+        
+    def _same_content(self, path_a: str, path_b: str) -> bool:
+        """判断两个文件内容是否相同"""
+        if not os.path.exists(path_b) or os.path.getsize(path_a) != os.path.getsize(path_b):
+            return False
+        with open(path_a, 'rb') as a, open(path_b, 'rb') as b:
+            return a.read() == b.read()
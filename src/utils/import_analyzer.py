@@ -0,0 +1,419 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from concurrent.futures import ProcessPoolExecutor
+import ast
+import configparser
+import hashlib
+import json
+import logging
+import os
+import sys
+import sysconfig
+import tempfile
+import threading
+from pathlib import Path
+
+from utils.cache_utils import get_cache_dir
+from utils.python_env import get_site_dirs
+
+# 待解析文件数超过该值时才使用进程池，文件较少时进程启动开销大于收益
+PARALLEL_THRESHOLD = 64
+
+# 扩展模块的文件后缀
+_EXTENSION_SUFFIXES = ('.so', '.pyd')
+
+# 解析缓存的格式版本
+_CACHE_VERSION = 1
+
+# 解析缓存最多保留的条目数，超出时淘汰最久未使用的条目
+PARSE_CACHE_MAX_ENTRIES = 20000
+
+# 通过钩子、运行时钩子或importlib.metadata在运行时加载的包，静态导入图中看不到，从不排除
+NEVER_EXCLUDE = frozenset({
+    'setuptools', 'pkg_resources', '_distutils_hack', 'distutils',
+    'importlib_metadata', 'importlib_resources', 'zipp', 'packaging',
+    'typing_extensions', 'six', 'jaraco', 'more_itertools', 'platformdirs',
+    'win32com', 'pythoncom', 'pywintypes', 'pywin32_system32'
+})
+
+# 只用于安装命令行程序的入口点组，不代表运行时插件
+_SCRIPT_ENTRY_POINT_GROUPS = ('console_scripts', 'gui_scripts')
+
+def _is_type_checking(test: ast.expr) -> bool:
+    """判断if条件是否为TYPE_CHECKING或typing.TYPE_CHECKING"""
+    if isinstance(test, ast.Name):
+        return test.id == 'TYPE_CHECKING'
+    return isinstance(test, ast.Attribute) and test.attr == 'TYPE_CHECKING'
+
+def _string_arg(node: ast.Call) -> Optional[str]:
+    """取调用的第一个参数，仅当其为字符串常量时返回"""
+    if node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str):
+        return node.args[0].value
+    return None
+
+def parse_imports(source: bytes, file_path: str = '<unknown>') -> Dict[str, List]:
+    """
+    解析源代码中的导入语句。
+
+    跳过TYPE_CHECKING分支中只用于类型检查的导入；识别以字符串常量为参数的
+    importlib.import_module()和__import__()调用，作为动态导入。
+
+    Args:
+        source: 源代码
+        file_path: 文件路径，仅用于错误信息
+
+    Returns:
+        Dict[str, List]: imports为[模块名, 相对导入层级, 导入的名称列表]列表，
+        dynamic为动态导入的模块名列表
+    """
+    tree = ast.parse(source, filename=file_path)
+    imports = []
+    dynamic = []
+    
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ast.If) and _is_type_checking(node.test):
+            nodes.extend(node.orelse)
+            continue
+            
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.append([alias.name, 0, []])
+        elif isinstance(node, ast.ImportFrom):
+            imports.append([node.module or '', node.level, [alias.name for alias in node.names]])
+        elif isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else getattr(func, 'id', None)
+            if name in ('import_module', '__import__'):
+                module = _string_arg(node)
+                if module and not module.startswith('.'):
+                    dynamic.append(module)
+        
+        nodes.extend(ast.iter_child_nodes(node))
+        
+    return {'imports': imports, 'dynamic': dynamic}
+
+def _parse_file(file_path: str) -> Tuple[str, Optional[Dict[str, List]]]:
+    """在工作进程中解析单个文件，语法错误的文件返回None"""
+    try:
+        with open(file_path, 'rb') as f:
+            return file_path, parse_imports(f.read(), file_path)
+    except (OSError, SyntaxError, ValueError):
+        return file_path, None
+
+class ImportAnalyzer:
+    """
+    静态导入关系分析器。
+    从主脚本出发解析项目及其依赖的导入图，生成PyInstaller的--hidden-import和
+    --exclude-module参数：前者来自无法被静态分析发现的动态导入，后者是虚拟环境中
+    已安装但从未被导入的包。NEVER_EXCLUDE中的包和通过入口点注册插件的包可能在运行时
+    才被加载，不会出现在排除列表中。
+    """
+    
+    def __init__(self, logger: Optional[logging.Logger] = None, max_workers: Optional[int] = None):
+        """
+        初始化导入分析器。
+
+        Args:
+            logger: 可选的logger对象，用于日志记录
+            max_workers: 解析文件的进程数
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self._cache_path = get_cache_dir('imports') / 'parse-cache.json'
+        self._cache: Optional[Dict[str, Dict[str, List]]] = None
+        self._cache_dirty = False
+        self._cache_lock = threading.Lock()
+        self._listings: Dict[str, Set[str]] = {}
+        
+    def analyze(self,
+                script_path: str,
+                venv_path: Optional[str] = None,
+                follow_third_party: bool = True) -> Dict[str, Any]:
+        """
+        分析主脚本的导入图。
+
+        Args:
+            script_path: 主脚本路径
+            venv_path: 虚拟环境路径，未指定时使用当前解释器的site-packages
+            follow_third_party: 是否继续解析第三方包内部的导入；
+                生成exclude_modules需要完整的导入图，关闭后不生成排除列表
+
+        Returns:
+            Dict[str, Any]: 分析结果，包括modules（所有可达模块）、local_files（项目内文件）、
+            third_party（可达的第三方顶层包）、missing（无法解析的导入）、
+            hidden_imports、exclude_modules
+        """
+        script_path = os.path.abspath(script_path)
+        project_dir = os.path.dirname(script_path)
+        site_dirs = get_site_dirs(venv_path)
+        stdlib = self._get_stdlib_names()
+        self.logger.info(f"开始分析导入关系: {script_path}")
+        
+        modules: Dict[str, Optional[str]] = {'__main__': script_path}
+        local_files = {script_path}
+        third_party: Set[str] = set()
+        missing: Set[str] = set()
+        static: Set[str] = set()
+        dynamic: Set[str] = set()
+        
+        pending = [('__main__', script_path, project_dir)]
+        while pending:
+            parsed = self._parse_many([file_path for _, file_path, _ in pending])
+            wave, pending = pending, []
+            
+            for module_name, file_path, root in wave:
+                info = parsed.get(file_path)
+                if not info:
+                    continue
+                    
+                is_package = os.path.basename(file_path) == '__init__.py'
+                names = list(self._iter_import_names(info, module_name, is_package))
+                static.update(names)
+                if root == project_dir:
+                    # 动态导入的模块运行时同样会被加载，它的依赖也需要继续分析
+                    dynamic.update(info['dynamic'])
+                    names.extend(info['dynamic'])
+                    
+                for name in names:
+                    top = name.split('.')[0]
+                    if top in stdlib or name in modules:
+                        continue
+                    found = self._find_module(name, [project_dir] + site_dirs)
+                    if not found:
+                        # from a import b 中的b可能是属性而不是子模块，只记录顶层缺失
+                        if '.' not in name:
+                            missing.add(name)
+                        continue
+                        
+                    for parent in self._parent_names(name):
+                        if parent not in modules:
+                            parent_found = self._find_module(parent, [project_dir] + site_dirs)
+                            if parent_found:
+                                self._add_module(parent, parent_found, modules, pending,
+                                                 project_dir, local_files, third_party, follow_third_party)
+                    self._add_module(name, found, modules, pending,
+                                     project_dir, local_files, third_party, follow_third_party)
+        
+        self._save_cache()
+        
+        # 静态导入能被PyInstaller自己发现，只有仅通过动态导入加载的模块需要显式声明
+        hidden_imports = sorted(dynamic - static)
+        exclude_modules = []
+        if follow_third_party:
+            reached = third_party | {name.split('.')[0] for name in dynamic}
+            protected = NEVER_EXCLUDE | self._list_plugin_modules(site_dirs)
+            exclude_modules = sorted(self._list_installed(site_dirs) - reached - stdlib - protected)
+            
+        self.logger.info(
+            f"导入分析完成: {len(modules)} 个模块，{len(third_party)} 个第三方包，"
+            f"{len(hidden_imports)} 个隐藏导入，{len(exclude_modules)} 个可排除模块"
+        )
+        return {
+            'modules': sorted(modules),
+            'local_files': sorted(local_files),
+            'third_party': sorted(third_party),
+            'missing': sorted(missing),
+            'hidden_imports': hidden_imports,
+            'exclude_modules': exclude_modules
+        }
+        
+    def _add_module(self, name: str, found: Tuple[str, Optional[str]], modules: Dict[str, Optional[str]],
+                    pending: List[Tuple[str, str, str]], project_dir: str, local_files: Set[str],
+                    third_party: Set[str], follow_third_party: bool) -> None:
+        """记录一个可达模块，需要时加入下一轮解析"""
+        root, file_path = found
+        modules[name] = file_path
+        if root == project_dir:
+            if file_path:
+                local_files.add(file_path)
+        else:
+            third_party.add(name.split('.')[0])
+            if not follow_third_party:
+                return
+        if file_path and file_path.endswith('.py'):
+            pending.append((name, file_path, root))
+            
+    def _iter_import_names(self, info: Dict[str, List], module_name: str, is_package: bool) -> Iterable[str]:
+        """把解析出的导入语句换算为绝对模块名"""
+        if is_package:
+            package = module_name
+        else:
+            package = module_name.rpartition('.')[0]
+            
+        for module, level, names in info['imports']:
+            if level:
+                parts = package.split('.') if package else []
+                if level - 1 > len(parts):
+                    continue
+                base = '.'.join(parts[:len(parts) - (level - 1)])
+                module = f'{base}.{module}' if base and module else (base or module)
+            if module:
+                yield module
+            for name in names:
+                if name != '*':
+                    yield f'{module}.{name}' if module else name
+    
+    def _parent_names(self, name: str) -> List[str]:
+        """导入a.b.c时a和a.b也会被执行"""
+        parts = name.split('.')
+        return ['.'.join(parts[:i]) for i in range(1, len(parts))]
+        
+    def _find_module(self, name: str, roots: List[str]) -> Optional[Tuple[str, Optional[str]]]:
+        """
+        在搜索路径中查找模块。
+
+        Returns:
+            Optional[Tuple[str, Optional[str]]]: (所在的搜索路径, 文件路径)，未找到时返回None；
+            命名空间包没有对应文件，文件路径为None
+        """
+        parts = name.split('.')
+        for root in roots:
+            directory = os.path.join(root, *parts[:-1])
+            listing = self._list_dir(directory)
+            leaf = parts[-1]
+            if leaf + '.py' in listing:
+                return root, os.path.join(directory, leaf + '.py')
+            if leaf in listing:
+                package_dir = os.path.join(directory, leaf)
+                if '__init__.py' in self._list_dir(package_dir):
+                    return root, os.path.join(package_dir, '__init__.py')
+                return root, None
+            for entry in listing:
+                if entry.startswith(leaf + '.') and entry.endswith(_EXTENSION_SUFFIXES):
+                    return root, os.path.join(directory, entry)
+        return None
+        
+    def _list_dir(self, directory: str) -> Set[str]:
+        """读取并缓存目录内容，避免对每个候选文件单独stat"""
+        listing = self._listings.get(directory)
+        if listing is None:
+            try:
+                listing = set(os.listdir(directory))
+            except OSError:
+                listing = set()
+            self._listings[directory] = listing
+        return listing
+        
+    def _parse_many(self, file_paths: List[str]) -> Dict[str, Optional[Dict[str, List]]]:
+        """
+        解析一批文件：命中内容哈希缓存的直接复用，其余文件较多时使用进程池并行解析。
+        """
+        cache = self._load_cache()
+        results = {}
+        digests = {}
+        hits = []
+        uncached = []
+        for file_path in file_paths:
+            try:
+                with open(file_path, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                results[file_path] = None
+                continue
+            digests[file_path] = digest
+            if digest in cache:
+                results[file_path] = cache[digest]
+                hits.append(digest)
+            else:
+                uncached.append(file_path)
+                
+        if len(uncached) > PARALLEL_THRESHOLD:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                parsed = list(executor.map(_parse_file, uncached, chunksize=16))
+        else:
+            parsed = [_parse_file(file_path) for file_path in uncached]
+            
+        with self._cache_lock:
+            # 缓存按最近使用排序，命中的条目移到末尾
+            for digest in hits:
+                if digest in cache:
+                    cache[digest] = cache.pop(digest)
+            for file_path, info in parsed:
+                results[file_path] = info
+                if info is not None:
+                    cache[digests[file_path]] = info
+                    self._cache_dirty = True
+        return results
+        
+    def _load_cache(self) -> Dict[str, Dict[str, List]]:
+        """加载按内容哈希索引的解析缓存"""
+        if self._cache is None:
+            try:
+                with open(self._cache_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._cache = data['entries'] if data.get('version') == _CACHE_VERSION else {}
+            except (OSError, ValueError, KeyError):
+                self._cache = {}
+        return self._cache
+        
+    def _save_cache(self) -> None:
+        """有新解析结果时写回解析缓存，只保留最近使用的PARSE_CACHE_MAX_ENTRIES个条目"""
+        with self._cache_lock:
+            if not self._cache_dirty:
+                return
+            for digest in list(self._cache)[:max(0, len(self._cache) - PARSE_CACHE_MAX_ENTRIES)]:
+                del self._cache[digest]
+            content = json.dumps({'version': _CACHE_VERSION, 'entries': self._cache})
+            # 多个进程共用解析缓存，各自写入独立的临时文件后再替换
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self._cache_path.parent)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, self._cache_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self._cache_dirty = False
+            
+    def _get_stdlib_names(self) -> Set[str]:
+        """获取标准库顶层模块名"""
+        names = set(sys.builtin_module_names)
+        if hasattr(sys, 'stdlib_module_names'):
+            names.update(sys.stdlib_module_names)
+        else:
+            stdlib_dir = sysconfig.get_paths()['stdlib']
+            for entry in os.listdir(stdlib_dir):
+                names.add(entry.split('.')[0])
+            lib_dynload = os.path.join(stdlib_dir, 'lib-dynload')
+            if os.path.isdir(lib_dynload):
+                names.update(entry.split('.')[0] for entry in os.listdir(lib_dynload))
+        names.add('__future__')
+        return names
+        
+    def _list_installed(self, site_dirs: List[str]) -> Set[str]:
+        """列出site-packages中安装的顶层模块和包"""
+        installed = set()
+        for site_dir in site_dirs:
+            for entry in self._list_dir(site_dir):
+                path = Path(site_dir, entry)
+                if entry.endswith(('.dist-info', '.egg-info', '.pth')) or entry == '__pycache__':
+                    continue
+                name = entry.split('.')[0] if path.is_file() else entry
+                if path.is_file() and not entry.endswith(('.py',) + _EXTENSION_SUFFIXES):
+                    continue
+                if name.isidentifier():
+                    installed.add(name)
+        return installed
+        
+    def _list_plugin_modules(self, site_dirs: List[str]) -> Set[str]:
+        """列出通过入口点注册插件的顶层模块，这些模块由宿主包在运行时按入口点加载"""
+        modules = set()
+        for site_dir in site_dirs:
+            for entry in self._list_dir(site_dir):
+                if not entry.endswith(('.dist-info', '.egg-info')):
+                    continue
+                parser = configparser.ConfigParser(delimiters=('=',), interpolation=None)
+                parser.optionxform = str
+                try:
+                    parser.read(os.path.join(site_dir, entry, 'entry_points.txt'), encoding='utf-8')
+                except (configparser.Error, UnicodeDecodeError):
+                    continue
+                for group in parser.sections():
+                    if group in _SCRIPT_ENTRY_POINT_GROUPS:
+                        continue
+                    for value in parser[group].values():
+                        name = value.split(':')[0].strip().split('.')[0]
+                        if name.isidentifier():
+                            modules.add(name)
+        return modules
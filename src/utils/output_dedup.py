@@ -0,0 +1,249 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import stat
+import time
+from pathlib import Path
+
+from utils.cache_utils import get_cache_dir, hash_file
+
+# Linux下克隆文件数据块的ioctl请求号（FICLONE），btrfs、xfs等支持写时复制的文件系统可用
+_FICLONE = 0x40049409
+
+# 小于该大小（字节）的文件不去重，节省的空间不足以抵消哈希和链接的开销
+DEFAULT_MIN_SIZE = 4096
+
+class OutputDeduplicator:
+    """
+    打包产物去重。
+    多个onedir产物中往往包含相同的Python运行时、扩展模块和第三方包。并行计算产物中各文件的
+    哈希，以"内容哈希-文件权限"为键存入共享的内容寻址存储，相同的文件替换为指向存储对象的
+    硬链接或reflink（写时复制克隆）。
+
+    注意：硬链接的文件共享同一份数据，原地修改其中一个会影响所有产物；reflink没有这个问题，
+    但需要文件系统支持。存储目录必须与产物位于同一文件系统，否则对应的文件会被跳过。
+    """
+    
+    def __init__(self,
+                 store_dir: Optional[str] = None,
+                 mode: str = 'auto',
+                 min_size: int = DEFAULT_MIN_SIZE,
+                 max_workers: Optional[int] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化去重器。
+
+        Args:
+            store_dir: 共享存储目录，默认为用户缓存目录下的dedup-store
+            mode: 链接方式，'hardlink'、'reflink'或'auto'（支持reflink时优先使用）
+            min_size: 参与去重的最小文件大小（字节）
+            max_workers: 计算哈希的线程数
+            logger: 可选的logger对象，用于日志记录
+        """
+        if mode not in ('auto', 'hardlink', 'reflink'):
+            raise ValueError(f"不支持的链接方式: {mode}")
+        self.logger = logger or logging.getLogger(__name__)
+        self.store_dir = Path(store_dir) if store_dir else get_cache_dir('dedup-store')
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        self.min_size = min_size
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self._store_dev = self.store_dir.stat().st_dev
+        self._reflink_supported: Optional[bool] = None if mode != 'hardlink' else False
+        
+    def dedupe(self, paths: Iterable[str]) -> Dict[str, Any]:
+        """
+        对产物目录（或文件）去重。
+
+        Args:
+            paths: 产物路径，通常是多个onedir产物目录
+
+        Returns:
+            Dict[str, Any]: 包含files（参与去重的文件数）、total_bytes、duplicates（被替换为
+            链接的文件数）、reclaimed_bytes（回收的空间）、already_linked（已是存储对象的文件数）、
+            skipped（跨文件系统等无法处理的文件数）、method和duration字段
+        """
+        start_time = time.time()
+        # 提前确定链接方式，指定reflink但不支持时直接报错
+        method = 'reflink' if self._use_reflink() else 'hardlink'
+        files = self._collect_files(paths)
+        result = {
+            'files': len(files),
+            'total_bytes': sum(size for _, size, _ in files),
+            'duplicates': 0,
+            'reclaimed_bytes': 0,
+            'already_linked': 0,
+            'skipped': 0,
+            'method': method
+        }
+        
+        # 已经是存储对象硬链接的文件无需再计算哈希
+        store_inodes = self._get_store_inodes()
+        pending = []
+        for file_path, size, st in files:
+            if (st.st_dev, st.st_ino) in store_inodes:
+                result['already_linked'] += 1
+            elif st.st_dev != self._store_dev:
+                result['skipped'] += 1
+            else:
+                pending.append((file_path, size, st))
+        if result['skipped']:
+            self.logger.warning(f"{result['skipped']} 个文件与存储目录不在同一文件系统，已跳过: {self.store_dir}")
+            
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            digests = list(executor.map(lambda item: hash_file(item[0]), pending))
+            
+        for (file_path, size, st), digest in zip(pending, digests):
+            object_path = self._object_path(digest, st.st_mode)
+            try:
+                linked = self._link(file_path, object_path, st)
+            except OSError as e:
+                self.logger.warning(f"去重失败，保留原文件: {file_path} ({str(e)})")
+                result['skipped'] += 1
+                continue
+            if linked:
+                result['duplicates'] += 1
+                # 原文件还有其他硬链接时，删除这一个并不会释放空间
+                if st.st_nlink == 1:
+                    result['reclaimed_bytes'] += size
+        
+        result['duration'] = time.time() - start_time
+        self.logger.info(
+            f"产物去重完成: {result['files']} 个文件（{result['total_bytes'] / 1024 / 1024:.1f} MB），"
+            f"替换 {result['duplicates']} 个重复文件，回收 {result['reclaimed_bytes'] / 1024 / 1024:.1f} MB，"
+            f"耗时 {result['duration']:.1f} 秒"
+        )
+        return result
+        
+    def purge(self) -> Dict[str, int]:
+        """
+        清理不再被任何产物引用的存储对象（硬链接数为1的对象）。
+        reflink方式的存储对象与产物不共享inode，无法判断是否仍被引用，不会被清理。
+
+        Returns:
+            Dict[str, int]: removed（删除的对象数）和freed_bytes
+        """
+        removed = 0
+        freed = 0
+        for object_path in self._iter_objects():
+            st = object_path.stat()
+            if st.st_nlink == 1 and not object_path.name.endswith('.clone'):
+                object_path.unlink()
+                removed += 1
+                freed += st.st_size
+        self.logger.info(f"清理存储对象: 删除 {removed} 个，释放 {freed / 1024 / 1024:.1f} MB")
+        return {'removed': removed, 'freed_bytes': freed}
+        
+    def _collect_files(self, paths: Iterable[str]) -> List[Tuple[str, int, os.stat_result]]:
+        """收集需要去重的普通文件，不跟随符号链接"""
+        files = []
+        for path in paths:
+            if os.path.isfile(path) and not os.path.islink(path):
+                candidates: Iterable[str] = [path]
+            else:
+                candidates = (
+                    os.path.join(root, name) for root, _, names in os.walk(path) for name in names
+                )
+            for file_path in candidates:
+                st = os.lstat(file_path)
+                if stat.S_ISREG(st.st_mode) and st.st_size >= max(1, self.min_size):
+                    files.append((file_path, st.st_size, st))
+        return files
+        
+    def _get_store_inodes(self) -> Set[Tuple[int, int]]:
+        """获取存储中所有对象的(设备号, inode)"""
+        inodes = set()
+        for object_path in self._iter_objects():
+            st = object_path.stat()
+            inodes.add((st.st_dev, st.st_ino))
+        return inodes
+        
+    def _iter_objects(self) -> Iterable[Path]:
+        """遍历存储中的对象文件"""
+        for prefix_dir in self.store_dir.iterdir():
+            if prefix_dir.is_dir():
+                yield from (p for p in prefix_dir.iterdir() if p.is_file() and not p.name.startswith('.'))
+    
+    def _object_path(self, digest: str, file_mode: int) -> Path:
+        """
+        存储对象路径。硬链接共享权限位，文件权限是键的一部分，
+        否则可执行文件和普通文件内容相同时会互相改变权限。
+        """
+        name = f'{digest}-{stat.S_IMODE(file_mode):o}'
+        if self._use_reflink():
+            # reflink对象与产物不共享inode，单独命名以便清理时区分
+            name += '.clone'
+        return self.store_dir / digest[:2] / name
+        
+    def _link(self, file_path: str, object_path: Path, st: os.stat_result) -> bool:
+        """
+        将文件与存储对象关联：对象不存在时以该文件为对象，存在时把文件替换为对象的链接。
+
+        Returns:
+            bool: 文件是否被替换为链接
+        """
+        object_path.parent.mkdir(exist_ok=True)
+        use_reflink = self._use_reflink()
+        if not object_path.exists():
+            try:
+                if use_reflink:
+                    temp_path = object_path.with_name(f'.{object_path.name}.{os.getpid()}')
+                    try:
+                        self._reflink(file_path, str(temp_path))
+                        os.replace(temp_path, object_path)
+                    finally:
+                        if temp_path.exists():
+                            temp_path.unlink()
+                else:
+                    # os.link在目标已存在时失败，并发去重时只有一个文件会成为存储对象
+                    os.link(file_path, object_path)
+                return False
+            except FileExistsError:
+                pass
+                
+        if not use_reflink and os.path.samefile(file_path, object_path):
+            return False
+        # 先在同一目录中创建链接，再原子地替换原文件
+        temp_path = f'{file_path}.dedup-{os.getpid()}'
+        try:
+            if use_reflink:
+                self._reflink(str(object_path), temp_path)
+                os.chmod(temp_path, stat.S_IMODE(st.st_mode))
+                os.utime(temp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            else:
+                os.link(object_path, temp_path)
+            os.replace(temp_path, file_path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return True
+        
+    def _use_reflink(self) -> bool:
+        """判断是否使用reflink，首次调用时在存储目录中实际尝试一次"""
+        if self._reflink_supported is None:
+            probe_source = self.store_dir / f'.reflink-probe-{os.getpid()}'
+            probe_target = self.store_dir / f'.reflink-probe-{os.getpid()}.clone'
+            try:
+                probe_source.write_bytes(b'pyezpacker')
+                self._reflink(str(probe_source), str(probe_target))
+                self._reflink_supported = True
+            except OSError:
+                self._reflink_supported = False
+            finally:
+                for path in (probe_source, probe_target):
+                    if path.exists():
+                        path.unlink()
+            if self.mode == 'reflink' and not self._reflink_supported:
+                raise OSError("存储目录所在的文件系统不支持reflink")
+        return self._reflink_supported
+        
+    def _reflink(self, source: str, target: str) -> None:
+        """通过FICLONE克隆文件，目标文件与源文件共享数据块（仅Linux）"""
+        try:
+            import fcntl
+        except ImportError:
+            raise OSError("当前平台不支持reflink")
+        with open(source, 'rb') as src, open(target, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
@@ -1,25 +1,49 @@
-from typing import List, Optional, Dict
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Dict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import subprocess
 import os
 import sys
+import threading
+import time
 import logging
 from pathlib import Path
 import tempfile
 
+if TYPE_CHECKING:
+    from utils.build_cache import BuildCache
+    from utils.workpath import WorkpathManager
+
 class PyInstaller:
     """
     PyInstaller打包工具的封装类。
     提供简化的接口来执行Python项目的打包操作。
     """
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self,
+                 logger: Optional[logging.Logger] = None,
+                 build_cache: Optional['BuildCache'] = None,
+                 workpath_manager: Optional['WorkpathManager'] = None,
+                 metrics_path: Optional[str] = None):
         """
         初始化PyInstaller封装类。
 
         Args:
             logger: 可选的logger对象，用于日志记录
+            build_cache: 可选的打包缓存，输入未变化时直接还原产物而不重新打包
+            workpath_manager: 可选的工作目录管理器，为每个目标提供持久化的workpath，
+                未指定时使用PyInstaller默认的build目录
+            metrics_path: 打包指标记录文件，默认与packager.log位于同一logs目录（见build_metrics.get_log_dir）
         """
         self.logger = logger or logging.getLogger(__name__)
+        self.build_cache = build_cache
+        self.workpath_manager = workpath_manager
+        self.metrics_path = metrics_path
+        
+        # 正在运行的PyInstaller进程，用于取消打包
+        self._processes = set()
+        self._process_lock = threading.Lock()
+        self._cancel_event = threading.Event()
         
     def build(self,
               script_path: str,
@@ -28,10 +52,36 @@ class PyInstaller:
               venv_path: Optional[str] = None,
               icon_path: Optional[str] = None,
               extra_files: Optional[List[str]] = None,
-              version_file: Optional[str] = None) -> None:
+              version_file: Optional[str] = None,
+              hidden_imports: Optional[List[str]] = None,
+              exclude_modules: Optional[List[str]] = None,
+              runtime_hooks: Optional[List[str]] = None,
+              upx: bool = True,
+              strip: bool = False,
+              optimize: Optional[int] = None,
+              packed_files: Optional[List[str]] = None,
+              stage_data: bool = False,
+              staged_data: Optional[Dict[str, Any]] = None,
+              output_name: Optional[str] = None,
+              output_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         执行打包操作。
-        通过创建批处理文件并在新的cmd窗口中执行来实现打包过程的可视化。
+        Windows下通过创建批处理文件并在新的cmd窗口中执行来实现打包过程的可视化；
+        Linux/Mac下以参数列表直接运行PyInstaller（不经过shell），并捕获其输出。
+        指定output_callback时，PyInstaller的每行输出会实时传给该回调（仅Linux/Mac）。
+        hidden_imports和exclude_modules通常来自ImportAnalyzer的分析结果；
+        runtime_hooks为额外的运行时钩子脚本，例如StartupProfiler的启动耗时分析钩子。
+        upx为False时即使找到UPX也不压缩；strip为True时去除可执行文件和动态库的符号表；
+        optimize为收集的Python模块的字节码优化级别（0-2），未指定时与解释器一致。
+        packed_files中的文件或目录会合并为一个数据归档打包，程序通过运行时模块pyezpacker_data
+        以mmap方式读取；单文件模式下归档仍会随程序解压到临时目录，只有目录模式完全免去解压。
+        stage_data为True时（默认不启用）extra_files先由DataStager整理到预置目录，只复制变化的文件，
+        PyInstaller只需添加这一个目录；已经预置过时通过staged_data传入DataStager.stage()的结果。
+        output_name为产物名称，未指定时根据版本信息文件生成（见resolve_output_name）。
+
+        Returns:
+            Dict[str, Any]: 打包结果，包含command、returncode、output、success等字段。
+            Windows下打包在独立窗口中进行，returncode为None。
         """
         try:
             # 准备工作目录（主脚本所在目录）
@@ -39,21 +89,24 @@ class PyInstaller:
             self.logger.info(f"工作目录: {work_dir}")
             
             # 如果有版本信息文件，读取产品名称和版本号
-            output_name = None
-            if version_file:
-                try:
-                    from utils.version_parser import VersionParser
-                    parser = VersionParser(self.logger)
-                    version_info = parser.parse_version_file(version_file)
-                    product_name = version_info.get('ProductName', '').strip()
-                    product_version = version_info.get('ProductVersion', '').strip()
-                    if product_name and product_version:
-                        # 移除版本号中的点号，使用下划线连接
-                        version_str = product_version.replace('.', '_')
-                        output_name = f"{product_name}_v{version_str}"
-                        self.logger.info(f"使用版本信息命名: {output_name}")
-                except Exception as e:
-                    self.logger.warning(f"读取版本信息失败，使用默认名称: {str(e)}")
+            if not output_name:
+                output_name = self.resolve_output_name(version_file)
+            
+            # 合并需要打包为归档的数据文件
+            packed_archive = self._build_packed_archive(script_path, packed_files) if packed_files else None
+            
+            # 预置额外文件，未变化的文件不重新读取和复制
+            data_files = extra_files
+            data_digest = None
+            if staged_data:
+                data_files = [staged_data['data_dir']] if staged_data['files'] else []
+                data_digest = staged_data['digest']
+            elif extra_files and stage_data:
+                from utils.data_stager import DataStager
+                stager = DataStager(logger=self.logger)
+                staged = stager.stage(extra_files, str(stager.get_staging_dir(script_path, extra_files)))
+                data_files = [staged['data_dir']] if staged['files'] else []
+                data_digest = staged['digest']
             
             # 构建命令
             if os.name == 'nt':  # Windows
@@ -63,8 +116,15 @@ class PyInstaller:
                     onefile=onefile,
                     venv_path=venv_path,
                     icon_path=icon_path,
-                    extra_files=extra_files,
+                    extra_files=data_files,
                     version_file=version_file,
+                    hidden_imports=hidden_imports,
+                    exclude_modules=exclude_modules,
+                    runtime_hooks=runtime_hooks,
+                    upx=upx,
+                    strip=strip,
+                    optimize=optimize,
+                    packed_archive=packed_archive,
                     output_name=output_name
                 )
                 
@@ -95,14 +155,392 @@ pause >nul
                 # 等待进程启动
                 process.wait()
                 
+                return {
+                    'script_path': script_path,
+                    'output_dir': output_dir,
+                    'command': cmd,
+                    'returncode': None,
+                    'output': '',
+                    'success': True,
+                    'duration': 0.0
+                }
+                
             else:  # Linux/Mac
-                # Unix系统的实现（如果需要的话）
-                pass
+                command_kwargs = dict(
+                    script_path=script_path,
+                    output_dir=output_dir,
+                    onefile=onefile,
+                    venv_path=venv_path,
+                    icon_path=icon_path,
+                    extra_files=data_files,
+                    version_file=version_file,
+                    hidden_imports=hidden_imports,
+                    exclude_modules=exclude_modules,
+                    runtime_hooks=runtime_hooks,
+                    upx=upx,
+                    strip=strip,
+                    optimize=optimize,
+                    packed_archive=packed_archive,
+                    output_name=output_name
+                )
+                argv = self._build_unix_command(**command_kwargs)
+                
+                # 使用持久化的工作目录，复用PyInstaller的增量分析结果
+                workpath = None
+                base_argv = argv
+                if self.workpath_manager:
+                    workpath = self.workpath_manager.get_workpath(script_path, argv)
+                    argv = self._build_unix_command(workpath=workpath, **command_kwargs)
+                
+                # 输入未变化时直接从缓存还原产物
+                cache_key = None
+                if self.build_cache:
+                    cache_key = self.build_cache.compute_key(
+                        argv,
+                        script_path=script_path,
+                        extra_files=([] if data_digest else list(extra_files or [])) +
+                                    ([packed_archive] if packed_archive else []),
+                        icon_path=icon_path,
+                        version_file=version_file,
+                        runtime_hooks=runtime_hooks,
+                        data_digest=data_digest
+                    )
+                    restored = self.build_cache.restore(cache_key, output_dir)
+                    if restored:
+                        return {
+                            'script_path': script_path,
+                            'output_dir': output_dir,
+                            'command': argv,
+                            'returncode': 0,
+                            'output': '',
+                            'success': True,
+                            'duration': 0.0,
+                            'cached': True
+                        }
+                
+                if workpath:
+                    # 持有锁期间校验参数指纹，参数变化时清空工作目录
+                    with self.workpath_manager.lock(workpath, script_path, base_argv):
+                        result = self._run_unix_build(argv, work_dir, output_callback)
+                else:
+                    result = self._run_unix_build(argv, work_dir, output_callback)
+                artifact = self._get_artifact_path(script_path, output_dir, output_name)
+                result.update(
+                    script_path=script_path,
+                    output_dir=output_dir,
+                    cached=False,
+                    artifact=artifact,
+                    # PyInstaller在workpath/<name>下生成TOC等中间文件
+                    toc_dir=os.path.join(workpath or os.path.join(work_dir, 'build'), os.path.basename(artifact))
+                )
+                
+                if cache_key and result['success']:
+                    if os.path.exists(artifact):
+                        self.build_cache.store(cache_key, [artifact])
+                    else:
+                        self.logger.warning(f"未找到打包产物，跳过缓存: {artifact}")
+                return result
                 
         except Exception as e:
             self.logger.error(f"打包过程中出现错误: {str(e)}")
             raise
             
+    def build_batch(self,
+                    targets: List[Dict[str, Any]],
+                    max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        并发执行多个打包目标。
+
+        每个打包目标都是传给build()的关键字参数字典。PyInstaller本身运行在独立的
+        子进程中，这里的线程池只负责调度与等待，max_workers即同时运行的PyInstaller
+        进程数上限。
+
+        Args:
+            targets: 打包目标列表
+            max_workers: 最大并发数，默认为CPU核心数
+
+        Returns:
+            List[Dict[str, Any]]: 与targets顺序一致的打包结果列表
+        """
+        if not targets:
+            return []
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        self.logger.info(f"开始批量打包: {len(targets)} 个目标，并发数 {max_workers}")
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._build_target, target) for target in targets]
+            results = [future.result() for future in futures]
+        
+        failed = [r for r in results if not r['success']]
+        self.logger.info(f"批量打包完成: 成功 {len(results) - len(failed)} 个，失败 {len(failed)} 个")
+        for result in failed:
+            self.logger.error(f"打包失败: {result['script_path']}")
+        
+        return results
+        
+    def build_matrix(self,
+                     target: Dict[str, Any],
+                     venvs: List[Optional[str]],
+                     max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        使用多个虚拟环境并发打包同一个目标。
+
+        每个环境的产物输出到target['output_dir']下以环境命名的子目录中。工作目录由
+        WorkpathManager按解释器区分，各环境互不干扰；未配置工作目录管理器时自动创建一个。
+
+        Args:
+            target: 传给build()的关键字参数字典，其中的venv_path会被忽略
+            venvs: 虚拟环境路径列表，None表示使用当前解释器
+            max_workers: 最大并发数，默认为CPU核心数
+
+        Returns:
+            Dict[str, Any]: 包含results（与venvs顺序一致的打包结果，附带label、
+            python_version字段）、table（汇总表文本）和success（是否全部成功）
+        """
+        if self.workpath_manager is None:
+            from utils.workpath import WorkpathManager
+            self.workpath_manager = WorkpathManager(logger=self.logger)
+            
+        labels = []
+        targets = []
+        for venv_path in venvs:
+            python_version = self._get_python_version(venv_path)
+            name = os.path.basename(os.path.normpath(venv_path)) if venv_path else 'system'
+            label = f"py{python_version.replace('.', '')}-{name}" if python_version != 'unknown' else name
+            # 同名环境追加序号，保证输出子目录互不相同
+            if label in labels:
+                label = f"{label}-{len(labels)}"
+            labels.append(label)
+            targets.append(dict(
+                target,
+                venv_path=venv_path,
+                output_dir=os.path.join(target['output_dir'], label)
+            ))
+            
+        self.logger.info(f"开始矩阵打包: {len(targets)} 个环境")
+        results = self.build_batch(targets, max_workers=max_workers)
+        for label, venv_path, result in zip(labels, venvs, results):
+            result.update(label=label, venv_path=venv_path, python_version=self._get_python_version(venv_path))
+            
+        table = self.format_matrix_table(results)
+        self.logger.info(f"矩阵打包结果:\n{table}")
+        return {
+            'results': results,
+            'table': table,
+            'success': all(result['success'] for result in results)
+        }
+        
+    def format_matrix_table(self, results: List[Dict[str, Any]]) -> str:
+        """
+        生成矩阵打包结果的汇总表文本。
+
+        Args:
+            results: build_matrix()返回的results
+
+        Returns:
+            str: 汇总表文本
+        """
+        lines = [f"{'环境':<28}{'Python':<10}{'状态':<8}{'耗时(秒)':>10}{'大小(MB)':>10}  产物"]
+        for result in results:
+            if result.get('error'):
+                status = '出错'
+            elif result.get('cancelled'):
+                status = '已取消'
+            elif result['success']:
+                status = '缓存' if result.get('cached') else '成功'
+            else:
+                status = '失败'
+            artifact = result.get('artifact') or ''
+            size = self._get_path_size(artifact) / 1024 / 1024 if artifact and os.path.exists(artifact) else 0.0
+            lines.append(
+                f"{result.get('label', ''):<28}{result.get('python_version', ''):<10}{status:<8}"
+                f"{result.get('duration', 0.0):>10.1f}{size:>10.1f}  {artifact or result.get('error', '')}"
+            )
+        return '\n'.join(lines)
+        
+    def _get_python_version(self, venv_path: Optional[str]) -> str:
+        """获取虚拟环境的Python版本（主版本.次版本），读取pyvenv.cfg而不启动解释器"""
+        if not venv_path:
+            return f'{sys.version_info.major}.{sys.version_info.minor}'
+            
+        try:
+            with open(os.path.join(venv_path, 'pyvenv.cfg'), 'r', encoding='utf-8') as f:
+                for line in f:
+                    key, _, value = line.partition('=')
+                    if key.strip() in ('version', 'version_info'):
+                        return '.'.join(value.strip().split('.')[:2])
+        except OSError:
+            pass
+        return 'unknown'
+        
+    def _get_path_size(self, path: str) -> int:
+        """获取文件或目录（onedir产物）的总大小"""
+        if os.path.isfile(path):
+            return os.path.getsize(path)
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                total += os.path.getsize(os.path.join(root, name))
+        return total
+    
+    def _build_target(self, target: Dict[str, Any]) -> Dict[str, Any]:
+        """执行单个批量打包目标，将异常转换为失败结果而不是中断整个批次"""
+        try:
+            return self.build(**target)
+        except Exception as e:
+            return {
+                'script_path': target.get('script_path'),
+                'output_dir': target.get('output_dir'),
+                'command': None,
+                'returncode': None,
+                'output': '',
+                'success': False,
+                'duration': 0.0,
+                'error': str(e)
+            }
+    
+    def _build_packed_archive(self, script_path: str, packed_files: List[str]) -> str:
+        """
+        生成数据归档，返回归档路径。
+        归档按脚本和文件列表存放在缓存目录中，内容未变化时保留原文件，不影响增量打包和打包缓存。
+        """
+        from utils.cache_utils import get_cache_dir
+        from utils.data_archive import ARCHIVE_NAME, DataArchiveBuilder
+        
+        key_source = '\n'.join([os.path.abspath(script_path)] + [os.path.abspath(path) for path in packed_files])
+        key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()[:16]
+        archive_path = str(get_cache_dir('packed-data', key) / ARCHIVE_NAME)
+        DataArchiveBuilder(self.logger).build(packed_files, archive_path)
+        return archive_path
+        
+    def resolve_output_name(self, version_file: Optional[str]) -> Optional[str]:
+        """根据版本信息文件中的产品名称和版本号生成输出文件名，无法生成时返回None"""
+        if not version_file:
+            return None
+        
+        try:
+            from utils.version_parser import VersionParser
+            parser = VersionParser(self.logger)
+            version_info = parser.parse_version_file(version_file)
+            product_name = version_info.get('ProductName', '').strip()
+            product_version = version_info.get('ProductVersion', '').strip()
+            if product_name and product_version:
+                # 移除版本号中的点号，使用下划线连接
+                version_str = product_version.replace('.', '_')
+                output_name = f"{product_name}_v{version_str}"
+                self.logger.info(f"使用版本信息命名: {output_name}")
+                return output_name
+        except Exception as e:
+            self.logger.warning(f"读取版本信息失败，使用默认名称: {str(e)}")
+        
+        return None
+    
+    def _get_artifact_path(self, script_path: str, output_dir: str, output_name: Optional[str]) -> str:
+        """获取打包产物路径：单文件模式为可执行文件，目录模式为同名目录"""
+        name = output_name or Path(script_path).stem
+        if os.name == 'nt' and not os.path.isdir(os.path.join(output_dir, name)):
+            name += '.exe'
+        return os.path.join(output_dir, name)
+    
+    def _run_unix_build(self,
+                        argv: List[str],
+                        work_dir: str,
+                        output_callback: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """
+        在工作目录中运行PyInstaller并逐行读取输出。
+
+        Args:
+            argv: PyInstaller命令参数列表
+            work_dir: 工作目录
+            output_callback: 可选的回调函数，每读到一行输出即调用一次
+
+        Returns:
+            Dict[str, Any]: 包含命令、返回码、输出、耗时和metrics（各阶段耗时与资源占用）的结果字典
+        """
+        if self._cancel_event.is_set():
+            self.logger.warning(f"打包已取消，跳过: {argv[-1]}")
+            return {
+                'command': argv,
+                'returncode': None,
+                'output': '',
+                'success': False,
+                'duration': 0.0,
+                'cancelled': True
+            }
+        
+        self.logger.info(f"执行打包命令: {subprocess.list2cmdline(argv)}")
+        start = time.perf_counter()
+        
+        process = subprocess.Popen(
+            argv,
+            cwd=work_dir,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            encoding='utf-8',
+            errors='replace'
+        )
+        with self._process_lock:
+            self._processes.add(process)
+        
+        # 记录各阶段耗时并采样进程树的资源占用
+        from utils.build_metrics import BuildMonitor, write_metrics
+        monitor = BuildMonitor(process.pid, logger=self.logger)
+        monitor.start()
+        
+        lines = []
+        try:
+            for line in process.stdout:
+                lines.append(line)
+                monitor.feed_line(line)
+                if output_callback:
+                    output_callback(line.rstrip('\n'))
+            returncode = process.wait()
+        finally:
+            process.stdout.close()
+            with self._process_lock:
+                self._processes.discard(process)
+            metrics = monitor.stop(process.returncode)
+        
+        duration = time.perf_counter() - start
+        cancelled = self._cancel_event.is_set() and returncode != 0
+        if returncode == 0:
+            self.logger.info(f"打包完成，耗时 {duration:.1f} 秒")
+        elif cancelled:
+            self.logger.warning("打包已取消")
+        else:
+            self.logger.error(f"打包失败，返回码 {returncode}")
+        
+        self.logger.info(monitor.format_summary(metrics))
+        metrics.update(script_path=argv[-1], command=argv)
+        try:
+            write_metrics(metrics, self.metrics_path)
+        except OSError as e:
+            self.logger.warning(f"写入打包指标失败: {str(e)}")
+        
+        return {
+            'command': argv,
+            'returncode': returncode,
+            'output': ''.join(lines),
+            'success': returncode == 0,
+            'duration': duration,
+            'cancelled': cancelled,
+            'metrics': metrics
+        }
+    
+    def cancel(self) -> None:
+        """
+        取消打包：终止正在运行的PyInstaller进程，并跳过此后尚未开始的打包。
+        仅对Linux/Mac下的无界面打包有效，Windows下的打包窗口需要手动关闭。
+        """
+        self._cancel_event.set()
+        with self._process_lock:
+            processes = list(self._processes)
+        for process in processes:
+            self.logger.info(f"终止打包进程: {process.pid}")
+            process.terminate()
+            
     def _build_windows_command(self, **kwargs) -> str:
         """构建Windows平台的命令"""
         script_path = kwargs['script_path']
@@ -143,29 +581,53 @@ pause >nul
         if kwargs.get('extra_files'):
             for file in kwargs['extra_files']:
                 cmd_parts.extend(['--add-data', f'"{file};."'])
+                
+        # 数据归档及其运行时读取模块
+        if kwargs.get('packed_archive'):
+            from utils.data_archive import RUNTIME_DIR, RUNTIME_MODULE
+            cmd_parts.extend(['--add-data', f'"{kwargs["packed_archive"]};."'])
+            cmd_parts.extend(['--paths', f'"{RUNTIME_DIR}"', '--hidden-import', RUNTIME_MODULE])
+                
+        for module in kwargs.get('hidden_imports') or []:
+            cmd_parts.extend(['--hidden-import', f'"{module}"'])
+            
+        for module in kwargs.get('exclude_modules') or []:
+            cmd_parts.extend(['--exclude-module', f'"{module}"'])
+        
+        for hook in kwargs.get('runtime_hooks') or []:
+            cmd_parts.extend(['--runtime-hook', f'"{hook}"'])
+            
+        if not kwargs.get('upx', True):
+            cmd_parts.append('--noupx')
+        if kwargs.get('strip'):
+            cmd_parts.append('--strip')
+        if kwargs.get('optimize') is not None:
+            cmd_parts.extend(['--optimize', str(kwargs['optimize'])])
         
         # 添加主脚本
         cmd_parts.append(f'"{script_path}"')
         
         return ' '.join(cmd_parts)
         
-    def _build_unix_command(self, **kwargs) -> str:
-        """构建Unix平台的命令"""
+    def _build_unix_command(self, **kwargs) -> List[str]:
+        """
+        构建Unix平台的命令参数列表。
+        直接调用虚拟环境（或当前解释器）中的PyInstaller模块，无需激活脚本和shell。
+        """
         script_path = kwargs['script_path']
         venv_path = kwargs.get('venv_path')
+        output_name = kwargs.get('output_name')
         
-        # 基础命令部分
-        cmd_parts = []
-        
-        # 如果指定了虚拟环境，先激活它
+        # 如果指定了虚拟环境，使用其中的Python解释器
         if venv_path:
-            activate_script = os.path.join(venv_path, 'bin', 'activate')
-            if not os.path.exists(activate_script):
-                raise FileNotFoundError(f"虚拟环境激活脚本不存在: {activate_script}")
-            cmd_parts.append(f'source "{activate_script}" &&')
+            python = os.path.join(venv_path, 'bin', 'python')
+            if not os.path.exists(python):
+                raise FileNotFoundError(f"虚拟环境Python解释器不存在: {python}")
+        else:
+            python = sys.executable
         
-        # 添加pyinstaller命令
-        cmd_parts.append('pyinstaller')
+        # 基础命令部分（非交互运行，不等待删除确认）
+        cmd_parts = [python, '-m', 'PyInstaller', '--noconfirm']
         
         # 添加选项
         if kwargs.get('onefile'):
@@ -173,19 +635,49 @@ pause >nul
         else:
             cmd_parts.append('--onedir')
             
-        cmd_parts.extend(['--distpath', f'"{kwargs["output_dir"]}"'])
+        cmd_parts.extend(['--distpath', os.path.abspath(kwargs['output_dir'])])
+        
+        # 中间文件和spec文件放到指定的工作目录
+        if kwargs.get('workpath'):
+            cmd_parts.extend(['--workpath', kwargs['workpath'], '--specpath', kwargs['workpath']])
+        
+        # 设置输出文件名
+        if output_name:
+            cmd_parts.extend(['--name', output_name])
         
         if kwargs.get('icon_path'):
-            cmd_parts.extend(['--icon', f'"{kwargs["icon_path"]}"'])
+            cmd_parts.extend(['--icon', os.path.abspath(kwargs['icon_path'])])
             
         if kwargs.get('version_file'):
-            cmd_parts.extend(['--version-file', f'"{kwargs["version_file"]}"'])
+            cmd_parts.extend(['--version-file', os.path.abspath(kwargs['version_file'])])
             
         if kwargs.get('extra_files'):
             for file in kwargs['extra_files']:
-                cmd_parts.extend(['--add-data', f'"{file}:."'])
+                cmd_parts.extend(['--add-data', f'{os.path.abspath(file)}:.'])
+                
+        # 数据归档及其运行时读取模块
+        if kwargs.get('packed_archive'):
+            from utils.data_archive import RUNTIME_DIR, RUNTIME_MODULE
+            cmd_parts.extend(['--add-data', f'{kwargs["packed_archive"]}:.'])
+            cmd_parts.extend(['--paths', RUNTIME_DIR, '--hidden-import', RUNTIME_MODULE])
+                
+        for module in kwargs.get('hidden_imports') or []:
+            cmd_parts.extend(['--hidden-import', module])
+            
+        for module in kwargs.get('exclude_modules') or []:
+            cmd_parts.extend(['--exclude-module', module])
         
-        # 添加主脚本
-        cmd_parts.append(f'"{script_path}"')
+        for hook in kwargs.get('runtime_hooks') or []:
+            cmd_parts.extend(['--runtime-hook', os.path.abspath(hook)])
+            
+        if not kwargs.get('upx', True):
+            cmd_parts.append('--noupx')
+        if kwargs.get('strip'):
+            cmd_parts.append('--strip')
+        if kwargs.get('optimize') is not None:
+            cmd_parts.extend(['--optimize', str(kwargs['optimize'])])
+        
+        # 添加主脚本（spec文件可能不在脚本目录中，统一使用绝对路径）
+        cmd_parts.append(os.path.abspath(script_path))
         
-        return ' '.join(cmd_parts) 
\ No newline at end of file
+        return cmd_parts
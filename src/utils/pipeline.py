@@ -0,0 +1,348 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+import logging
+import os
+import threading
+import time
+
+@dataclass
+class StageTiming:
+    """阶段的耗时记录，start为相对流水线开始的时间（秒）"""
+    name: str
+    start: float
+    duration: float
+    status: str
+
+@dataclass
+class ScanResult:
+    """扫描阶段的结果：补全后的图标、版本信息文件和数据文件"""
+    icon_path: Optional[str]
+    version_file: Optional[str]
+    data_files: List[str]
+
+@dataclass
+class IconResult:
+    """图标阶段的结果"""
+    icon_path: Optional[str]
+    converted: bool = False
+
+@dataclass
+class VersionResult:
+    """版本阶段的结果，output_name直接传给打包，避免再次解析版本信息文件"""
+    version_file: Optional[str]
+    output_name: Optional[str]
+    stamped: bool = False
+
+@dataclass
+class AnalysisResult:
+    """导入分析阶段的结果，report为ImportAnalyzer.analyze()的完整结果（未分析时为None）"""
+    hidden_imports: List[str]
+    exclude_modules: List[str]
+    report: Optional[Dict[str, Any]] = None
+
+@dataclass
+class StagingResult:
+    """数据预置阶段的结果，report为DataStager.stage()的结果（未预置时为None）"""
+    data_files: List[str]
+    report: Optional[Dict[str, Any]] = None
+
+@dataclass
+class BuildResult:
+    """打包阶段的结果，result为PyInstaller.build()的原始结果"""
+    success: bool
+    artifact: Optional[str]
+    cached: bool
+    result: Dict[str, Any]
+
+@dataclass
+class VerifyResult:
+    """产物检查阶段的结果"""
+    ok: bool
+    artifact: Optional[str]
+    size: int
+    message: str
+
+@dataclass
+class PipelineResult:
+    """流水线的运行结果：各阶段的结果和耗时"""
+    results: Dict[str, Any]
+    timings: List[StageTiming]
+    duration: float
+    cancelled: bool = False
+    
+    def format_timings(self) -> str:
+        """生成各阶段耗时的文本，按开始时间排序"""
+        lines = [f"流水线耗时 {self.duration:.2f} 秒:"]
+        for timing in sorted(self.timings, key=lambda t: t.start):
+            lines.append(
+                f"  {timing.name:<10}开始 {timing.start:>6.2f}s  耗时 {timing.duration:>6.2f}s  {timing.status}"
+            )
+        return '\n'.join(lines)
+
+@dataclass
+class _Stage:
+    name: str
+    func: Callable[[Dict[str, Any]], Any]
+    deps: Tuple[str, ...] = field(default_factory=tuple)
+
+class Pipeline:
+    """
+    阶段流水线。
+    各阶段按依赖关系组成有向无环图，依赖全部完成的阶段立即在线程池中运行，互不依赖的阶段并发进行。
+    阶段函数接收依赖阶段的结果（阶段名到结果的映射），返回值作为本阶段的结果传给后续阶段。
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, logger: Optional[logging.Logger] = None):
+        """
+        初始化流水线。
+
+        Args:
+            max_workers: 同时运行的阶段数，默认不限制（等于阶段数）
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self._stages: Dict[str, _Stage] = {}
+        self._cancel_event = threading.Event()
+        
+    def add_stage(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Tuple[str, ...] = ()) -> None:
+        """
+        添加阶段。依赖的阶段必须已经添加，因此不会出现环。
+
+        Args:
+            name: 阶段名称
+            func: 阶段函数，参数为依赖阶段的结果
+            deps: 依赖的阶段名称
+
+        Raises:
+            ValueError: 阶段重名或依赖的阶段不存在
+        """
+        if name in self._stages:
+            raise ValueError(f"阶段重名: {name}")
+        missing = [dep for dep in deps if dep not in self._stages]
+        if missing:
+            raise ValueError(f"阶段 {name} 依赖的阶段不存在: {', '.join(missing)}")
+        self._stages[name] = _Stage(name, func, tuple(deps))
+        
+    def cancel(self) -> None:
+        """取消流水线：正在运行的阶段继续完成，尚未开始的阶段不再运行"""
+        self._cancel_event.set()
+        
+    def run(self) -> PipelineResult:
+        """
+        运行流水线，等待所有阶段完成。
+
+        Returns:
+            PipelineResult: 各阶段的结果和耗时
+
+        Raises:
+            Exception: 任一阶段失败时，等待正在运行的阶段结束后抛出第一个错误，后续阶段不再运行
+        """
+        start_time = time.time()
+        results: Dict[str, Any] = {}
+        timings: List[StageTiming] = []
+        pending = dict(self._stages)
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        
+        def run_stage(stage: _Stage) -> Any:
+            stage_start = time.time()
+            status = 'failed'
+            try:
+                result = stage.func({dep: results[dep] for dep in stage.deps})
+                status = 'done'
+                return result
+            finally:
+                timings.append(StageTiming(stage.name, stage_start - start_time, time.time() - stage_start, status))
+                
+        with ThreadPoolExecutor(max_workers=self.max_workers or max(1, len(self._stages))) as executor:
+            while pending or running:
+                if error is None and not self._cancel_event.is_set():
+                    for name in [name for name, stage in pending.items() if all(dep in results for dep in stage.deps)]:
+                        running[executor.submit(run_stage, pending.pop(name))] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        self.logger.error(f"阶段 {name} 失败: {str(e)}")
+                        error = error or e
+        
+        for name in pending:
+            timings.append(StageTiming(name, time.time() - start_time, 0.0, 'skipped'))
+        if error is not None:
+            raise error
+        return PipelineResult(results, timings, time.time() - start_time, cancelled=bool(pending))
+
+class PackagingPipeline:
+    """
+    打包流水线：扫描、图标转换、版本号、导入分析、数据预置、打包和产物检查。
+    图标、版本号和数据预置依赖扫描结果，导入分析与它们并发进行，全部完成后开始打包；
+    版本信息文件只在版本阶段解析一次，产物名称直接传给打包。
+    """
+    
+    def __init__(self, packager, max_workers: Optional[int] = None, logger: Optional[logging.Logger] = None):
+        """
+        初始化打包流水线。
+
+        Args:
+            packager: 执行打包的PyInstaller对象
+            max_workers: 同时运行的阶段数
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.packager = packager
+        self.max_workers = max_workers
+        self.pipeline: Optional[Pipeline] = None
+        
+    def run(self,
+            params: Dict[str, Any],
+            scan: bool = False,
+            analyze_imports: bool = False,
+            stamp_version: Optional[str] = None,
+            stage_data: bool = False,
+            output_callback: Optional[Callable[[str], None]] = None) -> PipelineResult:
+        """
+        运行打包流水线。
+
+        Args:
+            params: 传给PyInstaller.build()的打包参数
+            scan: 是否扫描项目目录，补全未指定的图标、版本信息文件和数据文件
+            analyze_imports: 是否分析导入关系，生成隐藏导入和排除模块
+            stamp_version: 打包前写入版本信息文件的新版本号，如1.2.3.4
+            stage_data: 是否把额外文件预置到一个目录
+            output_callback: PyInstaller输出的回调
+
+        Returns:
+            PipelineResult: results中scan、icon、version、analyze、stage、build、verify
+            分别对应各阶段的结果对象
+        """
+        pipeline = Pipeline(self.max_workers, self.logger)
+        pipeline.add_stage('scan', lambda inputs: self._scan(params, scan))
+        pipeline.add_stage('icon', lambda inputs: self._convert_icon(inputs['scan']), ('scan',))
+        pipeline.add_stage('version', lambda inputs: self._resolve_version(inputs['scan'], stamp_version), ('scan',))
+        pipeline.add_stage('analyze', lambda inputs: self._analyze(params, analyze_imports))
+        pipeline.add_stage('stage', lambda inputs: self._stage_data(params, inputs['scan'], stage_data), ('scan',))
+        pipeline.add_stage(
+            'build',
+            lambda inputs: self._build(params, inputs, output_callback),
+            ('icon', 'version', 'analyze', 'stage')
+        )
+        pipeline.add_stage('verify', lambda inputs: self._verify(params, inputs['build']), ('build',))
+        self.pipeline = pipeline
+        
+        result = pipeline.run()
+        self.logger.info(result.format_timings())
+        return result
+        
+    def cancel(self) -> None:
+        """取消流水线和正在进行的打包"""
+        if self.pipeline:
+            self.pipeline.cancel()
+        self.packager.cancel()
+        
+    def _scan(self, params: Dict[str, Any], scan: bool) -> ScanResult:
+        """扫描项目目录，只补全未指定的参数"""
+        icon_path = params.get('icon_path') or None
+        version_file = params.get('version_file') or None
+        data_files = list(params.get('extra_files') or [])
+        if scan:
+            from utils.project_scanner import ProjectScanner
+            found = ProjectScanner(self.logger, use_index=True).scan_project(params['script_path'])
+            icon_path = icon_path or found['icon_file']
+            version_file = version_file or found['version_file']
+            # 已合并为数据归档的文件不再作为普通数据文件打包
+            packed = {os.path.abspath(path) for path in params.get('packed_files') or []}
+            data_files += [
+                path for path in sorted(found['data_files'])
+                if path not in data_files and os.path.abspath(path) not in packed
+            ]
+        return ScanResult(icon_path, version_file, data_files)
+        
+    def _convert_icon(self, scan: ScanResult) -> IconResult:
+        """非ICO格式的图标转换为ICO"""
+        if scan.icon_path and not scan.icon_path.endswith('.ico'):
+            from utils.icon_converter import IconConverter
+            return IconResult(IconConverter(self.logger).convert_to_ico(scan.icon_path), converted=True)
+        return IconResult(scan.icon_path)
+        
+    def _resolve_version(self, scan: ScanResult, stamp_version: Optional[str]) -> VersionResult:
+        """写入新版本号（如果指定），并根据版本信息生成产物名称"""
+        if not scan.version_file:
+            return VersionResult(None, None)
+        stamped = False
+        if stamp_version:
+            from utils.version_parser import VersionParser
+            stamp_result = VersionParser(self.logger).stamp_versions([scan.version_file], stamp_version)
+            if stamp_result['failed']:
+                raise RuntimeError(f"更新版本号失败: {stamp_result['failed'][scan.version_file]}")
+            stamped = bool(stamp_result['changed'])
+        return VersionResult(scan.version_file, self.packager.resolve_output_name(scan.version_file), stamped)
+        
+    def _analyze(self, params: Dict[str, Any], analyze_imports: bool) -> AnalysisResult:
+        """分析导入关系，未启用时沿用参数中的隐藏导入和排除模块"""
+        if not analyze_imports:
+            return AnalysisResult(list(params.get('hidden_imports') or []), list(params.get('exclude_modules') or []))
+        from utils.import_analyzer import ImportAnalyzer
+        report = ImportAnalyzer(self.logger).analyze(params['script_path'], params.get('venv_path'))
+        return AnalysisResult(report['hidden_imports'], report['exclude_modules'], report)
+        
+    def _stage_data(self, params: Dict[str, Any], scan: ScanResult, stage_data: bool) -> StagingResult:
+        """把数据文件预置到一个目录"""
+        if not stage_data or not scan.data_files:
+            return StagingResult(scan.data_files)
+        from utils.data_stager import DataStager
+        stager = DataStager(logger=self.logger)
+        report = stager.stage(scan.data_files, str(stager.get_staging_dir(params['script_path'], scan.data_files)))
+        return StagingResult(scan.data_files, report)
+        
+    def _build(self, params: Dict[str, Any], inputs: Dict[str, Any],
+               output_callback: Optional[Callable[[str], None]]) -> BuildResult:
+        """调用PyInstaller打包"""
+        icon: IconResult = inputs['icon']
+        version: VersionResult = inputs['version']
+        analysis: AnalysisResult = inputs['analyze']
+        staging: StagingResult = inputs['stage']
+        build_params = dict(params)
+        build_params.update(
+            icon_path=icon.icon_path,
+            version_file=version.version_file,
+            output_name=version.output_name,
+            hidden_imports=analysis.hidden_imports,
+            exclude_modules=analysis.exclude_modules,
+            extra_files=staging.data_files,
+            staged_data=staging.report,
+            stage_data=False
+        )
+        result = self.packager.build(output_callback=output_callback, **build_params)
+        return BuildResult(bool(result.get('success')), result.get('artifact'), bool(result.get('cached')), result)
+        
+    def _verify(self, params: Dict[str, Any], build: BuildResult) -> VerifyResult:
+        """检查产物是否存在且可执行"""
+        if not build.success:
+            return VerifyResult(False, build.artifact, 0, "打包未成功")
+        if build.result.get('returncode') is None:
+            return VerifyResult(True, None, 0, "打包在独立窗口中进行，未检查产物")
+        artifact = build.artifact
+        if not artifact or not os.path.exists(artifact):
+            return VerifyResult(False, artifact, 0, f"未找到打包产物: {artifact}")
+            
+        executable = artifact
+        if os.path.isdir(artifact):
+            executable = os.path.join(artifact, os.path.basename(artifact))
+            size = sum(
+                os.path.getsize(os.path.join(root, name))
+                for root, _, names in os.walk(artifact) for name in names
+                if not os.path.islink(os.path.join(root, name))
+            )
+        else:
+            size = os.path.getsize(artifact)
+        if os.name != 'nt' and not os.access(executable, os.X_OK):
+            return VerifyResult(False, artifact, size, f"产物不可执行: {executable}")
+        if size == 0:
+            return VerifyResult(False, artifact, size, f"产物为空: {artifact}")
+        return VerifyResult(True, artifact, size, f"产物检查通过: {artifact}（{size / 1024 / 1024:.1f} MB）")
@@ -0,0 +1,265 @@
+from typing import Any, Dict, List, Optional, Tuple
+import itertools
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# 默认的试验组合：单文件/目录、UPX、去除符号表、字节码优化级别
+DEFAULT_GRID = {
+    'onefile': [True, False],
+    'upx': [False, True],
+    'strip': [False, True],
+    'optimize': [0, 2]
+}
+
+# 可选的优化目标，balanced综合考虑体积、冷启动和热启动耗时
+OBJECTIVES = ('balanced', 'size', 'startup', 'cold-startup', 'build-time')
+
+# 打包配置文件保存的选项
+PROFILE_OPTIONS = ('onefile', 'upx', 'strip', 'optimize')
+
+# PyInstaller从6.6起才支持--optimize
+OPTIMIZE_MIN_VERSION = (6, 6)
+
+def _path_size(path: str) -> int:
+    """计算文件或目录的总大小"""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+        if not os.path.islink(os.path.join(root, name))
+    )
+
+def save_profile(profile: Dict[str, Any], profile_path: str) -> None:
+    """
+    保存打包配置。
+
+    Args:
+        profile: ProfileTuner.tune()返回的profile
+        profile_path: 配置文件路径
+    """
+    profile_dir = os.path.dirname(os.path.abspath(profile_path))
+    os.makedirs(profile_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=profile_dir)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        # mkstemp创建的文件只有所有者可读写，配置文件保持普通文件的权限
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, profile_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def load_profile(profile_path: str) -> Dict[str, Any]:
+    """
+    读取打包配置，返回可直接传给PyInstaller.build()的选项。
+
+    Args:
+        profile_path: 配置文件路径
+
+    Returns:
+        Dict[str, Any]: onefile、upx、strip、optimize选项
+    """
+    with open(profile_path, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+    return {key: profile['options'][key] for key in PROFILE_OPTIONS if key in profile['options']}
+
+class ProfileTuner:
+    """
+    打包配置调优器。
+    对同一个打包目标按选项组合逐一试验打包，测量产物体积、打包耗时和冷/热启动耗时，
+    按优化目标选出最佳组合。启动耗时由StartupProfiler测量，被测程序需能自行退出。
+    试验依次进行，避免并发打包互相影响耗时测量。
+    """
+    
+    def __init__(self,
+                 packager=None,
+                 runs: int = 5,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化调优器。
+
+        Args:
+            packager: 执行打包的PyInstaller对象，默认创建一个不使用打包缓存的实例
+            runs: 每个组合的启动次数（第一次为冷启动）
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.packager = packager
+        self.runs = runs
+        
+    def tune(self,
+             params: Dict[str, Any],
+             objective: str = 'balanced',
+             grid: Optional[Dict[str, List[Any]]] = None,
+             run_args: Optional[List[str]] = None,
+             work_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        试验各选项组合并选出最佳配置。
+
+        Args:
+            params: 传给PyInstaller.build()的打包参数，其中的onefile、upx、strip、optimize会被覆盖
+            objective: 优化目标，见OBJECTIVES
+            grid: 各选项的取值，默认为DEFAULT_GRID；未找到UPX时不试验upx=True，
+                PyInstaller早于6.6时不试验optimize
+            run_args: 测量启动耗时时传给程序的参数
+            work_dir: 试验产物的输出目录，默认为临时目录，结束后删除
+
+        Returns:
+            Dict[str, Any]: 包含trials（各组合的测量结果）、best（最佳组合）、
+            profile（可用save_profile保存的配置）和table（对比表格）
+        """
+        if os.name == 'nt':
+            raise RuntimeError("调优需要捕获打包输出并测量启动耗时，仅支持Linux/Mac")
+        if objective not in OBJECTIVES:
+            raise ValueError(f"不支持的优化目标: {objective}，可选: {', '.join(OBJECTIVES)}")
+            
+        from utils.packager import PyInstaller
+        from utils.startup_profiler import StartupProfiler
+        from utils.workpath import WorkpathManager
+        
+        grid = dict(grid or DEFAULT_GRID)
+        if True in grid.get('upx', []) and not shutil.which('upx'):
+            self.logger.info("未找到UPX，跳过UPX压缩的组合")
+            grid['upx'] = [value for value in grid['upx'] if not value] or [False]
+        if 'optimize' in grid:
+            version = self._get_pyinstaller_version(params.get('venv_path'))
+            if version is not None and version < OPTIMIZE_MIN_VERSION:
+                self.logger.info(f"PyInstaller {'.'.join(map(str, version))} 不支持--optimize，跳过字节码优化级别的组合")
+                del grid['optimize']
+        combinations = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+        
+        temp_dir = None
+        if not work_dir:
+            temp_dir = tempfile.mkdtemp(prefix='pyezpacker-tune-')
+            work_dir = temp_dir
+        profiler = StartupProfiler(self.logger)
+        self.logger.info(f"开始调优: {len(combinations)} 个组合，优化目标 {objective}")
+        
+        trials = []
+        try:
+            for index, options in enumerate(combinations):
+                label = self._label(options)
+                self.logger.info(f"[{index + 1}/{len(combinations)}] 试验组合: {label}")
+                # 每个组合使用独立的工作目录，组合之间不会互相清空中间结果，也不影响平时打包的增量结果
+                packager = self.packager or PyInstaller(
+                    self.logger,
+                    workpath_manager=WorkpathManager(os.path.join(work_dir, 'workpaths', label), logger=self.logger)
+                )
+                trials.append(self._run_trial(packager, profiler, params, options, label, run_args, work_dir))
+        finally:
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                
+        succeeded = [trial for trial in trials if trial['success']]
+        if not succeeded:
+            raise RuntimeError("所有组合均打包或启动失败，详情请查看日志")
+        self._score(succeeded, objective)
+        best = min(succeeded, key=lambda trial: trial['score'])
+        profile = {
+            'script_path': os.path.abspath(params['script_path']),
+            'objective': objective,
+            'options': best['options'],
+            'metrics': {key: best[key] for key in ('size', 'build_time', 'cold_startup', 'warm_startup')},
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S')
+        }
+        self.logger.info(f"最佳组合（{objective}）: {best['label']}")
+        return {'trials': trials, 'best': best, 'profile': profile, 'table': self.format_table(trials, best)}
+        
+    def format_table(self, trials: List[Dict[str, Any]], best: Optional[Dict[str, Any]] = None) -> str:
+        """
+        生成各组合的对比表格。
+
+        Args:
+            trials: tune()返回的trials
+            best: 最佳组合，在表格中标出
+
+        Returns:
+            str: 表格文本
+        """
+        lines = [f"  {'组合':<36}{'体积(MB)':>10}{'打包(s)':>10}{'冷启动(ms)':>12}{'热启动(ms)':>12}"]
+        for trial in trials:
+            marker = '*' if trial is best else ' '
+            if not trial['success']:
+                lines.append(f"{marker} {trial['label']:<36}失败: {trial.get('error', '')}")
+                continue
+            lines.append(
+                f"{marker} {trial['label']:<36}{trial['size'] / 1024 / 1024:>10.1f}{trial['build_time']:>10.1f}"
+                f"{trial['cold_startup'] * 1000:>12.0f}{trial['warm_startup'] * 1000:>12.0f}"
+            )
+        return '\n'.join(lines)
+        
+    def _run_trial(self, packager, profiler, params: Dict[str, Any], options: Dict[str, Any], label: str,
+                   run_args: Optional[List[str]], work_dir: str) -> Dict[str, Any]:
+        """打包一个组合并测量体积和启动耗时，失败时记录错误而不中断调优"""
+        trial = {'label': label, 'options': options, 'success': False}
+        build_params = dict(params)
+        build_params.update(options)
+        build_params['output_dir'] = os.path.join(work_dir, label)
+        # 启动耗时分析钩子只在设置环境变量时生效，对体积的影响可以忽略
+        build_params['runtime_hooks'] = list(params.get('runtime_hooks') or []) + [profiler.get_hook_path()]
+        try:
+            start_time = time.time()
+            result = packager.build(**build_params)
+            trial['build_time'] = time.time() - start_time
+            if not result.get('success'):
+                trial['error'] = f"打包失败，返回码 {result.get('returncode')}"
+                return trial
+            trial['size'] = _path_size(result['artifact'])
+            report = profiler.profile_build(result, runs=self.runs, args=run_args)
+            trial['cold_startup'] = report['cold']['wall']
+            trial['warm_startup'] = report['warm']['wall']
+            trial['success'] = True
+        except Exception as e:
+            self.logger.warning(f"组合 {label} 试验失败: {str(e)}")
+            trial['error'] = str(e)
+        return trial
+        
+    def _score(self, trials: List[Dict[str, Any]], objective: str) -> None:
+        """按优化目标为各组合打分，分数越低越好"""
+        metrics = {
+            'size': ['size'],
+            'startup': ['warm_startup'],
+            'cold-startup': ['cold_startup'],
+            'build-time': ['build_time'],
+            # 各项相对最优值的倍数之和
+            'balanced': ['size', 'cold_startup', 'warm_startup']
+        }[objective]
+        best = {key: min(trial[key] for trial in trials) or 1e-9 for key in metrics}
+        for trial in trials:
+            trial['score'] = sum(trial[key] / best[key] for key in metrics)
+            
+    def _get_pyinstaller_version(self, venv_path: Optional[str]) -> Optional[Tuple[int, int]]:
+        """获取打包所用解释器中PyInstaller的主、次版本号，无法获取时返回None"""
+        if venv_path:
+            from utils.python_env import get_venv_python
+            python = get_venv_python(venv_path)
+        else:
+            python = sys.executable
+        try:
+            completed = subprocess.run(
+                [python, '-c', 'import PyInstaller; print(PyInstaller.__version__)'],
+                capture_output=True, text=True, check=True, timeout=60
+            )
+        except (OSError, subprocess.SubprocessError):
+            return None
+        match = re.match(r'(\d+)\.(\d+)', completed.stdout.strip())
+        return (int(match.group(1)), int(match.group(2))) if match else None
+        
+    def _label(self, options: Dict[str, Any]) -> str:
+        """组合的简短名称，同时用作试验产物的目录名"""
+        parts = ['onefile' if options.get('onefile', True) else 'onedir']
+        parts.append('upx' if options.get('upx', True) else 'noupx')
+        if options.get('strip'):
+            parts.append('strip')
+        if options.get('optimize') is not None:
+            parts.append(f"O{options['optimize']}")
+        return '-'.join(parts)
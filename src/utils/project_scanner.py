@@ -1,30 +1,164 @@
-from typing import List, Optional, Set
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import os
+import re
 import logging
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from utils.scan_index import ScanIndex
+
+# 递归扫描时默认跳过的目录
+DEFAULT_EXCLUDES = {'venv', '.venv', '.git', '__pycache__', 'build', 'dist'}
+
+# 数据文件扩展名
+DATA_EXTENSIONS = ('.json', '.yaml', '.yml', '.xml', '.csv', '.txt')
+
+# 图标文件扩展名
+ICON_EXTENSIONS = ('.ico', '.png', '.jpg', '.jpeg')
+
+def classify_file(file_name: str) -> Optional[str]:
+    """
+    根据文件名识别文件类别。
+
+    Args:
+        file_name: 文件名（不含目录）
+
+    Returns:
+        Optional[str]: 扫描结果中对应的键名，无关文件返回None
+    """
+    file_name = file_name.lower()  # 转换为小写以进行大小写不敏感的匹配
+    
+    # 优先识别versionmark.txt作为版本信息文件，不将其作为数据文件
+    if file_name == 'versionmark.txt':
+        return 'version_file'
+    # 识别Python文件
+    if file_name.endswith('.py'):
+        return 'python_files'
+    # 识别requirements.txt
+    if file_name == 'requirements.txt':
+        return 'requirements'
+    # 识别图标文件
+    if file_name.endswith(ICON_EXTENSIONS):
+        return 'icon_file'
+    # 识别其他可能需要打包的文件
+    if file_name.endswith(DATA_EXTENSIONS):
+        return 'data_files'
+    return None
+
+def _compile_gitignore_pattern(line: str) -> Optional[Tuple['re.Pattern', bool, bool]]:
+    """
+    将一行.gitignore规则编译为正则表达式。
+
+    Args:
+        line: .gitignore中的一行
+
+    Returns:
+        Optional[Tuple]: (正则, 是否为取反规则, 是否只匹配目录)，空行和注释返回None
+    """
+    line = line.rstrip('\n').rstrip()
+    if not line or line.startswith('#'):
+        return None
+        
+    negate = line.startswith('!')
+    if negate or line.startswith('\\'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+        
+    # 含有斜杠的规则相对于.gitignore所在目录，否则匹配任意层级的文件名
+    anchored = '/' in line
+    line = line.lstrip('/')
+    
+    regex = ''
+    i = 0
+    while i < len(line):
+        if line.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif line.startswith('/**', i) and i + 3 == len(line):
+            regex += '/.*'
+            i += 3
+        elif line[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif line[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif line[i] == '[':
+            end = line.find(']', i + 1)
+            if end == -1:
+                regex += re.escape(line[i])
+                i += 1
+            else:
+                regex += '[' + line[i + 1:end].replace('!', '^', 1) + ']'
+                i = end + 1
+        else:
+            regex += re.escape(line[i])
+            i += 1
+            
+    prefix = '^' if anchored else '^(?:.*/)?'
+    return re.compile(prefix + regex + '$'), negate, dir_only
+
+class _IgnoreRules:
+    """
+    一个目录生效的忽略规则：该目录及其所有上级目录中.gitignore规则的合集。
+    规则按出现顺序匹配，最后一条命中的规则决定结果，与git的行为一致。
+    """
+    
+    def __init__(self, rules: Optional[List[Tuple[str, 're.Pattern', bool, bool]]] = None):
+        self.rules = rules or []
+        
+    def extend(self, base_dir: str, lines: List[str]) -> '_IgnoreRules':
+        """返回追加了目录中.gitignore规则的新规则集"""
+        rules = list(self.rules)
+        for line in lines:
+            compiled = _compile_gitignore_pattern(line)
+            if compiled:
+                rules.append((base_dir, *compiled))
+        return _IgnoreRules(rules)
+        
+    def is_ignored(self, path: str, is_dir: bool) -> bool:
+        """判断路径是否被忽略"""
+        ignored = False
+        for base_dir, pattern, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            rel_path = os.path.relpath(path, base_dir).replace(os.sep, '/')
+            if pattern.match(rel_path):
+                ignored = not negate
+        return ignored
+
 class ProjectScanner:
     """
     项目文件扫描器。
     用于自动识别项目中的相关文件。
     """
     
-    def __init__(self, logger: Optional[logging.Logger] = None):
+    def __init__(self, logger: Optional[logging.Logger] = None, use_index: bool = False):
         """
         初始化项目扫描器。
 
         Args:
             logger: 可选的logger对象，用于日志记录
+            use_index: 是否使用持久化扫描索引，只重新读取修改过的目录
         """
         self.logger = logger or logging.getLogger(__name__)
+        self.use_index = use_index
+        
+        # 最近一次使用索引扫描时，相对上一次扫描的变化
+        self.last_changes: Optional[Dict[str, List[str]]] = None
         
-    def scan_project(self, main_script_path: str) -> dict:
+    def scan_project(self, main_script_path: str, recursive: bool = False) -> dict:
         """
         扫描主脚本所在目录，识别相关文件。
-        只扫描当前目录，不进入子目录。
+        默认只扫描当前目录，不进入子目录；recursive为True时并行递归扫描整个目录树。
 
         Args:
             main_script_path: 主脚本路径
+            recursive: 是否递归扫描子目录
 
         Returns:
             dict: 包含识别到的文件信息的字典
@@ -46,45 +180,196 @@ class ProjectScanner:
             venv_path = project_dir / 'venv'
             if venv_path.exists() and venv_path.is_dir():
                 result['venv_dir'] = str(venv_path)
-            
-            # 扫描当前目录中的文件
-            for item in project_dir.iterdir():
-                if not item.is_file():  # 跳过目录
-                    continue
-                    
-                file_path = str(item)
-                file_name = item.name.lower()  # 转换为小写以进行大小写不敏感的匹配
                 
-                # 优先识别versionmark.txt作为版本信息文件
-                if file_name == 'versionmark.txt':
-                    result['version_file'] = file_path
-                    continue  # 跳过后续检查，不将其添加到data_files中
+            if recursive:
+                entries = self.iter_project(main_script_path)
+            else:
+                # 扫描当前目录中的文件
+                index = self._open_index(project_dir)
+                record = self._read_dir(os.path.abspath(project_dir), index)
+                if index:
+                    index.end_scan(complete=False)
+                    self.last_changes = index.changes()
+                entries = [
+                    (category, os.path.join(project_dir, name))
+                    for name, category in (record['files'] if record else [])
+                ]
+                
+            # 单值类别（版本信息、依赖、图标）优先使用层级最浅的文件
+            singles = {}
+            for category, file_path in entries:
+                if category in ('python_files', 'data_files'):
+                    result[category].add(file_path)
+                else:
+                    rank = (file_path.count(os.sep), file_path)
+                    if category not in singles or rank < singles[category]:
+                        singles[category] = rank
+            for category, (_, file_path) in singles.items():
+                result[category] = file_path
                 
-                # 识别Python文件
-                if file_name.endswith('.py'):
-                    result['python_files'].add(file_path)
-                    
-                # 识别requirements.txt
-                elif file_name == 'requirements.txt':
-                    result['requirements'] = file_path
-                    
-                # 识别图标文件
-                elif file_name.endswith(('.ico', '.png', '.jpg', '.jpeg')):
-                    if not result['icon_file']:  # 只使用找到的第一个图标文件
-                        result['icon_file'] = file_path
-                    
-                # 识别其他可能需要打包的文件
-                # 排除已识别的特殊文件
-                elif (file_name.endswith(('.json', '.yaml', '.yml', '.xml', '.csv', '.txt')) 
-                      and file_name not in ['requirements.txt', 'versionmark.txt']):
-                    result['data_files'].add(file_path)
-            
             self.logger.info(f"目录扫描完成，找到 {len(result['python_files'])} 个Python文件")
             if result['version_file']:
                 self.logger.info(f"找到版本信息文件: {result['version_file']}")
-            
+                
         except Exception as e:
             self.logger.error(f"扫描目录时出错: {str(e)}")
             raise
             
-        return result 
\ No newline at end of file
+        return result
+        
+    def iter_project(self,
+                     main_script_path: str,
+                     excludes: Optional[Set[str]] = None,
+                     max_workers: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+        """
+        并行递归扫描主脚本所在的目录树，边扫描边产出识别到的文件。
+
+        每个目录由线程池中的一个任务通过os.scandir读取，目录项类型直接取自
+        scandir的结果，不再对每个文件单独stat。遵循各级目录中的.gitignore，
+        并跳过内置排除目录；不跟随目录符号链接。
+
+        Args:
+            main_script_path: 主脚本路径
+            excludes: 需要跳过的目录名，默认为DEFAULT_EXCLUDES
+            max_workers: 扫描线程数
+
+        Yields:
+            Tuple[str, str]: (类别, 文件路径)，类别与scan_project结果中的键名一致
+        """
+        project_dir = os.path.dirname(os.path.abspath(main_script_path))
+        excludes = DEFAULT_EXCLUDES if excludes is None else excludes
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        index = self._open_index(project_dir)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(self._scan_dir, project_dir, _IgnoreRules(), excludes, index)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    for subdir, rules in subdirs:
+                        pending.add(executor.submit(self._scan_dir, subdir, rules, excludes, index))
+                    yield from files
+                    
+        # 只有完整遍历后才更新索引
+        if index:
+            index.end_scan(complete=True)
+            self.last_changes = index.changes()
+            
+    def scan_changes(self, main_script_path: str, recursive: bool = True) -> Dict[str, List[str]]:
+        """
+        使用扫描索引增量扫描项目，返回相对上一次扫描的变化。
+
+        Args:
+            main_script_path: 主脚本路径
+            recursive: 是否递归扫描子目录
+
+        Returns:
+            Dict[str, List[str]]: added、removed、changed_dirs，见ScanIndex.changes()
+        """
+        use_index, self.use_index = self.use_index, True
+        try:
+            self.scan_project(main_script_path, recursive=recursive)
+        finally:
+            self.use_index = use_index
+        return self.last_changes
+        
+    def _open_index(self, project_dir: str) -> Optional['ScanIndex']:
+        """启用索引时加载项目的扫描索引并开始一次扫描"""
+        if not self.use_index:
+            return None
+        from utils.scan_index import ScanIndex
+        index = ScanIndex(str(project_dir), logger=self.logger)
+        index.begin_scan()
+        return index
+        
+    def _scan_dir(self,
+                  directory: str,
+                  rules: _IgnoreRules,
+                  excludes: Set[str],
+                  index: Optional['ScanIndex'] = None) -> Tuple[List[Tuple[str, str]], List[Tuple[str, _IgnoreRules]]]:
+        """
+        扫描单个目录，应用忽略规则。
+
+        Returns:
+            Tuple: (识别到的文件列表, 需要继续扫描的子目录及其忽略规则)
+        """
+        record = self._read_dir(directory, index)
+        if record is None:
+            return [], []
+            
+        if record['gitignore']:
+            rules = rules.extend(directory, record['gitignore'])
+            
+        files = []
+        for name, category in record['files']:
+            file_path = os.path.join(directory, name)
+            if not rules.is_ignored(file_path, False):
+                files.append((category, file_path))
+                
+        subdirs = []
+        for name in record['dirs']:
+            subdir = os.path.join(directory, name)
+            if name not in excludes and not rules.is_ignored(subdir, True):
+                subdirs.append((subdir, rules))
+                
+        return files, subdirs
+        
+    def _read_dir(self, directory: str, index: Optional['ScanIndex'] = None) -> Optional[Dict[str, Any]]:
+        """
+        读取目录内容：已分类的文件、子目录和.gitignore规则。
+        使用索引且目录未被修改时直接复用索引中的记录。
+
+        Returns:
+            Optional[Dict[str, Any]]: 目录记录，目录无法读取时返回None
+        """
+        gitignore_path = os.path.join(directory, '.gitignore')
+        mtime_ns = gitignore_mtime_ns = None
+        if index:
+            # 先取修改时间再读取目录，读取期间发生的修改会在下次扫描时被发现
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError as e:
+                self.logger.warning(f"无法读取目录 {directory}: {str(e)}")
+                return None
+            try:
+                gitignore_mtime_ns = os.stat(gitignore_path).st_mtime_ns
+            except OSError:
+                gitignore_mtime_ns = None
+            record = index.lookup(directory, mtime_ns, gitignore_mtime_ns)
+            if record:
+                return record
+                
+        try:
+            entries = list(os.scandir(directory))
+        except OSError as e:
+            self.logger.warning(f"无法读取目录 {directory}: {str(e)}")
+            return None
+            
+        files = []
+        dirs = []
+        gitignore = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.name)
+            elif entry.is_file():
+                if entry.name == '.gitignore':
+                    try:
+                        with open(entry.path, 'r', encoding='utf-8', errors='replace') as f:
+                            gitignore = f.read().splitlines()
+                    except OSError:
+                        pass
+                category = classify_file(entry.name)
+                if category:
+                    files.append([entry.name, category])
+                    
+        record = {
+            'mtime_ns': mtime_ns,
+            'gitignore_mtime_ns': gitignore_mtime_ns,
+            'files': sorted(files),
+            'dirs': sorted(dirs),
+            'gitignore': gitignore
+        }
+        if index:
+            index.update(directory, record)
+        return record
@@ -0,0 +1,68 @@
+from typing import Dict, List, Optional
+import glob
+import logging
+import os
+import subprocess
+import sysconfig
+
+logger = logging.getLogger(__name__)
+
+# 已查询过的解释器标准库目录
+_stdlib_dirs: Dict[str, str] = {}
+
+def get_venv_python(venv_path: str) -> str:
+    """获取虚拟环境中的Python解释器路径"""
+    if os.name == 'nt':
+        return os.path.join(venv_path, 'Scripts', 'python.exe')
+    return os.path.join(venv_path, 'bin', 'python')
+
+def get_site_dirs(venv_path: Optional[str] = None) -> List[str]:
+    """
+    获取虚拟环境（或当前解释器）的site-packages目录。
+
+    Args:
+        venv_path: 虚拟环境路径，未指定时使用当前解释器
+
+    Returns:
+        List[str]: 存在的site-packages目录（已解析符号链接并去重）
+    """
+    if venv_path:
+        patterns = [
+            os.path.join(venv_path, 'lib', 'python*', 'site-packages'),
+            os.path.join(venv_path, 'Lib', 'site-packages')
+        ]
+        site_dirs = [path for pattern in patterns for path in sorted(glob.glob(pattern))]
+    else:
+        paths = sysconfig.get_paths()
+        site_dirs = [paths['purelib'], paths['platlib']]
+    return list(dict.fromkeys(os.path.realpath(path) for path in site_dirs if os.path.isdir(path)))
+
+def get_stdlib_dir(venv_path: Optional[str] = None) -> str:
+    """
+    获取虚拟环境（或当前解释器）的标准库目录。
+
+    虚拟环境可能基于与当前解释器不同的Python，因此向其中的解释器查询；
+    查询失败时退回当前解释器的标准库目录。同一解释器只查询一次。
+
+    Args:
+        venv_path: 虚拟环境路径，未指定时使用当前解释器
+
+    Returns:
+        str: 已解析符号链接的标准库目录
+    """
+    host_stdlib = os.path.realpath(sysconfig.get_paths()['stdlib'])
+    if not venv_path:
+        return host_stdlib
+        
+    python = get_venv_python(venv_path)
+    if python not in _stdlib_dirs:
+        try:
+            completed = subprocess.run(
+                [python, '-c', "import sysconfig; print(sysconfig.get_paths()['stdlib'])"],
+                capture_output=True, text=True, check=True, timeout=30
+            )
+            _stdlib_dirs[python] = os.path.realpath(completed.stdout.strip())
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"无法获取虚拟环境的标准库目录，使用当前解释器的标准库目录: {e}")
+            return host_stdlib
+    return _stdlib_dirs[python]
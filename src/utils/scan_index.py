@@ -0,0 +1,174 @@
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from utils.cache_utils import get_cache_dir
+
+# 索引格式版本，格式变化时旧索引自动失效
+_INDEX_VERSION = 1
+
+# 修改时间距扫描开始不足该值（纳秒）的目录不可信：同一时间戳内可能还有后续修改
+_RACY_WINDOW_NS = 2 * 10 ** 9
+
+class ScanIndex:
+    """
+    项目扫描结果的持久化索引。
+    记录每个目录的修改时间及其中已分类的文件和子目录；再次扫描时只有修改时间
+    变化的目录才需要重新读取，其余目录直接复用索引中的结果。
+    每次扫描还会记录相对上次扫描新增和删除的文件，供打包缓存、监视等功能使用。
+    """
+    
+    def __init__(self, project_dir: str, index_path: Optional[str] = None, logger: Optional[logging.Logger] = None):
+        """
+        初始化扫描索引，存在旧索引时自动加载。
+
+        Args:
+            project_dir: 项目目录
+            index_path: 索引文件路径，默认按项目目录存放在用户缓存目录下
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.project_dir = os.path.abspath(project_dir)
+        if index_path:
+            self.index_path = Path(index_path)
+        else:
+            name = hashlib.sha256(self.project_dir.encode('utf-8')).hexdigest()[:16]
+            self.index_path = get_cache_dir('scan-index') / f'{name}.json'
+            
+        self._lock = threading.Lock()
+        self._dirs: Dict[str, Dict[str, Any]] = self._load()
+        self._visited: Set[str] = set()
+        self._added: Set[str] = set()
+        self._removed: Set[str] = set()
+        self._changed_dirs: Set[str] = set()
+        self._scan_start_ns = 0
+        self.stats = {'reused': 0, 'rescanned': 0}
+        
+    def begin_scan(self) -> None:
+        """开始一次扫描，清空上次扫描的变化记录"""
+        with self._lock:
+            self._visited.clear()
+            self._added.clear()
+            self._removed.clear()
+            self._changed_dirs.clear()
+            self.stats = {'reused': 0, 'rescanned': 0}
+            self._scan_start_ns = time.time_ns()
+            
+    def lookup(self, directory: str, mtime_ns: int, gitignore_mtime_ns: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        查找目录的索引记录，目录或其.gitignore在上次扫描后被修改时返回None。
+
+        Args:
+            directory: 目录路径
+            mtime_ns: 目录当前的修改时间
+            gitignore_mtime_ns: 目录中.gitignore当前的修改时间，不存在时为None
+
+        Returns:
+            Optional[Dict[str, Any]]: 目录记录，包含files（[文件名, 类别]列表）、
+            dirs（子目录名列表）和gitignore（规则行列表）
+        """
+        with self._lock:
+            self._visited.add(directory)
+            record = self._dirs.get(directory)
+            if (record is None
+                    or record.get('racy')
+                    or record['mtime_ns'] != mtime_ns
+                    or record.get('gitignore_mtime_ns') != gitignore_mtime_ns):
+                return None
+            self.stats['reused'] += 1
+            return record
+            
+    def update(self, directory: str, record: Dict[str, Any]) -> None:
+        """
+        写入重新扫描得到的目录记录，并与旧记录比较得出新增和删除的文件。
+
+        Args:
+            directory: 目录路径
+            record: 目录记录，需包含mtime_ns、gitignore_mtime_ns、files、dirs、gitignore
+        """
+        record['racy'] = record['mtime_ns'] >= self._scan_start_ns - _RACY_WINDOW_NS
+        with self._lock:
+            self._visited.add(directory)
+            self.stats['rescanned'] += 1
+            old = self._dirs.get(directory)
+            old_files = {name for name, _ in old['files']} if old else set()
+            new_files = {name for name, _ in record['files']}
+            if old is None or old_files != new_files or old['dirs'] != record['dirs']:
+                self._changed_dirs.add(directory)
+            self._added.update(os.path.join(directory, name) for name in new_files - old_files)
+            self._removed.update(os.path.join(directory, name) for name in old_files - new_files)
+            self._dirs[directory] = record
+            
+    def end_scan(self, complete: bool = True) -> None:
+        """
+        结束扫描并保存索引。
+
+        Args:
+            complete: 是否遍历了整个目录树；只有完整遍历时才清理已不存在的目录
+        """
+        with self._lock:
+            pruned = False
+            if complete:
+                for directory in [d for d in self._dirs if d not in self._visited]:
+                    record = self._dirs.pop(directory)
+                    self._changed_dirs.add(directory)
+                    self._removed.update(os.path.join(directory, name) for name, _ in record['files'])
+                    pruned = True
+            # 所有目录都复用了索引时无需重写索引文件
+            if pruned or self.stats['rescanned']:
+                self._save()
+            
+        self.logger.info(
+            f"扫描索引: 复用 {self.stats['reused']} 个目录，重新读取 {self.stats['rescanned']} 个目录"
+        )
+        
+    def changes(self) -> Dict[str, List[str]]:
+        """
+        获取最近一次扫描相对上一次扫描的变化。
+        目录索引只能发现文件的新增、删除和重命名，文件内容的修改不会改变目录的修改时间。
+
+        Returns:
+            Dict[str, List[str]]: added（新增文件）、removed（删除文件）、changed_dirs（内容变化的目录）
+        """
+        with self._lock:
+            return {
+                'added': sorted(self._added),
+                'removed': sorted(self._removed),
+                'changed_dirs': sorted(self._changed_dirs)
+            }
+            
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """读取索引文件，不存在、损坏或属于其他目录时返回空索引"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"扫描索引无法读取，将重新扫描: {str(e)}")
+            return {}
+            
+        if data.get('version') != _INDEX_VERSION or data.get('root') != self.project_dir:
+            return {}
+        return data.get('dirs', {})
+        
+    def _save(self) -> None:
+        """原子地写入索引文件（调用方需持有锁）"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        # 一次性序列化后写入，比json.dump逐块写文件快得多
+        content = json.dumps({'version': _INDEX_VERSION, 'root': self.project_dir, 'dirs': self._dirs}, ensure_ascii=False)
+        # 临时文件名唯一，同一项目的多个扫描进程同时保存时互不干扰
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.index_path.parent)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, self.index_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
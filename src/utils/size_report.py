@@ -0,0 +1,310 @@
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import ast
+import glob
+import logging
+import os
+
+from utils.python_env import get_site_dirs, get_stdlib_dir
+
+# 单个包占产物总体积超过该比例时提示检查
+LARGE_PACKAGE_RATIO = 0.05
+
+# 常见的测试/示例子包，打包后运行时通常用不到
+_PRUNABLE_SUBPACKAGES = ('tests', 'test', 'testing', 'examples', 'benchmarks', 'docs')
+
+def _file_size(path: str) -> int:
+    """获取文件大小，文件不存在时返回0"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+def _tree_size(path: str) -> int:
+    """递归计算目录（或单个文件）的总大小"""
+    if os.path.isfile(path):
+        return _file_size(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if not os.path.islink(file_path):
+                total += _file_size(file_path)
+    return total
+
+class SizeReporter:
+    """
+    打包产物体积分析器。
+    读取PyInstaller工作目录中的TOC文件，把产物中的每个模块、扩展和数据文件
+    归属到所在的顶层包，按体积排序并给出可排除模块的建议。
+    """
+    
+    def __init__(self, logger: Optional[logging.Logger] = None, max_workers: Optional[int] = None):
+        """
+        初始化体积分析器。
+
+        Args:
+            logger: 可选的logger对象，用于日志记录
+            max_workers: 统计文件大小的线程数
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        self._dist_top_level: Dict[str, Dict[str, str]] = {}
+        
+    def report_for_build(self,
+                         build_result: Dict[str, Any],
+                         venv_path: Optional[str] = None,
+                         analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        根据PyInstaller.build()的结果生成体积报告。
+
+        Args:
+            build_result: build()返回的结果，需包含toc_dir和artifact
+            venv_path: 打包使用的虚拟环境
+            analysis: 可选的ImportAnalyzer分析结果，用于判断哪些包从未被导入
+
+        Returns:
+            Dict[str, Any]: 见report()
+        """
+        return self.report(build_result['toc_dir'], build_result.get('artifact'), venv_path, analysis)
+        
+    def report(self,
+               toc_dir: str,
+               artifact_path: Optional[str] = None,
+               venv_path: Optional[str] = None,
+               analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        生成体积报告。
+
+        Args:
+            toc_dir: PyInstaller为该目标生成TOC文件的目录（workpath/<name>）
+            artifact_path: 打包产物路径，用于统计实际体积
+            venv_path: 打包使用的虚拟环境，未指定时使用当前解释器
+            analysis: 可选的ImportAnalyzer分析结果
+
+        Returns:
+            Dict[str, Any]: artifact_size（产物实际大小）、bundled_size（归属到各包的原始大小之和）、
+            packages（按体积降序的包列表）、suggestions（优化建议）
+        """
+        entries = self._read_toc_entries(toc_dir)
+        site_dirs = get_site_dirs(venv_path)
+        stdlib_dir = get_stdlib_dir(venv_path)
+        project_dir = self._guess_project_dir(entries)
+        toc_dir = os.path.realpath(toc_dir)
+        
+        # 并行统计产物中每个文件的原始大小
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            sizes = list(executor.map(_file_size, [source for _, source, _ in entries]))
+            
+        packages: Dict[str, Dict[str, Any]] = {}
+        for (name, source, typecode), size in zip(entries, sizes):
+            package, category = self._attribute(name, source, typecode, site_dirs, stdlib_dir, project_dir, toc_dir)
+            info = packages.setdefault(package, {
+                'name': package,
+                'category': category,
+                'size': 0,
+                'files': 0,
+                'largest': []
+            })
+            info['size'] += size
+            info['files'] += 1
+            info['largest'].append((size, name))
+            
+        # 并行统计第三方包在site-packages中的安装大小，与打包进产物的部分对比
+        third_party = [info for info in packages.values() if info['category'] == 'third-party']
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            installed = list(executor.map(lambda info: self._installed_size(info['name'], site_dirs), third_party))
+        for info, size in zip(third_party, installed):
+            info['installed_size'] = size
+            
+        ranked = sorted(packages.values(), key=lambda info: info['size'], reverse=True)
+        for info in ranked:
+            info['largest'] = [
+                {'name': name, 'size': size}
+                for size, name in sorted(info['largest'], reverse=True)[:5]
+            ]
+            
+        bundled_size = sum(info['size'] for info in ranked)
+        report = {
+            'artifact': artifact_path,
+            'artifact_size': _tree_size(artifact_path) if artifact_path and os.path.exists(artifact_path) else None,
+            'bundled_size': bundled_size,
+            'packages': ranked,
+            'suggestions': self._suggest(ranked, entries, sizes, bundled_size, analysis)
+        }
+        self.logger.info(f"体积分析完成: {len(ranked)} 个包，原始大小 {bundled_size / 1024 / 1024:.1f} MB")
+        return report
+        
+    def format_report(self, report: Dict[str, Any], top: int = 15) -> str:
+        """
+        生成可读的体积报告文本。
+
+        Args:
+            report: report()的返回值
+            top: 显示体积最大的前几个包
+
+        Returns:
+            str: 报告文本
+        """
+        mb = 1024 * 1024
+        lines = []
+        if report['artifact_size'] is not None:
+            lines.append(f"产物大小: {report['artifact_size'] / mb:.1f} MB ({report['artifact']})")
+        lines.append(f"打包内容原始大小: {report['bundled_size'] / mb:.1f} MB")
+        lines.append(f"{'包':<32}{'类别':<14}{'大小(MB)':>10}{'占比':>8}{'文件数':>8}")
+        for info in report['packages'][:top]:
+            ratio = info['size'] / report['bundled_size'] if report['bundled_size'] else 0
+            lines.append(
+                f"{info['name']:<32}{info['category']:<14}{info['size'] / mb:>10.2f}{ratio:>8.1%}{info['files']:>8}"
+            )
+        if report['suggestions']:
+            lines.append("优化建议:")
+            for suggestion in report['suggestions']:
+                lines.append(f"  - {suggestion['message']}")
+        return '\n'.join(lines)
+        
+    def _read_toc_entries(self, toc_dir: str) -> List[Tuple[str, str, str]]:
+        """
+        读取目录中所有TOC文件的条目并按目标名去重。
+        TOC文件是Python字面量，其中的(名称, 源路径, 类型)三元组列表即打包内容。
+        """
+        toc_files = sorted(glob.glob(os.path.join(toc_dir, '*.toc')))
+        if not toc_files:
+            raise FileNotFoundError(f"未找到PyInstaller的TOC文件: {toc_dir}")
+            
+        entries = {}
+        for toc_file in toc_files:
+            with open(toc_file, 'r', encoding='utf-8') as f:
+                data = ast.literal_eval(f.read())
+            for toc in self._iter_tocs(data):
+                for name, source, typecode in toc:
+                    # PYZ/PKG等归档本身和运行选项不计入，只统计实际内容
+                    if typecode in ('OPTION', 'PYZ', 'PKG', 'DEPENDENCY') or not source:
+                        continue
+                    entries.setdefault((name, typecode), (name, source, typecode))
+        return list(entries.values())
+        
+    def _iter_tocs(self, data: Any):
+        """在TOC文件的数据结构中查找三元组列表"""
+        if isinstance(data, list) and data and all(
+                isinstance(item, tuple) and len(item) == 3 and all(isinstance(x, str) for x in item)
+                for item in data):
+            yield data
+        elif isinstance(data, (list, tuple)):
+            for item in data:
+                if isinstance(item, (list, tuple)):
+                    yield from self._iter_tocs(item)
+    
+    def _attribute(self, name: str, source: str, typecode: str, site_dirs: List[str],
+                   stdlib_dir: str, project_dir: Optional[str], toc_dir: str) -> Tuple[str, str]:
+        """
+        确定一个条目所属的包和类别。
+
+        Returns:
+            Tuple[str, str]: (包名, 类别)，类别为third-party、stdlib、project、runtime或system
+        """
+        real_source = os.path.realpath(source)
+        # PyInstaller在工作目录中生成的文件：base_library.zip是精简的标准库，其余是引导代码
+        if real_source.startswith(toc_dir + os.sep):
+            if os.path.basename(real_source) == 'base_library.zip':
+                return 'python-runtime', 'runtime'
+            return 'pyinstaller-bootloader', 'runtime'
+            
+        for site_dir in site_dirs:
+            if real_source.startswith(site_dir + os.sep):
+                top = os.path.relpath(real_source, site_dir).split(os.sep)[0]
+                if top == 'PyInstaller':
+                    return 'pyinstaller-bootloader', 'runtime'
+                # 单文件模块、扩展模块归属到同名的包，pillow.libs等目录归属到所属分发包的顶层包
+                if top.endswith('.libs'):
+                    return self._get_dist_top_level(site_dir).get(top[:-5].lower(), top[:-5]), 'third-party'
+                return top.split('.')[0], 'third-party'
+                
+        if typecode in ('PYMODULE', 'EXTENSION') and real_source.startswith(stdlib_dir + os.sep):
+            return os.path.basename(name).split('.')[0], 'stdlib'
+        if project_dir and real_source.startswith(project_dir + os.sep):
+            return 'project', 'project'
+        if os.path.basename(real_source).startswith('libpython') or real_source.startswith(stdlib_dir + os.sep):
+            return 'python-runtime', 'runtime'
+        if 'PyInstaller' in real_source.split(os.sep):
+            return 'pyinstaller-bootloader', 'runtime'
+        return 'system-libraries', 'system'
+        
+    def _get_dist_top_level(self, site_dir: str) -> Dict[str, str]:
+        """读取site-packages中各分发包的顶层包名（分发包名小写 -> 顶层包名），结果按目录缓存"""
+        if site_dir not in self._dist_top_level:
+            mapping = {}
+            for dist_info in glob.glob(os.path.join(site_dir, '*.dist-info')):
+                dist_name = os.path.basename(dist_info).split('-')[0].lower()
+                try:
+                    with open(os.path.join(dist_info, 'top_level.txt'), 'r', encoding='utf-8') as f:
+                        top_level = f.read().split()
+                except OSError:
+                    continue
+                if top_level:
+                    mapping[dist_name] = top_level[0]
+            self._dist_top_level[site_dir] = mapping
+        return self._dist_top_level[site_dir]
+        
+    def _guess_project_dir(self, entries: List[Tuple[str, str, str]]) -> Optional[str]:
+        """以主脚本（PYSOURCE中非PyInstaller自带的条目）所在目录作为项目目录"""
+        for name, source, typecode in entries:
+            if typecode == 'PYSOURCE' and 'PyInstaller' not in source.split(os.sep):
+                return os.path.dirname(os.path.realpath(source))
+        return None
+        
+    def _installed_size(self, package: str, site_dirs: List[str]) -> int:
+        """统计包在site-packages中的安装大小（包目录、同名模块和.libs目录）"""
+        total = 0
+        for site_dir in site_dirs:
+            for path in glob.glob(os.path.join(site_dir, package)) + glob.glob(os.path.join(site_dir, package + '.*')):
+                if not path.endswith(('.dist-info', '.egg-info', '.pth')):
+                    total += _tree_size(path)
+        return total
+        
+    def _suggest(self, ranked: List[Dict[str, Any]], entries: List[Tuple[str, str, str]], sizes: List[int],
+                 bundled_size: int, analysis: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """根据体积排名和导入分析结果生成优化建议"""
+        suggestions = []
+        reached = set(analysis['third_party']) if analysis else None
+        
+        for info in ranked:
+            if info['category'] != 'third-party':
+                continue
+            name = info['name']
+            if reached is not None and name not in reached:
+                suggestions.append({
+                    'type': 'exclude',
+                    'module': name,
+                    'size': info['size'],
+                    'message': f"{name} ({info['size'] / 1024 / 1024:.1f} MB) 未被项目代码导入，"
+                               f"可能由钩子或可选依赖引入，可尝试 --exclude-module {name}"
+                })
+            elif bundled_size and info['size'] / bundled_size >= LARGE_PACKAGE_RATIO:
+                suggestions.append({
+                    'type': 'review',
+                    'module': name,
+                    'size': info['size'],
+                    'message': f"{name} 占打包内容的 {info['size'] / bundled_size:.0%}，请确认是否确实需要整个包"
+                })
+                
+        # 被打包进来的测试/示例子包
+        prunable: Dict[str, int] = {}
+        for (name, _, typecode), size in zip(entries, sizes):
+            if typecode != 'PYMODULE':
+                continue
+            parts = name.split('.')
+            for i, part in enumerate(parts[1:], 1):
+                if part in _PRUNABLE_SUBPACKAGES:
+                    subpackage = '.'.join(parts[:i + 1])
+                    prunable[subpackage] = prunable.get(subpackage, 0) + size
+                    break
+        for subpackage, size in sorted(prunable.items(), key=lambda item: item[1], reverse=True):
+            suggestions.append({
+                'type': 'exclude',
+                'module': subpackage,
+                'size': size,
+                'message': f"{subpackage} ({size / 1024:.0f} KB) 是测试或示例代码，可尝试 --exclude-module {subpackage}"
+            })
+            
+        return suggestions
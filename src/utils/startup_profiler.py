@@ -0,0 +1,297 @@
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from utils.cache_utils import get_cache_dir
+
+# 运行时钩子通过该环境变量得知结果文件路径，未设置时钩子不做任何事
+PROFILE_ENV = 'PYEZPACKER_STARTUP_PROFILE'
+
+_HOOK_NAME = 'pyi_rth_pyezpacker_startup.py'
+
+# 打包进可执行文件的运行时钩子。PyInstaller在执行主脚本前运行它；
+# 它替换builtins.__import__统计每个模块首次导入的自身耗时和累计耗时（与-X importtime相同的口径），
+# 并在进程退出时把结果写入PROFILE_ENV指定的文件
+_HOOK_SOURCE = '''\
+# PyEzPacker启动耗时分析钩子，仅在设置了环境变量 %(profile_env)s 时生效
+import os
+
+_profile_path = os.environ.get(%(profile_env)r)
+if _profile_path:
+    import atexit
+    import builtins
+    import json
+    import sys
+    import time
+
+    _hook_time = time.time()
+    _records = []
+    _stack = []
+    _original_import = builtins.__import__
+
+    def _resolve(name, globals_, level):
+        if level and globals_:
+            package = globals_.get('__package__') or ''
+            base = package.rsplit('.', level - 1)[0] if level > 1 else package
+            return base + '.' + name if name else base
+        return name
+
+    def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        full_name = _resolve(name, globals, level)
+        if full_name in sys.modules:
+            return _original_import(name, globals, locals, fromlist, level)
+        _stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return _original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = _stack.pop()
+            if _stack:
+                _stack[-1] += elapsed
+            _records.append((full_name, elapsed - children, elapsed))
+
+    builtins.__import__ = _timed_import
+
+    def _write_profile():
+        exit_time = time.time()
+        # onefile模式下运行目录是引导程序新解压出的_MEI临时目录，其中最晚写入的文件时间即解压结束时间
+        meipass = getattr(sys, '_MEIPASS', '')
+        extraction_end = None
+        if os.path.basename(meipass).startswith('_MEI'):
+            extraction_end = 0.0
+            for root, _, files in os.walk(meipass):
+                for name in files:
+                    try:
+                        extraction_end = max(extraction_end, os.lstat(os.path.join(root, name)).st_mtime)
+                    except OSError:
+                        pass
+        with open(_profile_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'hook_time': _hook_time,
+                'exit_time': exit_time,
+                'extraction_end': extraction_end,
+                'imports': _records
+            }, f)
+
+    atexit.register(_write_profile)
+''' % {'profile_env': PROFILE_ENV}
+
+class StartupProfiler:
+    """
+    打包产物的启动耗时分析器。
+    打包时加入get_hook_path()提供的运行时钩子，打包后多次启动可执行文件，测量冷启动和热启动耗时、
+    onefile模式的解压耗时，并按自身耗时列出最慢的导入模块。
+    """
+    
+    def __init__(self, logger: Optional[logging.Logger] = None):
+        """
+        初始化启动耗时分析器。
+
+        Args:
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        
+    def get_hook_path(self) -> str:
+        """
+        获取运行时钩子文件路径，作为runtime_hooks传给PyInstaller.build()。
+        钩子只在分析时设置的环境变量下生效，正常运行时几乎没有开销。
+
+        Returns:
+            str: 钩子文件路径
+        """
+        hook_path = get_cache_dir('startup-profiler') / _HOOK_NAME
+        # 内容不变时不重写，避免改变文件时间影响打包缓存
+        if not hook_path.exists() or hook_path.read_text(encoding='utf-8') != _HOOK_SOURCE:
+            hook_path.write_text(_HOOK_SOURCE, encoding='utf-8')
+        return str(hook_path)
+        
+    def profile_build(self, build_result: Dict[str, Any], runs: int = 5, **kwargs) -> Dict[str, Any]:
+        """
+        分析PyInstaller.build()产物的启动耗时。
+
+        Args:
+            build_result: build()返回的结果，需包含artifact
+            runs: 启动次数
+            kwargs: 传给profile()的其他参数
+
+        Returns:
+            Dict[str, Any]: 见profile()
+        """
+        executable = build_result['artifact']
+        # onedir模式的产物是目录，可执行文件在目录中且与目录同名
+        if os.path.isdir(executable):
+            executable = os.path.join(executable, os.path.basename(executable))
+        return self.profile(executable, runs=runs, **kwargs)
+        
+    def profile(self,
+                executable: str,
+                runs: int = 5,
+                args: Optional[List[str]] = None,
+                timeout: float = 60) -> Dict[str, Any]:
+        """
+        多次启动可执行文件并统计启动耗时。
+        第一次启动前尽量将产物从系统页缓存中移出作为冷启动，其余各次作为热启动。
+        被测程序需要能自行退出（例如传入--help等参数）。
+
+        Args:
+            executable: 可执行文件路径（onedir模式为目录中的可执行文件）
+            runs: 启动次数，至少为2
+            args: 启动参数
+            timeout: 单次启动的超时时间（秒）
+
+        Returns:
+            Dict[str, Any]: 包含runs（每次启动的耗时）、cold、warm（热启动各项耗时的中位数）、
+            cold_evicted（冷启动前是否成功移出页缓存）和slowest_imports（按自身耗时排序的导入模块）
+
+        Raises:
+            RuntimeError: 可执行文件未包含运行时钩子或启动超时
+        """
+        runs = max(2, runs)
+        cold_evicted = self._evict_page_cache(executable)
+        results = []
+        for index in range(runs):
+            results.append(self._launch(executable, args or [], timeout))
+            self.logger.debug(f"第 {index + 1} 次启动耗时 {results[-1]['wall']:.3f} 秒")
+            
+        warm = results[1:]
+        keys = ('wall', 'bootstrap', 'extraction', 'imports', 'main')
+        report = {
+            'executable': executable,
+            'runs': [{key: run[key] for key in keys + ('returncode',)} for run in results],
+            'cold': {key: results[0][key] for key in keys},
+            'warm': {
+                key: statistics.median(run[key] for run in warm) if warm[0][key] is not None else None
+                for key in keys
+            },
+            'cold_evicted': cold_evicted,
+            'slowest_imports': self._rank_imports(warm)
+        }
+        self.logger.info(
+            f"启动耗时: 冷启动 {report['cold']['wall']:.3f} 秒，热启动 {report['warm']['wall']:.3f} 秒"
+        )
+        return report
+        
+    def format_report(self, report: Dict[str, Any], top: int = 15) -> str:
+        """
+        生成可读的启动耗时报告文本。
+
+        Args:
+            report: profile()的返回值
+            top: 显示最慢的前几个导入模块
+
+        Returns:
+            str: 报告文本
+        """
+        def ms(value: Optional[float]) -> str:
+            return f"{value * 1000:.1f} ms" if value is not None else '-'
+            
+        lines = [f"启动耗时（{report['executable']}）:"]
+        for label, key in (('冷启动', 'cold'), ('热启动', 'warm')):
+            item = report[key]
+            lines.append(
+                f"  {label}: 总计 {ms(item['wall'])}，引导 {ms(item['bootstrap'])}，"
+                f"解压 {ms(item['extraction'])}，导入 {ms(item['imports'])}，主程序 {ms(item['main'])}"
+            )
+        if not report['cold_evicted']:
+            lines.append("  注意: 无法移出页缓存，冷启动结果可能偏快")
+        lines.append(f"{'模块':<48}{'自身(ms)':>10}{'累计(ms)':>10}")
+        for item in report['slowest_imports'][:top]:
+            lines.append(f"{item['module']:<48}{item['self'] * 1000:>10.2f}{item['cumulative'] * 1000:>10.2f}")
+        return '\n'.join(lines)
+        
+    def _launch(self, executable: str, args: List[str], timeout: float) -> Dict[str, Any]:
+        """启动一次可执行文件并读取钩子写出的结果"""
+        fd, profile_path = tempfile.mkstemp(suffix='.json', prefix='pyezpacker-startup-')
+        os.close(fd)
+        os.remove(profile_path)
+        env = dict(os.environ)
+        env[PROFILE_ENV] = profile_path
+        try:
+            launch_time = time.time()
+            start = time.perf_counter()
+            try:
+                completed = subprocess.run(
+                    [executable] + args,
+                    env=env,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=timeout
+                )
+            except subprocess.TimeoutExpired:
+                raise RuntimeError(f"启动超过 {timeout} 秒未退出，请传入能让程序自行退出的参数")
+            wall = time.perf_counter() - start
+            
+            try:
+                with open(profile_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                raise RuntimeError("未获取到启动数据，请确认打包时加入了启动耗时分析钩子")
+        finally:
+            if os.path.exists(profile_path):
+                os.remove(profile_path)
+                
+        imports_total = sum(self_time for _, self_time, _ in data['imports'])
+        extraction = None
+        if data['extraction_end'] is not None:
+            extraction = max(0.0, data['extraction_end'] - launch_time)
+        return {
+            'wall': wall,
+            # 从启动到钩子执行：引导程序、onefile解压和解释器初始化
+            'bootstrap': data['hook_time'] - launch_time,
+            'extraction': extraction,
+            'imports': imports_total,
+            # 钩子执行到退出之间除导入以外的时间
+            'main': max(0.0, data['exit_time'] - data['hook_time'] - imports_total),
+            'returncode': completed.returncode,
+            'import_records': data['imports']
+        }
+        
+    def _rank_imports(self, runs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """汇总多次启动的导入耗时，取中位数并按自身耗时降序排列"""
+        samples: Dict[str, Dict[str, List[float]]] = {}
+        for run in runs:
+            for module, self_time, cumulative in run['import_records']:
+                entry = samples.setdefault(module, {'self': [], 'cumulative': []})
+                entry['self'].append(self_time)
+                entry['cumulative'].append(cumulative)
+        ranked = [
+            {
+                'module': module,
+                'self': statistics.median(entry['self']),
+                'cumulative': statistics.median(entry['cumulative'])
+            }
+            for module, entry in samples.items()
+        ]
+        ranked.sort(key=lambda item: item['self'], reverse=True)
+        return ranked
+        
+    def _evict_page_cache(self, executable: str) -> bool:
+        """
+        请求系统将产物文件从页缓存中移出，模拟冷启动（不需要root权限，仅Linux支持）。
+        onedir模式会处理可执行文件所在目录中的全部文件。
+        """
+        if not hasattr(os, 'posix_fadvise'):
+            return False
+        paths = [executable]
+        exe_dir = os.path.dirname(os.path.abspath(executable))
+        if os.path.isdir(os.path.join(exe_dir, '_internal')):
+            paths = [str(p) for p in Path(exe_dir).rglob('*') if p.is_file()]
+        try:
+            for path in paths:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                finally:
+                    os.close(fd)
+        except OSError:
+            return False
+        return True
@@ -0,0 +1,290 @@
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from utils.cache_utils import file_lock, get_cache_dir
+
+# 模板环境创建完成的标记文件，中途失败的模板没有该文件，下次会重新创建
+_COMPLETE_MARKER = '.pyezpacker-complete'
+
+# 记录由本工具创建的虚拟环境对应的缓存键
+_ENV_MARKER = '.pyezpacker-venv'
+
+# 模板环境每次被使用时更新该文件的修改时间，清理时据此判断最近使用的模板
+_USED_MARKER = '.pyezpacker-used'
+
+class VenvProvisioner:
+    """
+    虚拟环境供给器。
+    以requirements内容和解释器版本的哈希为键缓存一份模板环境，依赖包的wheel保存在本地
+    wheelhouse中，离线时也能安装。相同键的新环境通过硬链接克隆模板得到，无需重新安装。
+    """
+    
+    def __init__(self,
+                 python: Optional[str] = None,
+                 cache_dir: Optional[str] = None,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化虚拟环境供给器。
+
+        Args:
+            python: 创建虚拟环境使用的Python解释器，默认为当前解释器
+            cache_dir: 缓存目录，默认为用户缓存目录下的venvs
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.python = python or sys.executable
+        self.root = Path(cache_dir) if cache_dir else get_cache_dir('venvs')
+        self.templates_dir = self.root / 'templates'
+        self.wheelhouse = self.root / 'wheelhouse'
+        self.templates_dir.mkdir(parents=True, exist_ok=True)
+        self.wheelhouse.mkdir(parents=True, exist_ok=True)
+        self._interpreter_id: Optional[str] = None
+        
+    def compute_key(self, requirements_path: str, extra_requirements: Optional[List[str]] = None) -> str:
+        """
+        计算requirements对应的缓存键。
+        键由requirements内容（包括-r/-c引用的文件）、额外依赖和解释器版本、平台共同决定。
+
+        Args:
+            requirements_path: requirements.txt路径
+            extra_requirements: requirements.txt之外需要安装的依赖
+
+        Returns:
+            str: 缓存键
+        """
+        hasher = hashlib.sha256(self._get_interpreter_id().encode('utf-8'))
+        for line in self._read_requirements(requirements_path, set()) + sorted(extra_requirements or []):
+            hasher.update(line.encode('utf-8') + b'\n')
+        return hasher.hexdigest()[:24]
+        
+    def provision(self,
+                  requirements_path: str,
+                  target_dir: str,
+                  extra_requirements: Optional[List[str]] = None,
+                  offline: bool = False) -> Dict[str, Any]:
+        """
+        根据requirements.txt准备虚拟环境。
+
+        目标目录已是同一键创建的环境时直接复用；是本工具创建但键不同的环境时重新克隆；
+        不是本工具创建的目录不会被改动，直接返回该目录。
+
+        Args:
+            requirements_path: requirements.txt路径
+            target_dir: 虚拟环境目标目录
+            extra_requirements: requirements.txt之外需要安装的依赖，如pyinstaller
+            offline: 是否只使用本地wheelhouse安装，不访问网络
+
+        Returns:
+            Dict[str, Any]: 包含venv_path、key、template_cached（模板是否已存在）、
+            reused（目标环境是否直接复用）和duration字段
+        """
+        start_time = time.time()
+        target = Path(target_dir).absolute()
+        key = self.compute_key(requirements_path, extra_requirements)
+        result = {'venv_path': str(target), 'key': key, 'template_cached': True, 'reused': False}
+        
+        existing_key = self._read_env_marker(target)
+        if target.exists() and existing_key is None:
+            self.logger.warning(f"目标目录已存在且不是自动创建的虚拟环境，直接使用: {target}")
+            result.update(reused=True, duration=time.time() - start_time)
+            return result
+        if existing_key == key:
+            self.logger.info(f"虚拟环境已是最新，直接复用: {target}")
+            result.update(reused=True, duration=time.time() - start_time)
+            return result
+            
+        template = self.templates_dir / key
+        # 同一键的模板只允许一个进程创建
+        with file_lock(str(self.templates_dir / f'{key}.lock')):
+            if not (template / _COMPLETE_MARKER).exists():
+                result['template_cached'] = False
+                self._create_template(template, requirements_path, extra_requirements or [], offline)
+            else:
+                self.logger.info(f"使用缓存的模板环境: {template}")
+            (template / _USED_MARKER).touch()
+                
+            if target.exists():
+                self.logger.info(f"依赖已变化，重新创建虚拟环境: {target}")
+                shutil.rmtree(target)
+            # 先写入空键作为标记，克隆中途失败的目录下次会被重新创建
+            target.mkdir(parents=True)
+            with open(target / _ENV_MARKER, 'w', encoding='utf-8') as f:
+                json.dump({'key': ''}, f)
+            self._clone(template, target)
+            
+        with open(target / _ENV_MARKER, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'requirements': os.path.abspath(requirements_path)}, f)
+            
+        result['duration'] = time.time() - start_time
+        self.logger.info(f"虚拟环境已就绪: {target}，耗时 {result['duration']:.1f} 秒")
+        return result
+        
+    def purge(self, keep: int = 5) -> List[str]:
+        """
+        清理模板环境，只保留最近使用的几个。
+        删除前获取模板的锁，不会删除正在被创建或克隆的模板；清理期间被使用过的模板会保留。
+
+        Args:
+            keep: 保留的模板数量
+
+        Returns:
+            List[str]: 被删除的模板目录
+        """
+        start_time = time.time()
+        templates = [p for p in self.templates_dir.iterdir() if p.is_dir()]
+        templates.sort(key=self._get_last_used, reverse=True)
+        removed = []
+        for template in templates[keep:]:
+            with file_lock(str(self.templates_dir / f'{template.name}.lock')):
+                if self._get_last_used(template) >= start_time:
+                    continue
+                shutil.rmtree(template, ignore_errors=True)
+            removed.append(str(template))
+            self.logger.info(f"已清理模板环境: {template}")
+        return removed
+        
+    def _get_last_used(self, template: Path) -> float:
+        """获取模板最近一次被使用的时间，没有使用记录时以模板创建完成的时间为准"""
+        for name in (_USED_MARKER, _COMPLETE_MARKER):
+            try:
+                return (template / name).stat().st_mtime
+            except OSError:
+                continue
+        return 0.0
+        
+    def _create_template(self,
+                         template: Path,
+                         requirements_path: str,
+                         extra_requirements: List[str],
+                         offline: bool) -> None:
+        """创建模板环境并从wheelhouse安装依赖，wheelhouse缺少依赖时先联网补齐"""
+        self.logger.info(f"创建模板环境: {template}")
+        shutil.rmtree(template, ignore_errors=True)
+        self._run([self.python, '-m', 'venv', str(template)])
+        python = self._get_env_python(template)
+        
+        install = [
+            python, '-m', 'pip', 'install', '--disable-pip-version-check',
+            '--no-index', '--find-links', str(self.wheelhouse), '-r', requirements_path
+        ] + extra_requirements
+        if not self._run(install, check=False):
+            if offline:
+                raise RuntimeError(f"离线模式下wheelhouse中缺少依赖: {requirements_path}")
+            # 下载依赖并构建为wheel保存到wheelhouse，之后同样的依赖无需联网
+            self.logger.info("wheelhouse中缺少依赖，正在下载...")
+            self._run([
+                python, '-m', 'pip', 'wheel', '--disable-pip-version-check',
+                '--wheel-dir', str(self.wheelhouse), '-r', requirements_path
+            ] + extra_requirements)
+            self._run(install)
+            
+        (template / _COMPLETE_MARKER).touch()
+        
+    def _clone(self, template: Path, target: Path) -> None:
+        """
+        通过硬链接克隆模板环境。
+        site-packages等目录中的文件以硬链接共享；bin（Windows下为Scripts）中的脚本和
+        pyvenv.cfg包含环境的绝对路径，复制后改写为目标路径。
+        通过pip卸载或升级包时会先删除文件再写入，不会影响模板。
+        """
+        scripts_dir = template / ('Scripts' if os.name == 'nt' else 'bin')
+        old_prefix = str(template).encode('utf-8')
+        new_prefix = str(target).encode('utf-8')
+        
+        for root, dirs, files in os.walk(template):
+            root_path = Path(root)
+            dest_root = target / root_path.relative_to(template)
+            dest_root.mkdir(parents=True, exist_ok=True)
+            # 目录形式的符号链接不会被os.walk展开，当作文件处理
+            for name in [d for d in dirs if (root_path / d).is_symlink()]:
+                dirs.remove(name)
+                files.append(name)
+            for name in files:
+                if name in (_COMPLETE_MARKER, _USED_MARKER):
+                    continue
+                source = root_path / name
+                dest = dest_root / name
+                if source.is_symlink():
+                    os.symlink(os.readlink(source), dest)
+                elif root_path == scripts_dir or (root_path == template and name == 'pyvenv.cfg'):
+                    self._copy_rewritten(source, dest, old_prefix, new_prefix)
+                else:
+                    try:
+                        os.link(source, dest)
+                    except OSError:
+                        # 跨文件系统等无法创建硬链接时退回复制
+                        shutil.copy2(source, dest)
+    
+    def _copy_rewritten(self, source: Path, dest: Path, old_prefix: bytes, new_prefix: bytes) -> None:
+        """复制文件并将其中的模板路径改写为目标路径（二进制文件原样复制）"""
+        data = source.read_bytes()
+        if old_prefix in data and b'\0' not in data:
+            data = data.replace(old_prefix, new_prefix)
+        dest.write_bytes(data)
+        shutil.copymode(source, dest)
+        
+    def _read_requirements(self, requirements_path: str, seen: set) -> List[str]:
+        """读取requirements内容，去掉注释和空行，并展开-r/-c引用的文件"""
+        requirements_path = os.path.abspath(requirements_path)
+        if requirements_path in seen:
+            return []
+        seen.add(requirements_path)
+        
+        lines = []
+        with open(requirements_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split(' #', 1)[0].strip()
+                if not line or line.startswith('#'):
+                    continue
+                for option in ('-r', '--requirement', '-c', '--constraint'):
+                    if line.startswith(option + ' ') or line.startswith(option + '='):
+                        include = line[len(option) + 1:].strip()
+                        include = os.path.join(os.path.dirname(requirements_path), include)
+                        lines.extend(self._read_requirements(include, seen))
+                        break
+                else:
+                    lines.append(line)
+        return lines
+        
+    def _get_interpreter_id(self) -> str:
+        """获取解释器的版本和平台标识，结果会被缓存"""
+        if self._interpreter_id is None:
+            result = subprocess.run(
+                [self.python, '-c', 'import sys, sysconfig; print(sys.version, sysconfig.get_platform())'],
+                capture_output=True, text=True, check=True
+            )
+            self._interpreter_id = result.stdout.strip()
+        return self._interpreter_id
+        
+    def _get_env_python(self, env_dir: Path) -> str:
+        """获取虚拟环境中的Python解释器路径"""
+        if os.name == 'nt':
+            return str(env_dir / 'Scripts' / 'python.exe')
+        return str(env_dir / 'bin' / 'python')
+        
+    def _read_env_marker(self, target: Path) -> Optional[str]:
+        """读取目标环境的缓存键，不是本工具创建的环境返回None"""
+        try:
+            with open(target / _ENV_MARKER, 'r', encoding='utf-8') as f:
+                return json.load(f).get('key')
+        except (OSError, ValueError):
+            return None
+            
+    def _run(self, command: List[str], check: bool = True) -> bool:
+        """执行命令并记录输出，check为True时失败会抛出异常"""
+        self.logger.debug(f"执行命令: {' '.join(command)}")
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            self.logger.debug(result.stdout + result.stderr)
+            if check:
+                raise RuntimeError(f"命令执行失败: {' '.join(command)}\n{result.stderr.strip()}")
+            return False
+        return True
@@ -1,13 +1,31 @@
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Iterable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
 import re
 import ast
+import os
+import shutil
 import logging
+import tempfile
 from pathlib import Path
 
+# 一次扫描即可找出所有版本字段：FixedFileInfo中的版本号元组和StringTable中的字符串字段
+_FIELD_PATTERN = re.compile(
+    r"(?P<tuple_key>\bfilevers|\bprodvers)\s*=\s*\((?P<tuple_value>[\d,\s]*)\)"
+    r"|StringStruct\(\s*u?(?P<key_quote>['\"])(?P<string_key>\w+)(?P=key_quote)\s*,\s*"
+    r"u?(?P<quote>['\"])(?P<string_value>(?:\\.|(?!(?P=quote)).)*)(?P=quote)\s*\)"
+)
+
+# 版本号元组字段对应的版本号字符串字段
+_TUPLE_SOURCES = {'filevers': 'FileVersion', 'prodvers': 'ProductVersion'}
+
+# 解析结果中始终包含的标准字符串字段
+_STRING_FIELDS = ('CompanyName', 'FileDescription', 'FileVersion', 'LegalCopyright', 'ProductName', 'ProductVersion')
+
 class VersionParser:
     """
     版本信息文件解析器。
     支持读取和解析PyInstaller格式的版本信息文件。
+    保存时在原文件上就地修改字段值，保留文件中的其他内容、自定义字段和多语言翻译。
     """
     
     def __init__(self, logger: Optional[logging.Logger] = None):
@@ -36,20 +54,8 @@ class VersionParser:
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
-            
-            # 提取版本信息
-            version_info = {
-                'filevers': self._extract_tuple(content, 'filevers'),
-                'prodvers': self._extract_tuple(content, 'prodvers'),
-                'CompanyName': self._extract_string(content, 'CompanyName'),
-                'FileDescription': self._extract_string(content, 'FileDescription'),
-                'FileVersion': self._extract_string(content, 'FileVersion'),
-                'LegalCopyright': self._extract_string(content, 'LegalCopyright'),
-                'ProductName': self._extract_string(content, 'ProductName'),
-                'ProductVersion': self._extract_string(content, 'ProductVersion')
-            }
-            
-            return version_info
+                
+            return self.parse_version_content(content)
             
         except FileNotFoundError:
             self.logger.error(f"版本信息文件不存在: {file_path}")
@@ -57,16 +63,97 @@ class VersionParser:
         except Exception as e:
             self.logger.error(f"解析版本信息文件时出错: {str(e)}")
             raise ValueError(f"版本信息文件格式错误: {str(e)}")
-    
+            
+    def parse_version_content(self, content: str) -> Dict[str, Any]:
+        """
+        解析版本信息文本。
+        字段在多个StringTable中重复出现时取第一次出现的值；
+        除标准字段外，文件中的自定义字符串字段也会一并返回。
+
+        Args:
+            content: 版本信息文件内容
+
+        Returns:
+            Dict[str, Any]: 版本信息字典
+        """
+        version_info: Dict[str, Any] = {
+            'filevers': (1, 0, 0, 0),
+            'prodvers': (1, 0, 0, 0)
+        }
+        version_info.update((key, '') for key in _STRING_FIELDS)
+        
+        seen = set()
+        for match in _FIELD_PATTERN.finditer(content):
+            key = match.group('tuple_key') or match.group('string_key')
+            if key in seen:
+                continue
+            seen.add(key)
+            if match.group('tuple_key'):
+                version_info[key] = tuple(int(part) for part in match.group('tuple_value').split(',') if part.strip())
+            else:
+                version_info[key] = self._unescape(match.group('string_value'))
+                
+        return version_info
+        
+    def update_version_content(self, content: str, version_info: Dict[str, Any]) -> str:
+        """
+        在版本信息文本中就地修改字段值，其余内容保持不变。
+        未显式给出filevers/prodvers时，根据FileVersion/ProductVersion自动更新。
+
+        Args:
+            content: 版本信息文件内容
+            version_info: 需要修改的字段及新值
+
+        Returns:
+            str: 修改后的内容
+        """
+        updates = dict(version_info)
+        for tuple_key, string_key in _TUPLE_SOURCES.items():
+            if tuple_key not in updates and updates.get(string_key):
+                updates[tuple_key] = self._version_str_to_tuple(updates[string_key])
+                
+        found = set()
+        
+        def replace(match: 're.Match[str]') -> str:
+            key = match.group('tuple_key') or match.group('string_key')
+            if key not in updates:
+                return match.group(0)
+            found.add(key)
+            if match.group('tuple_key'):
+                value = '(' + ', '.join(str(part) for part in updates[key]) + ')'
+                start, end = match.span('tuple_value')
+                start, end = start - 1, end + 1
+            else:
+                value = self._escape(str(updates[key]), match.group('quote'))
+                start, end = match.span('string_value')
+            offset = match.start()
+            text = match.group(0)
+            return text[:start - offset] + value + text[end - offset:]
+            
+        content = _FIELD_PATTERN.sub(replace, content)
+        
+        missing = [key for key in updates if key not in found]
+        if missing:
+            self.logger.warning(f"版本信息文件中不存在以下字段，未写入: {', '.join(missing)}")
+        return content
+        
     def save_version_file(self, file_path: str, version_info: Dict[str, str]) -> None:
         """
         保存版本信息到文件。
+        文件已存在时只修改对应字段的值，保留原有格式、自定义字段和翻译；
+        文件不存在时根据模板生成。
 
         Args:
             file_path: 版本信息文件路径
             version_info: 版本信息字典
         """
         try:
+            if os.path.exists(file_path):
+                # 与模板生成时一致，版本号元组始终由版本号字符串得出
+                updates = {key: value for key, value in version_info.items() if key not in _TUPLE_SOURCES}
+                self._update_file(file_path, updates)
+                return
+                
             template = self._get_version_template()
             
             # 转换版本号字符串为元组
@@ -77,12 +164,12 @@ class VersionParser:
             content = template.format(
                 filevers=filevers,
                 prodvers=prodvers,
-                company_name=version_info['CompanyName'],
-                file_description=version_info['FileDescription'],
-                file_version=version_info['FileVersion'],
-                legal_copyright=version_info['LegalCopyright'],
-                product_name=version_info['ProductName'],
-                product_version=version_info['ProductVersion']
+                company_name=self._escape(version_info['CompanyName'], "'"),
+                file_description=self._escape(version_info['FileDescription'], "'"),
+                file_version=self._escape(version_info['FileVersion'], "'"),
+                legal_copyright=self._escape(version_info['LegalCopyright'], "'"),
+                product_name=self._escape(version_info['ProductName'], "'"),
+                product_version=self._escape(version_info['ProductVersion'], "'")
             )
             
             with open(file_path, 'w', encoding='utf-8') as f:
@@ -91,28 +178,93 @@ class VersionParser:
         except Exception as e:
             self.logger.error(f"保存版本信息文件时出错: {str(e)}")
             raise
-    
-    def _extract_tuple(self, content: str, key: str) -> Tuple[int, ...]:
-        """提取版本号元组"""
-        pattern = rf'{key}=\s*\(([\d,\s]+)\)'
-        match = re.search(pattern, content)
-        if match:
-            return tuple(map(int, match.group(1).split(',')))
-        return (1, 0, 0, 0)
-    
-    def _extract_string(self, content: str, key: str) -> str:
-        """提取字符串值"""
-        pattern = rf"StringStruct\(u'{key}',\s*u'([^']*?)'\)"
-        match = re.search(pattern, content)
-        return match.group(1) if match else ''
-    
+            
+    def stamp_versions(self,
+                       file_paths: Iterable[str],
+                       version: str,
+                       max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        并行地为多个版本信息文件设置新版本号。
+        同时更新FileVersion、ProductVersion及对应的版本号元组，只有内容实际变化的文件才会被写入。
+
+        Args:
+            file_paths: 版本信息文件路径列表，指向同一文件的路径只处理第一个
+            version: 新版本号，如1.2.3.4
+            max_workers: 最大线程数，默认由线程池决定
+
+        Returns:
+            Dict[str, Any]: changed（已修改的文件）、unchanged（无需修改的文件）、
+            failed（失败的文件及错误信息）
+        """
+        # 提前校验版本号，避免每个文件都报同样的错误
+        version_tuple = self._version_str_to_tuple(version)
+        updates = {
+            'FileVersion': version,
+            'ProductVersion': version,
+            'filevers': version_tuple,
+            'prodvers': version_tuple
+        }
+        
+        result: Dict[str, Any] = {'changed': [], 'unchanged': [], 'failed': {}}
+        # 同一文件的不同写法（相对路径、符号链接）只更新一次，避免并发写同一文件
+        unique_paths: Dict[str, str] = {}
+        for path in file_paths:
+            unique_paths.setdefault(os.path.realpath(path), path)
+        file_paths = list(unique_paths.values())
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self._update_file, path, updates) for path in file_paths]
+            for path, future in zip(file_paths, futures):
+                try:
+                    changed = future.result()
+                except Exception as e:
+                    result['failed'][path] = str(e)
+                    continue
+                result['changed' if changed else 'unchanged'].append(path)
+                
+        self.logger.info(
+            f"版本号已更新为 {version}: 修改 {len(result['changed'])} 个文件，"
+            f"未变化 {len(result['unchanged'])} 个，失败 {len(result['failed'])} 个"
+        )
+        return result
+        
+    def _update_file(self, file_path: str, version_info: Dict[str, Any]) -> bool:
+        """就地修改版本信息文件，内容有变化时原子地写回并返回True"""
+        # newline=''保留文件原有的换行符
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            content = f.read()
+            
+        new_content = self.update_version_content(content, version_info)
+        if new_content == content:
+            return False
+            
+        # 替换符号链接指向的文件；临时文件与其在同一目录，保证os.replace是原子的
+        target_path = os.path.realpath(file_path)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(target_path))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(new_content)
+            shutil.copymode(target_path, tmp_path)
+            os.replace(tmp_path, target_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return True
+        
+    def _escape(self, value: str, quote: str) -> str:
+        """转义字符串值中的反斜杠和引号"""
+        return value.replace('\\', '\\\\').replace(quote, '\\' + quote)
+        
+    def _unescape(self, value: str) -> str:
+        """还原字符串值中的转义字符"""
+        return re.sub(r'\\(.)', r'\1', value)
+        
     def _version_str_to_tuple(self, version_str: str) -> Tuple[int, ...]:
         """将版本号字符串转换为元组"""
         parts = version_str.split('.')
         while len(parts) < 4:
             parts.append('0')
         return tuple(map(int, parts[:4]))
-    
+        
     def _get_version_template(self) -> str:
         """获取版本信息文件模板"""
         return '''# UTF-8
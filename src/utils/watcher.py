@@ -0,0 +1,351 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+from utils.project_scanner import DEFAULT_EXCLUDES
+
+# 连续的文件变化在安静这么久（秒）之后才视为一批，触发一次重新打包
+DEFAULT_DEBOUNCE = 0.5
+
+# 文件持续变化时，最多等待这么久（秒）也要处理一次
+DEFAULT_MAX_DELAY = 10.0
+
+# 轮询模式下两次扫描的间隔（秒）
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify事件标志，见inotify(7)
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+
+# 只关注写入完成、创建、删除、移动和属性变化，不关注写入过程中的每次修改
+_WATCH_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE |
+               _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+
+# struct inotify_event的固定部分：wd、mask、cookie、len
+_EVENT_HEADER = struct.Struct('iIII')
+
+def _iter_dirs(root: str, excludes: Set[str]) -> Iterable[str]:
+    """遍历目录树中需要监视的目录，跳过排除目录和目录符号链接"""
+    yield root
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False) and entry.name not in excludes and entry.path not in excludes:
+            yield from _iter_dirs(entry.path, excludes)
+
+class _InotifyBackend:
+    """通过ctypes调用inotify监视目录，仅Linux可用"""
+    
+    def __init__(self, excludes: Set[str]):
+        libc_name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("当前系统不支持inotify")
+        self._libc = libc
+        self._fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify初始化失败")
+        self.excludes = excludes
+        self._watches: Dict[int, Tuple[str, bool]] = {}
+        
+    def add(self, path: str, recursive: bool) -> List[str]:
+        """
+        监视目录，recursive为True时包括所有子目录。
+
+        Returns:
+            List[str]: 新监视的目录中已有的文件（目录刚创建时其中的文件可能早于监视出现）
+        """
+        found = []
+        for directory in (_iter_dirs(path, self.excludes) if recursive else [path]):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                continue
+            self._watches[wd] = (directory, recursive)
+            try:
+                found.extend(entry.path for entry in os.scandir(directory) if not entry.is_dir())
+            except OSError:
+                pass
+        return found
+        
+    def poll(self, timeout: float) -> Tuple[Set[str], bool]:
+        """
+        等待并读取事件。
+
+        Returns:
+            Tuple[Set[str], bool]: (发生变化的路径, 事件队列是否溢出)
+        """
+        changed: Set[str] = set()
+        overflow = False
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not readable:
+            return changed, overflow
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed, overflow
+            
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            
+            if mask & _IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if wd not in self._watches:
+                continue
+            directory, recursive = self._watches[wd]
+            if mask & _IN_IGNORED:
+                # 被监视的目录已删除
+                del self._watches[wd]
+                continue
+            path = os.path.join(directory, name) if name else directory
+            changed.add(path)
+            # 递归监视的目录中新建或移入的子目录也需要监视
+            if recursive and mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                if name not in self.excludes and path not in self.excludes:
+                    changed.update(self.add(path, True))
+        return changed, overflow
+        
+    def close(self) -> None:
+        """关闭inotify文件描述符"""
+        os.close(self._fd)
+
+class _PollingBackend:
+    """定期扫描文件的修改时间和大小，用于不支持inotify的平台"""
+    
+    def __init__(self, excludes: Set[str], interval: float = DEFAULT_POLL_INTERVAL):
+        self.excludes = excludes
+        self.interval = interval
+        self._roots: List[Tuple[str, bool]] = []
+        self._snapshot = {}
+        
+    def add(self, path: str, recursive: bool) -> List[str]:
+        """监视目录，recursive为True时包括所有子目录"""
+        self._roots.append((path, recursive))
+        self._snapshot.update(self._scan([(path, recursive)]))
+        return []
+        
+    def poll(self, timeout: float) -> Tuple[Set[str], bool]:
+        """等待一个扫描间隔后重新扫描，返回发生变化的路径"""
+        time.sleep(max(0.0, min(timeout, self.interval)))
+        snapshot = self._scan(self._roots)
+        changed = {path for path in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(path) != self._snapshot.get(path)}
+        self._snapshot = snapshot
+        return changed, False
+        
+    def close(self) -> None:
+        pass
+        
+    def _scan(self, roots: List[Tuple[str, bool]]) -> Dict[str, Tuple[int, int]]:
+        """记录目录中各文件的修改时间和大小"""
+        snapshot = {}
+        for root, recursive in roots:
+            for directory in (_iter_dirs(root, self.excludes) if recursive else [root]):
+                try:
+                    for entry in os.scandir(directory):
+                        if not entry.is_dir():
+                            stat = entry.stat(follow_symlinks=False)
+                            snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+                except OSError:
+                    continue
+        return snapshot
+
+class BuildWatcher:
+    """
+    监视模式：监视项目文件，变化时自动重新打包。
+    只有参与打包的文件变化时才会触发：主脚本导入闭包中的项目文件、额外文件、图标和版本信息文件。
+    一段时间内的连续变化合并为一次重新打包。Linux下使用inotify，其他平台退回轮询。
+    """
+    
+    def __init__(self,
+                 params: Dict[str, Any],
+                 build_fn: Callable[[List[str]], Any],
+                 debounce: float = DEFAULT_DEBOUNCE,
+                 max_delay: float = DEFAULT_MAX_DELAY,
+                 use_polling: bool = False,
+                 logger: Optional[logging.Logger] = None):
+        """
+        初始化监视器。
+
+        Args:
+            params: 打包参数，使用其中的script_path、extra_files、packed_files、icon_path、
+                version_file、venv_path和output_dir
+            build_fn: 重新打包的函数，参数为触发本次打包的文件列表
+            debounce: 变化停止多久（秒）后开始打包
+            max_delay: 持续变化时最多等待多久（秒）
+            use_polling: 是否强制使用轮询
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.params = params
+        self.build_fn = build_fn
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.use_polling = use_polling
+        self.script_path = os.path.abspath(params['script_path'])
+        self.project_dir = os.path.dirname(self.script_path)
+        
+        self.watched_files: Set[str] = set()
+        self.watched_dirs: Set[str] = set()
+        self.stats = {'events': 0, 'batches': 0, 'builds': 0, 'ignored': 0}
+        self._stop_event = threading.Event()
+        
+    def stop(self) -> None:
+        """停止监视，可在其他线程中调用"""
+        self._stop_event.set()
+        
+    def run(self, build_on_start: bool = False) -> None:
+        """
+        开始监视，直到调用stop()。
+
+        Args:
+            build_on_start: 是否在开始监视前先打包一次
+        """
+        backend = self._create_backend()
+        try:
+            self._update_inputs()
+            for root, recursive in self._get_watch_roots():
+                backend.add(root, recursive)
+            self.logger.info(
+                f"开始监视 {len(self.watched_files)} 个文件"
+                f"（{'轮询' if isinstance(backend, _PollingBackend) else 'inotify'}），文件变化时将自动重新打包"
+            )
+            if build_on_start:
+                self._build([self.script_path])
+                
+            while not self._stop_event.is_set():
+                changed, overflow = backend.poll(0.5)
+                if not changed and not overflow:
+                    continue
+                    
+                # 去抖：继续收集变化，直到安静debounce秒或累计等待超过max_delay
+                first_time = last_time = time.monotonic()
+                while not self._stop_event.is_set():
+                    now = time.monotonic()
+                    remaining = min(last_time + self.debounce, first_time + self.max_delay) - now
+                    if remaining <= 0:
+                        break
+                    more, more_overflow = backend.poll(remaining)
+                    if more or more_overflow:
+                        changed |= more
+                        overflow = overflow or more_overflow
+                        last_time = time.monotonic()
+                if self._stop_event.is_set():
+                    break
+                    
+                self.stats['events'] += len(changed)
+                self.stats['batches'] += 1
+                relevant = self._filter_relevant(changed, overflow)
+                if relevant:
+                    self._build(relevant)
+                else:
+                    self.stats['ignored'] += 1
+                    self.logger.debug(f"忽略与打包无关的变化: {len(changed)} 个文件")
+        finally:
+            backend.close()
+            self.logger.info("已停止监视")
+            
+    def _build(self, changed: List[str]) -> None:
+        """执行一次打包，打包失败不会中止监视"""
+        self.stats['builds'] += 1
+        try:
+            self.build_fn(changed)
+        except Exception as e:
+            self.logger.error(f"重新打包时出现错误: {str(e)}")
+            
+    def _filter_relevant(self, changed: Set[str], overflow: bool) -> List[str]:
+        """筛选出参与打包的文件，导入闭包可能因修改而变化，Python文件变化时重新分析"""
+        if overflow:
+            self.logger.warning("文件变化过多，事件队列溢出，直接重新打包")
+            return [self.script_path]
+            
+        previous = set(self.watched_files)
+        if any(path.endswith('.py') and path.startswith(self.project_dir + os.sep) for path in changed):
+            self._update_inputs()
+        watched = previous | self.watched_files
+        
+        relevant = []
+        for path in sorted(changed):
+            if path in watched or any(path.startswith(d + os.sep) for d in self.watched_dirs):
+                relevant.append(path)
+        if relevant:
+            names = ', '.join(os.path.relpath(p, self.project_dir) for p in relevant[:5])
+            more = f" 等 {len(relevant)} 个文件" if len(relevant) > 5 else ''
+            self.logger.info(f"检测到变化: {names}{more}，重新打包")
+        return relevant
+        
+    def _update_inputs(self) -> None:
+        """重新确定参与打包的文件：导入闭包中的项目文件、额外文件、图标和版本信息文件"""
+        from utils.import_analyzer import ImportAnalyzer
+        files = {self.script_path}
+        try:
+            # 每次使用新的分析器，避免复用缓存的目录列表而发现不了新建的模块
+            analysis = ImportAnalyzer(self.logger).analyze(
+                self.script_path, self.params.get('venv_path'), follow_third_party=False
+            )
+            files.update(analysis['local_files'])
+        except Exception as e:
+            # 例如编辑途中的语法错误，保留之前的导入闭包
+            self.logger.debug(f"分析导入关系失败: {str(e)}")
+            files.update(self.watched_files)
+            
+        dirs = set()
+        data_files = list(self.params.get('extra_files') or []) + list(self.params.get('packed_files') or [])
+        for path in data_files + [
+            self.params.get('icon_path'), self.params.get('version_file')
+        ]:
+            if not path:
+                continue
+            path = os.path.abspath(path)
+            (dirs if os.path.isdir(path) else files).add(path)
+        self.watched_files = files
+        self.watched_dirs = dirs
+        
+    def _get_watch_roots(self) -> List[Tuple[str, bool]]:
+        """需要监视的目录：项目目录树、额外的目录，以及项目外单个文件所在的目录"""
+        roots = {self.project_dir: True}
+        for directory in self.watched_dirs:
+            if not directory.startswith(self.project_dir + os.sep):
+                roots[directory] = True
+        for path in self.watched_files:
+            parent = os.path.dirname(path)
+            if not parent.startswith(self.project_dir + os.sep) and parent != self.project_dir:
+                roots.setdefault(parent, False)
+        return list(roots.items())
+        
+    def _create_backend(self):
+        """创建监视后端，inotify不可用时退回轮询"""
+        excludes = set(DEFAULT_EXCLUDES)
+        if self.params.get('output_dir'):
+            # 打包输出目录中的变化由打包本身产生，不需要监视
+            excludes.add(os.path.abspath(self.params['output_dir']))
+        if not self.use_polling and hasattr(select, 'select') and os.name == 'posix':
+            try:
+                return _InotifyBackend(excludes)
+            except (OSError, AttributeError) as e:
+                self.logger.debug(f"inotify不可用，改用轮询: {str(e)}")
+        return _PollingBackend(excludes)
@@ -0,0 +1,158 @@
+from typing import Any, Dict, Iterator, List, Optional
+from contextlib import contextmanager
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+from utils.build_cache import normalize_options
+from utils.cache_utils import file_lock, get_cache_dir
+
+# 工作目录中记录元数据的文件名
+_META_FILE = 'workpath.json'
+
+
+class WorkpathManager:
+    """
+    PyInstaller工作目录管理器。
+    为每个打包目标分配持久化的workpath/specpath，使PyInstaller的增量分析和TOC缓存
+    能在多次打包之间复用；打包参数变化时自动清空对应的工作目录。
+    """
+
+    def __init__(self, root: Optional[str] = None, logger: Optional[logging.Logger] = None):
+        """
+        初始化工作目录管理器。
+
+        Args:
+            root: 工作目录根路径，默认为用户缓存目录下的workpaths
+            logger: 可选的logger对象，用于日志记录
+        """
+        self.logger = logger or logging.getLogger(__name__)
+        self.root = Path(root) if root else get_cache_dir('workpaths')
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def get_workpath(self, script_path: str, argv: List[str]) -> str:
+        """
+        获取打包目标的工作目录路径。
+
+        目录由主脚本路径和所用解释器确定。这里只计算路径，不读写目录；
+        参数指纹的校验和目录的清空在lock()持有锁期间进行。
+
+        Args:
+            script_path: 主脚本路径
+            argv: PyInstaller命令参数列表，argv[0]为使用的Python解释器
+
+        Returns:
+            str: 工作目录路径
+        """
+        script_path = os.path.abspath(script_path)
+        target_id = hashlib.sha256(f'{script_path}\0{argv[0]}'.encode('utf-8')).hexdigest()[:16]
+        return str(self.root / f'{Path(script_path).stem}-{target_id}')
+
+    @contextmanager
+    def lock(self,
+             workpath: str,
+             script_path: Optional[str] = None,
+             argv: Optional[List[str]] = None) -> Iterator[None]:
+        """
+        独占使用工作目录，防止同一目标的多个打包进程同时写入。
+
+        传入script_path和argv时，在持有锁期间把其余打包参数计算为指纹与目录中记录的比较，
+        指纹变化时清空目录，避免PyInstaller复用与当前参数不符的中间结果。
+        锁文件位于工作目录之外，清空目录不会影响锁本身。
+
+        Args:
+            workpath: get_workpath()返回的工作目录路径
+            script_path: 主脚本路径
+            argv: 不含--workpath的PyInstaller命令参数列表，argv[0]为使用的Python解释器
+        """
+        workpath = Path(workpath)
+        with file_lock(str(self._lock_path(workpath))):
+            if script_path and argv:
+                self._prepare(workpath, os.path.abspath(script_path), argv)
+            yield
+
+    def _prepare(self, workpath: Path, script_path: str, argv: List[str]) -> None:
+        """校验参数指纹，变化时清空工作目录，并更新元数据（调用方需持有锁）"""
+        fingerprint = hashlib.sha256(
+            json.dumps(normalize_options(argv[1:], script_path)).encode('utf-8')
+        ).hexdigest()
+
+        meta = self._read_meta(workpath)
+        if meta and meta.get('fingerprint') != fingerprint:
+            self.logger.info(f"打包参数已变化，清空工作目录: {workpath}")
+            shutil.rmtree(workpath, ignore_errors=True)
+        elif meta:
+            self.logger.info(f"复用工作目录: {workpath}")
+
+        workpath.mkdir(parents=True, exist_ok=True)
+        self._write_meta(workpath, {
+            'script_path': script_path,
+            'python': argv[0],
+            'fingerprint': fingerprint,
+            'last_used': time.time()
+        })
+
+    def purge(self, max_age_days: float = 30) -> List[str]:
+        """
+        清理过期的工作目录：主脚本已不存在，或超过指定天数未被使用。
+
+        Args:
+            max_age_days: 最长保留天数
+
+        Returns:
+            List[str]: 被删除的工作目录
+        """
+        deadline = time.time() - max_age_days * 24 * 3600
+        removed = []
+
+        for workpath in self.root.iterdir():
+            if not workpath.is_dir():
+                continue
+            # 与正在使用该目录的打包互斥，加锁后再判断是否过期
+            lock_path = self._lock_path(workpath)
+            with file_lock(str(lock_path)):
+                meta = self._read_meta(workpath)
+                stale = (
+                    not meta
+                    or not os.path.exists(meta.get('script_path', ''))
+                    or meta.get('last_used', 0) < deadline
+                )
+                if stale:
+                    shutil.rmtree(workpath, ignore_errors=True)
+                    # 持有锁时删除锁文件，等待该锁的打包会重新创建锁文件（见file_lock）
+                    self._remove_lock_file(lock_path)
+            if stale:
+                # Windows下打开中的文件不能删除，释放锁后再尝试一次
+                self._remove_lock_file(lock_path)
+                removed.append(str(workpath))
+                self.logger.info(f"已清理过期工作目录: {workpath}")
+
+        return removed
+
+    def _remove_lock_file(self, lock_path: Path) -> None:
+        """删除锁文件，已被删除或仍被其他进程打开（Windows）时忽略"""
+        try:
+            lock_path.unlink()
+        except OSError:
+            pass
+
+    def _lock_path(self, workpath: Path) -> Path:
+        """工作目录的锁文件，与工作目录同级"""
+        return workpath.with_name(f'{workpath.name}.lock')
+
+    def _read_meta(self, workpath: Path) -> Optional[Dict[str, Any]]:
+        """读取工作目录元数据，不存在或损坏时返回None"""
+        try:
+            with open(workpath / _META_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, workpath: Path, meta: Dict[str, Any]) -> None:
+        """写入工作目录元数据"""
+        with open(workpath / _META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)